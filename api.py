@@ -1,72 +1,214 @@
+import os
+import json
 import aiohttp
 import asyncio
+import random
 import logging
-from typing import Optional, Dict, Any, List
+from pathlib import Path
+from typing import Optional, Dict, Any, AsyncIterator, List, Mapping, Tuple
 from functools import wraps
 import time
 from aiohttp import ClientSession, ClientResponseError
+from multidict import CIMultiDict
+
+try:
+    import orjson
+except ImportError:  # optional, faster JSON decoding
+    orjson = None
+
+import metrics
+from cache import AsyncTTLCache
+from circuit_breaker import CircuitOpenError, get_breaker
+from feed_cursor import FeedCursor
 
 # Constants
-BLACKLIST_API_URL = "http://51.195.102.58/api/recent-blacklists"
-UNBLACKLIST_API_URL = "http://51.195.102.58/api/recent-unblacklists"
-MOJANG_SESSION_SERVER_URL = "https://sessionserver.mojang.com/session/minecraft/profile/"
-REQUEST_TIMEOUT = 10  # seconds
-MAX_RETRIES = 3
-RETRY_DELAY = 1  # second
+BLACKLIST_API_URL = os.getenv("BLACKLIST_API_URL", "http://51.195.102.58/api/recent-blacklists")
+UNBLACKLIST_API_URL = os.getenv("UNBLACKLIST_API_URL", "http://51.195.102.58/api/recent-unblacklists")
+# Full blacklist for the initial local sync; unset or empty skips the bulk sync
+BLACKLIST_SYNC_API_URL = os.getenv("BLACKLIST_SYNC_API_URL", "")
+MOJANG_SESSION_SERVER_URL = os.getenv(
+    "MOJANG_SESSION_SERVER_URL", "https://sessionserver.mojang.com/session/minecraft/profile/"
+)
+REQUEST_TIMEOUT = 10  # seconds, per request including retries of the connection
+MAX_RETRIES = 3  # attempts per call, including the first
+RETRY_DELAY = 1  # second, base of the exponential backoff
+RETRY_MAX_DELAY = 30  # seconds
+RETRY_DEADLINE = float(os.getenv("RETRY_DEADLINE", "30"))  # seconds per call, retries included
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Circuit breaker per upstream
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))  # consecutive failures
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))  # seconds before a trial call
+
+# Incremental feed polling settings
+FEED_PAGE_SIZE = int(os.getenv("FEED_PAGE_SIZE", "100"))
+FEED_MAX_PAGES = int(os.getenv("FEED_MAX_PAGES", "50"))  # per poll, while catching up on a backlog
+SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "1000"))
+# Only the fields the bot uses are requested from unblacklist feeds
+UNBLACKLIST_FEED_PARAMS = {'fields': 'id,offender_uuid,offender_discord_id,offense_type,unban_date'}
+
+# Mojang username cache settings
+USERNAME_CACHE_SIZE = int(os.getenv("USERNAME_CACHE_SIZE", "10000"))
+USERNAME_CACHE_TTL = float(os.getenv("USERNAME_CACHE_TTL", str(24 * 3600)))  # seconds
+USERNAME_CACHE_NEGATIVE_TTL = float(os.getenv("USERNAME_CACHE_NEGATIVE_TTL", "3600"))  # seconds
+# Snapshot file that keeps the cache warm across restarts; empty disables it
+USERNAME_CACHE_SNAPSHOT = os.getenv("USERNAME_CACHE_SNAPSHOT", "data/username_cache.json")
+
+# Upstreams with their own connection pool, so Mojang fan-out cannot starve feed polling
+BLACKLIST_UPSTREAM = "blacklist_api"
+MOJANG_UPSTREAM = "mojang"
+
+# Connection pool defaults per upstream; each can be overridden as HTTP_<UPSTREAM>_<SETTING>,
+# e.g. HTTP_MOJANG_LIMIT_PER_HOST=32
+POOL_DEFAULTS = {
+    BLACKLIST_UPSTREAM: {
+        "LIMIT": 10,  # open connections in total
+        "LIMIT_PER_HOST": 4,
+        "KEEPALIVE": 60,  # seconds an idle connection is kept open
+        "DNS_CACHE_TTL": 300,  # seconds
+        "CONNECT_TIMEOUT": 5,  # seconds
+        "READ_TIMEOUT": 10,  # seconds between received chunks
+    },
+    MOJANG_UPSTREAM: {
+        "LIMIT": 32,
+        "LIMIT_PER_HOST": 16,
+        "KEEPALIVE": 30,
+        "DNS_CACHE_TTL": 300,
+        "CONNECT_TIMEOUT": 3,
+        "READ_TIMEOUT": 5,
+    },
+}
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Global session for connection pooling
-_session = None
+# Sessions keyed by upstream name
+_sessions: Dict[str, ClientSession] = {}
+
+# Feed URLs of additional blacklist sources, keyed to their own upstream (see sources.py)
+_source_upstreams: Dict[str, str] = {}
 
-def get_session() -> ClientSession:
-    """Get or create a global aiohttp session with connection pooling."""
-    global _session
-    if _session is None or _session.closed:
-        timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
-        _session = aiohttp.ClientSession(timeout=timeout, raise_for_status=True)
-    return _session
+def _json_loads(text: str) -> Any:
+    return orjson.loads(text) if orjson else json.loads(text)
+
+def _pool_setting(upstream: str, name: str) -> float:
+    # Additional sources start from the blacklist API's pool settings
+    default = POOL_DEFAULTS.get(upstream, POOL_DEFAULTS[BLACKLIST_UPSTREAM])[name]
+    return float(os.getenv(f"HTTP_{upstream.upper()}_{name}", str(default)))
+
+def register_upstream(url: str, upstream: str) -> None:
+    """Give a feed URL its own connection pool and circuit breaker under ``upstream``."""
+    _source_upstreams[url] = upstream
+
+def _upstream(url: str) -> str:
+    if url.startswith(MOJANG_SESSION_SERVER_URL):
+        return MOJANG_UPSTREAM
+    return _source_upstreams.get(url, BLACKLIST_UPSTREAM)
+
+def get_session(upstream: str = BLACKLIST_UPSTREAM) -> ClientSession:
+    """Get or create the pooled aiohttp session for an upstream."""
+    session = _sessions.get(upstream)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=int(_pool_setting(upstream, "LIMIT")),
+            limit_per_host=int(_pool_setting(upstream, "LIMIT_PER_HOST")),
+            keepalive_timeout=_pool_setting(upstream, "KEEPALIVE"),
+            use_dns_cache=True,
+            ttl_dns_cache=int(_pool_setting(upstream, "DNS_CACHE_TTL"))
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=REQUEST_TIMEOUT,
+            sock_connect=_pool_setting(upstream, "CONNECT_TIMEOUT"),
+            sock_read=_pool_setting(upstream, "READ_TIMEOUT")
+        )
+        session = _sessions[upstream] = aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            headers={"Accept-Encoding": "gzip, deflate"},
+            auto_decompress=True,
+            raise_for_status=True
+        )
+    return session
 
 async def close_session():
-    """Close the global aiohttp session."""
-    global _session
-    if _session and not _session.closed:
-        await _session.close()
-        _session = None
+    """Close every upstream session."""
+    sessions = list(_sessions.values())
+    _sessions.clear()
+    for session in sessions:
+        if not session.closed:
+            await session.close()
+
+def _endpoint(url: str) -> str:
+    """Low-cardinality metric label for an upstream URL."""
+    if url.startswith(MOJANG_SESSION_SERVER_URL):
+        return "mojang"
+    return url.rstrip("/").rsplit("/", 1)[-1]
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds form only), if present."""
+    headers = getattr(error, "headers", None)
+    try:
+        return max(0.0, float(headers.get("Retry-After")))
+    except (AttributeError, TypeError, ValueError):
+        return None
 
 def retry_on_failure(func):
-    """Decorator to retry a function on failure with exponential backoff."""
+    """The single retry layer for upstream requests.
+
+    Connection errors, timeouts, 429s and 5xx responses are retried with
+    full-jitter exponential backoff, waiting for Retry-After when the upstream
+    sends one, as long as the wait fits in the call's deadline budget. Each
+    upstream has a circuit breaker; while it is open calls fail fast with
+    CircuitOpenError instead of waiting out the retries.
+    """
     @wraps(func)
-    async def wrapper(*args, **kwargs):
-        last_error = None
-        for attempt in range(MAX_RETRIES):
+    async def wrapper(url: str, *args, **kwargs):
+        breaker = get_breaker(_upstream(url), BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+        deadline = time.monotonic() + RETRY_DEADLINE
+        attempt = 0
+        while True:
+            breaker.before_call()
             try:
-                return await func(*args, **kwargs)
+                result = await asyncio.wait_for(func(url, *args, **kwargs), deadline - time.monotonic())
             except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-                last_error = e
-                if attempt < MAX_RETRIES - 1:
-                    wait_time = RETRY_DELAY * (2 ** attempt)
-                    logger.warning(
-                        f"Attempt {attempt + 1} failed for {func.__name__}: {e}. "
-                        f"Retrying in {wait_time}s..."
-                    )
-                    await asyncio.sleep(wait_time)
-        logger.error(f"All {MAX_RETRIES} attempts failed for {func.__name__}")
-        if last_error:
-            raise last_error
-        raise Exception("Unknown error occurred")
+                if isinstance(e, ClientResponseError) and e.status not in RETRYABLE_STATUSES:
+                    # The upstream is up and answered; retrying will not change the answer
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                attempt += 1
+                reason = str(e) or type(e).__name__
+                wait_time = _retry_after(e)
+                if wait_time is None:
+                    wait_time = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_DELAY * 2 ** attempt))
+                if attempt >= MAX_RETRIES or breaker.is_open or time.monotonic() + wait_time >= deadline:
+                    logger.error(f"Giving up on {func.__name__} after {attempt} attempt(s): {reason}")
+                    raise
+                metrics.inc("upstream.retries", function=func.__name__)
+                logger.warning(
+                    f"Attempt {attempt} failed for {func.__name__}: {reason}. "
+                    f"Retrying in {wait_time:.1f}s..."
+                )
+                await asyncio.sleep(wait_time)
+            except BaseException:
+                # Cancelled (e.g. by a source timeout) or an unexpected error such as a bad body
+                breaker.abandon_call()
+                raise
+            else:
+                breaker.record_success()
+                return result
     return wrapper
 
 @retry_on_failure
 async def fetch_json(url: str, session: Optional[ClientSession] = None) -> Any:
     """Fetch JSON from a URL with error handling and retries."""
-    session = session or get_session()
+    session = session or get_session(_upstream(url))
     try:
-        async with session.get(url) as response:
-            if response.status == 404:
-                return []
-            return await response.json()
+        with metrics.timed("upstream.fetch", endpoint=_endpoint(url)):
+            async with session.get(url) as response:
+                if response.status == 404:
+                    return []
+                return await response.json(loads=_json_loads)
     except ClientResponseError as e:
         if e.status == 404:
             return []
@@ -80,58 +222,181 @@ async def fetch_json(url: str, session: Optional[ClientSession] = None) -> Any:
         raise
 
 @retry_on_failure
-async def get_recent_blacklists() -> List[Dict]:
-    """Get recent blacklists with retry logic.
-    
+async def fetch_json_conditional(
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    session: Optional[ClientSession] = None
+) -> Tuple[int, Any, Mapping[str, str]]:
+    """Fetch JSON with query parameters and conditional headers.
+
+    Returns:
+        Tuple of status, decoded body (empty list for 304/404) and response headers
+    """
+    session = session or get_session(_upstream(url))
+    try:
+        with metrics.timed("upstream.fetch", endpoint=_endpoint(url)):
+            async with session.get(url, params=params, headers=headers) as response:
+                if response.status in (304, 404):
+                    return response.status, [], CIMultiDict(response.headers)
+                return response.status, await response.json(loads=_json_loads), CIMultiDict(response.headers)
+    except ClientResponseError as e:
+        if e.status == 404:
+            return 404, [], CIMultiDict()
+        logger.error(f"HTTP error {e.status} fetching {url}: {e}")
+        raise
+
+async def fetch_feed(url: str, cursor: FeedCursor, params: Optional[Dict[str, Any]] = None) -> List[Dict]:
+    """Fetch only the feed entries newer than ``cursor``, paging through any backlog.
+
+    The cursor is advanced in memory; callers persist it once the entries have
+    been processed.
+    """
+    entries = []
+    for page in range(FEED_MAX_PAGES):
+        query = dict(params or {}, limit=FEED_PAGE_SIZE)
+        if cursor.position is not None:
+            query["since"] = cursor.position
+        request_position = cursor.position
+        status, data, headers = await fetch_json_conditional(url, query, cursor.conditional_headers())
+        if status == 304:
+            break
+        cursor.set_validators(headers.get("ETag"), headers.get("Last-Modified"), request_position)
+        if not isinstance(data, list):
+            break
+
+        new_entries = [entry for entry in data if isinstance(entry, dict) and cursor.is_new(entry)]
+        entries.extend(new_entries)
+        cursor.advance(new_entries)
+        # A short page, or a page with nothing new (upstream ignored "since"), ends the backlog
+        if not new_entries or len(data) < FEED_PAGE_SIZE:
+            break
+    else:
+        logger.warning(f"Backlog for {url} exceeds {FEED_MAX_PAGES} pages, continuing next poll")
+    return entries
+
+async def get_recent_blacklists(cursor: Optional[FeedCursor] = None, raise_errors: bool = False) -> List[Dict]:
+    """Get blacklists newer than the cursor with retry logic.
+
+    Without a cursor, the whole recent list is returned.
+
+    Args:
+        cursor: Feed cursor to fetch from, advanced in place
+        raise_errors: Re-raise fetch errors instead of returning an empty list
+
     Returns:
         List[Dict]: List of blacklist entries with offender_uuid and offender_discord_id
     """
-    session = get_session()
     try:
-        # Get recent blacklists with all fields
-        return await fetch_json(BLACKLIST_API_URL, session) or []
+        if cursor is None:
+            return await fetch_json(BLACKLIST_API_URL) or []
+        return await fetch_feed(BLACKLIST_API_URL, cursor)
     except Exception as e:
         logger.error(f"Failed to fetch blacklists: {e}")
+        if raise_errors:
+            raise
         return []
 
-@retry_on_failure
-async def get_recent_unblacklists() -> List[Dict]:
-    """Get recent unblacklists with retry logic.
-    
+async def get_recent_unblacklists(cursor: Optional[FeedCursor] = None, raise_errors: bool = False) -> List[Dict]:
+    """Get unblacklists newer than the cursor with retry logic.
+
+    Without a cursor, only the first page of the recent list is returned.
+
+    Args:
+        cursor: Feed cursor to fetch from, advanced in place
+        raise_errors: Re-raise fetch errors instead of returning an empty list
+
     Returns:
         List[Dict]: List of unblacklist entries with offender_uuid and offender_discord_id
     """
-    session = get_session()
+    params = UNBLACKLIST_FEED_PARAMS
     try:
-        params = {
-            'fields': 'offender_uuid,offender_discord_id',
-            'limit': 50
-        }
-        return await fetch_json(f"{UNBLACKLIST_API_URL}?{'&'.join(f'{k}={v}' for k, v in params.items())}", session) or []
+        if cursor is None:
+            _, data, _ = await fetch_json_conditional(
+                UNBLACKLIST_API_URL, dict(params, limit=FEED_PAGE_SIZE)
+            )
+            return data or []
+        return await fetch_feed(UNBLACKLIST_API_URL, cursor, params)
     except Exception as e:
         logger.error(f"Failed to fetch unblacklists: {e}")
+        if raise_errors:
+            raise
         return []
 
-@retry_on_failure
+async def iter_all_blacklists(page_size: int = SYNC_PAGE_SIZE) -> AsyncIterator[List[Dict]]:
+    """Page through the full blacklist with offset/limit requests.
+
+    Raises ValueError when the first page is missing or empty.
+
+    Yields:
+        List[Dict]: One page of blacklist entries
+    """
+    offset = 0
+    previous_first = None
+    while True:
+        status, page, _ = await fetch_json_conditional(
+            BLACKLIST_SYNC_API_URL, {"offset": offset, "limit": page_size}
+        )
+        if offset == 0 and (status == 404 or not isinstance(page, list) or not page):
+            # A missing endpoint or an empty list is never a real full blacklist
+            raise ValueError(f"{BLACKLIST_SYNC_API_URL} returned no blacklist (HTTP {status})")
+        if not isinstance(page, list) or not page:
+            return
+        # Stop if the upstream ignores the offset and keeps returning the same page
+        if page[0] == previous_first:
+            logger.warning(f"{BLACKLIST_SYNC_API_URL} ignored offset={offset}, stopping sync")
+            return
+        previous_first = page[0]
+        yield page
+        if len(page) < page_size:
+            return
+        offset += len(page)
+
+async def _fetch_minecraft_username(uuid: str) -> Optional[str]:
+    """Fetch a Minecraft username from Mojang, returning None for unknown UUIDs.
+
+    Retries happen once, inside fetch_json.
+    """
+    data = await fetch_json(f"{MOJANG_SESSION_SERVER_URL}{uuid}")
+    return data.get("name") if data else None
+
+# Process-wide cache in front of Mojang; 404s are cached as None
+username_cache = AsyncTTLCache(
+    "username_cache",
+    _fetch_minecraft_username,
+    maxsize=USERNAME_CACHE_SIZE,
+    ttl=USERNAME_CACHE_TTL,
+    negative_ttl=USERNAME_CACHE_NEGATIVE_TTL
+)
+
 async def get_minecraft_username(uuid: str) -> Optional[str]:
-    """Get Minecraft username from UUID with retry logic."""
+    """Get Minecraft username from UUID through the username cache."""
     if not uuid:
         return None
-        
-    session = get_session()
-    url = f"{MOJANG_SESSION_SERVER_URL}{uuid}"
+
     try:
-        data = await fetch_json(url, session)
-        return data.get("name") if data else None
-    except ClientResponseError as e:
-        if e.status == 404:
-            logger.debug(f"Minecraft UUID {uuid} not found")
-            return None
-        logger.error(f"Error fetching Minecraft username for {uuid}: {e}")
-        raise
+        return await username_cache.get(uuid.replace("-", "").lower())
+    except CircuitOpenError:
+        # Mojang is down; show "Unknown" without logging every lookup
+        return None
     except Exception as e:
-        logger.error(f"Unexpected error fetching Minecraft username: {e}")
+        logger.error(f"Error fetching Minecraft username for {uuid}: {e}")
         return None
 
-import atexit
-atexit.register(lambda: asyncio.get_event_loop().run_until_complete(close_session()))
\ No newline at end of file
+async def load_username_cache() -> None:
+    """Warm the username cache from its on-disk snapshot, if enabled.
+
+    The file is read on a worker thread; entries are applied on the event loop.
+    """
+    if USERNAME_CACHE_SNAPSHOT:
+        path = Path(USERNAME_CACHE_SNAPSHOT)
+        entries = await asyncio.to_thread(username_cache.read_snapshot, path)
+        username_cache.load_snapshot(path, entries)
+
+def save_username_cache() -> None:
+    """Write the username cache snapshot, if enabled."""
+    if USERNAME_CACHE_SNAPSHOT:
+        try:
+            username_cache.save_snapshot(Path(USERNAME_CACHE_SNAPSHOT))
+        except OSError as e:
+            logger.error(f"Failed to save username cache snapshot: {e}")
@@ -0,0 +1,118 @@
+"""Latency of handle_button_interaction up to the defer and end to end.
+
+Discord is replaced by in-process stubs, so this measures only our own work.
+Run from the repository root:
+
+    python benchmarks/bench_interaction.py
+"""
+import sys
+import time
+import asyncio
+import statistics
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import discord
+
+import permissions
+from embeds import create_blacklist_embed, BlacklistButtons
+from handlers import handle_button_interaction, parse_custom_id
+
+ITERATIONS = 2000
+GUILD_ID = 1
+MOD_ROLE_ID = 42
+CUSTOM_ID = "accept_ban:1234:069a79f4-44e9-4726-a5be-fca90e38aaf5"
+
+class FakeMember(discord.Member):
+    """Just enough of a Member for the permission check."""
+
+    def __init__(self, member_id: int, role_ids):
+        self._fake_id = member_id
+        self._fake_roles = set(role_ids)
+
+    @property
+    def id(self):
+        return self._fake_id
+
+    @property
+    def display_name(self):
+        return f"member-{self._fake_id}"
+
+    def get_role(self, role_id):
+        return role_id if role_id in self._fake_roles else None
+
+    def __str__(self):
+        return self.display_name
+
+class FakeScheduler:
+    async def followup(self, interaction, *args, **kwargs):
+        pass
+
+    async def edit_message(self, interaction, message, **kwargs):
+        pass
+
+class FakeResponse:
+    def __init__(self, timings):
+        self.timings = timings
+
+    async def defer(self, **kwargs):
+        self.timings.append(time.perf_counter())
+
+def make_interaction(embed, components, timings):
+    guild = SimpleNamespace(id=GUILD_ID, owner_id=0, name="bench")
+
+    async def ban(user, **kwargs):
+        pass
+
+    guild.get_member = lambda discord_id: None
+    guild.ban = ban
+    message = SimpleNamespace(id=99, embeds=[embed], components=components)
+
+    async def fetch_message(message_id):
+        return message
+
+    return SimpleNamespace(
+        guild=guild,
+        guild_id=GUILD_ID,
+        user=FakeMember(7, range(MOD_ROLE_ID - 100, MOD_ROLE_ID + 100)),
+        channel=SimpleNamespace(fetch_message=fetch_message),
+        message=message,
+        data={"custom_id": CUSTOM_ID},
+        response=FakeResponse(timings),
+        client=SimpleNamespace(send_scheduler=FakeScheduler()),
+    )
+
+def percentile(samples, fraction):
+    return sorted(samples)[int(len(samples) * fraction) - 1]
+
+async def run():
+    permissions._moderator_roles[GUILD_ID] = MOD_ROLE_ID
+    embed = create_blacklist_embed(
+        {"offender_uuid": "069a79f4-44e9-4726-a5be-fca90e38aaf5", "offender_discord_id": 1234,
+         "offense_type": "cheating", "ban_date": "2024-01-01"},
+        "Notch"
+    )
+    # The buttons as the fetched message would carry them
+    _, discord_id, event_id = parse_custom_id(CUSTOM_ID)
+    components = [discord.ActionRow(row) for row in BlacklistButtons(discord_id, event_id).to_components()]
+    to_defer, total = [], []
+    for _ in range(ITERATIONS):
+        defer_times = []
+        interaction = make_interaction(embed, components, defer_times)
+        start = time.perf_counter()
+        action, discord_id, event_id = parse_custom_id(CUSTOM_ID)
+        await handle_button_interaction(interaction, action, discord_id=discord_id, event_id=event_id)
+        end = time.perf_counter()
+        to_defer.append(defer_times[0] - start)
+        total.append(end - start)
+
+    for name, samples in (("time to defer", to_defer), ("total", total)):
+        print(
+            f"{name:>14}: p50={statistics.median(samples) * 1e6:7.1f}us "
+            f"p99={percentile(samples, 0.99) * 1e6:7.1f}us"
+        )
+
+if __name__ == "__main__":
+    asyncio.run(run())
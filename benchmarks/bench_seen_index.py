@@ -0,0 +1,43 @@
+"""Per-tick dedup cost of SeenIndex as the retained history grows.
+
+Run from the repository root:
+
+    python benchmarks/bench_seen_index.py
+"""
+import os
+import sys
+import time
+import uuid
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from seen_index import SeenIndex
+
+EVENTS_PER_TICK = 500
+TICKS = 20
+HISTORY_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+def run(history: int) -> float:
+    index = SeenIndex("bench", ttl=10 ** 9, max_entries=history + EVENTS_PER_TICK * TICKS)
+    index.load()
+    index.mark_seen(1, (str(uuid.uuid4()) for _ in range(history)))
+    # Half of every tick is already known, half is new
+    known = [str(uuid.UUID(bytes=key)) for key in list(index._seen[1])[:EVENTS_PER_TICK // 2]]
+
+    elapsed = 0.0
+    for _ in range(TICKS):
+        feed = known + [str(uuid.uuid4()) for _ in range(EVENTS_PER_TICK // 2)]
+        start = time.perf_counter()
+        new_ids = [event_id for event_id in feed if not index.is_seen(1, event_id)]
+        index.mark_seen(1, new_ids)
+        elapsed += time.perf_counter() - start
+    return elapsed / TICKS
+
+if __name__ == "__main__":
+    # The index keeps its table in data/bot.db under the working directory
+    os.chdir(tempfile.mkdtemp(prefix="bench-seen-"))
+    print(f"{'history':>10}  {'per tick':>10}")
+    for history in HISTORY_SIZES:
+        print(f"{history:>10}  {run(history) * 1000:>8.3f}ms")
@@ -0,0 +1,110 @@
+"""Stub Discord layer for offline benchmarks.
+
+Guilds and log channels are in-memory objects that pass the bot's type checks.
+Channel sends, message edits and bans sleep for a configurable latency, fail
+with a 429 at a configurable rate, and are counted as REST calls. Payloads are
+serialized the way discord.py would before sending, so that cost is included.
+"""
+import random
+import asyncio
+from collections import Counter
+from types import SimpleNamespace
+from typing import Dict, Iterable, Optional
+
+import discord
+
+class FakeDiscord:
+    """Counts and paces every REST call made through the fake channels.
+
+    Args:
+        latency: Seconds each REST call takes
+        rate_limit_ratio: Fraction of calls answered with a 429
+    """
+
+    def __init__(self, latency: float = 0.05, rate_limit_ratio: float = 0.0):
+        self.latency = latency
+        self.rate_limit_ratio = rate_limit_ratio
+        self.calls: Counter = Counter()
+        self.guilds: Dict[int, SimpleNamespace] = {}
+        self._message_ids = 0
+
+    async def request(self, route: str) -> None:
+        """Simulate one REST call to ``route``."""
+        self.calls[route] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.rate_limit_ratio and random.random() < self.rate_limit_ratio:
+            self.calls["429"] += 1
+            raise discord.HTTPException(SimpleNamespace(status=429, reason="Too Many Requests"), "You are being rate limited.")
+
+    def add_guild(self, guild_id: int, channel_id: int, member_ids: Iterable[int] = ()) -> SimpleNamespace:
+        guild = SimpleNamespace(
+            id=guild_id,
+            name=f"guild-{guild_id}",
+            chunked=True,
+            members=[SimpleNamespace(id=member_id) for member_id in member_ids],
+            owner_id=0,
+        )
+        channel = FakeTextChannel.create(self, guild, channel_id)
+        guild.get_channel = lambda cid: channel if cid == channel_id else None
+        guild.get_member = lambda member_id: None
+
+        async def ban(user, **kwargs):
+            await self.request("ban")
+
+        async def bulk_ban(users, **kwargs):
+            await self.request("bulk_ban")
+            return SimpleNamespace(banned=list(users), failed=[])
+
+        guild.ban = ban
+        guild.bulk_ban = bulk_ban
+        self.guilds[guild_id] = guild
+        return guild
+
+    def get_guild(self, guild_id: int) -> Optional[SimpleNamespace]:
+        return self.guilds.get(guild_id)
+
+    def next_message_id(self) -> int:
+        self._message_ids += 1
+        return self._message_ids
+
+class FakeMessage:
+    def __init__(self, discord_stub: FakeDiscord, channel: "FakeTextChannel", embeds):
+        self._discord = discord_stub
+        self.id = discord_stub.next_message_id()
+        self.channel = channel
+        self.guild = channel.guild
+        self.embeds = embeds
+
+    async def edit(self, **kwargs) -> "FakeMessage":
+        _serialize(kwargs)
+        await self._discord.request("edit_message")
+        if "embeds" in kwargs or "embed" in kwargs:
+            self.embeds = kwargs.get("embeds") or [kwargs["embed"]]
+        return self
+
+class FakeTextChannel(discord.TextChannel):
+    """A TextChannel that posts into a FakeDiscord instead of the API."""
+
+    @classmethod
+    def create(cls, discord_stub: FakeDiscord, guild, channel_id: int) -> "FakeTextChannel":
+        channel = cls.__new__(cls)
+        channel.id = channel_id
+        channel.name = f"log-{channel_id}"
+        channel.guild = guild
+        channel._discord = discord_stub
+        return channel
+
+    async def send(self, content=None, **kwargs) -> FakeMessage:
+        _serialize(kwargs)
+        await self._discord.request("send_message")
+        return FakeMessage(self._discord, self, kwargs.get("embeds") or [kwargs.get("embed")])
+
+def _serialize(kwargs) -> None:
+    """Build the JSON payload pieces discord.py would build for the request."""
+    for embed in kwargs.get("embeds") or [kwargs.get("embed")]:
+        if embed is not None:
+            embed.to_dict()
+    view = kwargs.get("view")
+    if view is not None:
+        view.to_components()
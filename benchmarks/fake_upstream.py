@@ -0,0 +1,164 @@
+"""Local stand-in for the blacklist API and the Mojang session server.
+
+Serves the recent-blacklists, recent-unblacklists and full blacklist feeds
+with ``since``/``limit`` paging, plus Mojang profile lookups, and counts every
+request. Entries are synthesized on demand, or played back from a recorded
+feed file shaped like ``{"blacklists": [...], "unblacklists": [...]}``.
+
+Used by benchmarks/loadtest.py; it can also be run on its own and the bot
+pointed at it through BLACKLIST_API_URL, UNBLACKLIST_API_URL and
+MOJANG_SESSION_SERVER_URL:
+
+    python benchmarks/fake_upstream.py --port 9200 --rate 5
+"""
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional, Sequence
+
+from aiohttp import web
+
+class FakeUpstream:
+    """In-memory blacklist feeds behind a local aiohttp server.
+
+    Args:
+        offender_ids: Discord IDs new blacklists are drawn from, so tests can
+            control which guilds the offenders are members of
+        latency: Seconds added to every response
+        recorded: Path of a recorded feed to play back instead of synthesizing
+    """
+
+    def __init__(
+        self,
+        offender_ids: Optional[Sequence[int]] = None,
+        latency: float = 0.0,
+        recorded: Optional[str] = None
+    ):
+        self.offender_ids = offender_ids
+        self.latency = latency
+        self.blacklists: List[Dict] = []
+        self.unblacklists: List[Dict] = []
+        self.requests: Counter = Counter()
+        self._next_id = 1
+        self._backlog: Dict[str, Deque[Dict]] = {"blacklists": deque(), "unblacklists": deque()}
+        if recorded:
+            with open(recorded) as f:
+                data = json.load(f)
+            for feed in self._backlog:
+                self._backlog[feed].extend(data.get(feed, []))
+        self._runner: Optional[web.AppRunner] = None
+
+    def _stamp(self, entry: Dict) -> Dict:
+        entry = dict(entry, id=self._next_id)
+        self._next_id += 1
+        return entry
+
+    def publish(self, blacklists: int = 0, unblacklists: int = 0) -> None:
+        """Make new entries visible in the feeds."""
+        now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        for _ in range(blacklists):
+            if self._backlog["blacklists"]:
+                entry = self._backlog["blacklists"].popleft()
+            else:
+                discord_id = random.choice(self.offender_ids) if self.offender_ids else random.randint(10 ** 17, 10 ** 18)
+                entry = {
+                    "offender_uuid": str(uuid.uuid4()),
+                    "offender_discord_id": str(discord_id),
+                    "offense_type": "Load test",
+                    "ban_date": now,
+                }
+            self.blacklists.append(self._stamp(entry))
+        for _ in range(unblacklists):
+            if self._backlog["unblacklists"]:
+                entry = self._backlog["unblacklists"].popleft()
+            elif self.blacklists:
+                banned = random.choice(self.blacklists)
+                entry = {
+                    "offender_uuid": banned["offender_uuid"],
+                    "offender_discord_id": banned["offender_discord_id"],
+                    "offense_type": banned["offense_type"],
+                    "unban_date": now,
+                }
+            else:
+                continue
+            self.unblacklists.append(self._stamp(entry))
+
+    async def _delay(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _page(self, entries: List[Dict], request: web.Request) -> List[Dict]:
+        limit = int(request.query.get("limit", 100))
+        if "offset" in request.query:
+            start = int(request.query["offset"])
+            return entries[start:start + limit]
+        since = request.query.get("since")
+        if since is not None:
+            # Ids are assigned in order, so the first newer entry is at index ``since``
+            return entries[int(float(since)):][:limit]
+        return entries[-limit:]
+
+    async def _feed(self, request: web.Request) -> web.Response:
+        feed = request.match_info["feed"]
+        self.requests[feed] += 1
+        await self._delay()
+        entries = {"recent-blacklists": self.blacklists, "recent-unblacklists": self.unblacklists,
+                   "blacklists": self.blacklists}.get(feed)
+        if entries is None:
+            raise web.HTTPNotFound()
+        return web.json_response(self._page(entries, request))
+
+    async def _profile(self, request: web.Request) -> web.Response:
+        self.requests["mojang"] += 1
+        await self._delay()
+        player = request.match_info["uuid"]
+        return web.json_response({"id": player, "name": f"player_{player[:8]}"})
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        app = web.Application()
+        app.router.add_get("/api/{feed}", self._feed)
+        app.router.add_get("/session/minecraft/profile/{uuid}", self._profile)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.host = host
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+async def serve(args) -> None:
+    upstream = FakeUpstream(latency=args.latency, recorded=args.recorded)
+    await upstream.start(port=args.port)
+    print(f"BLACKLIST_API_URL={upstream.base_url}/api/recent-blacklists")
+    print(f"UNBLACKLIST_API_URL={upstream.base_url}/api/recent-unblacklists")
+    print(f"BLACKLIST_SYNC_API_URL={upstream.base_url}/api/blacklists")
+    print(f"MOJANG_SESSION_SERVER_URL={upstream.base_url}/session/minecraft/profile/")
+    try:
+        while True:
+            upstream.publish(blacklists=args.rate)
+            await asyncio.sleep(1)
+    finally:
+        await upstream.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve fake blacklist and Mojang APIs")
+    parser.add_argument("--port", type=int, default=9200)
+    parser.add_argument("--rate", type=int, default=1, help="new blacklists per second")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--recorded", help="recorded feed JSON to play back")
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
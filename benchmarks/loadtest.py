@@ -0,0 +1,236 @@
+"""Offline load test of the poll, fan-out and delivery pipeline.
+
+Runs the real poll_apis, process_guild_updates, outbox and send scheduler
+against benchmarks/fake_upstream.py and benchmarks/fake_discord.py, with
+thousands of guilds, and reports tick duration percentiles, throughput, peak
+memory and REST-call counts. Nothing leaves the machine: state lives in a
+temporary directory, and Discord's global send rate is lifted (unless
+--discord-rate is given) so the numbers measure our own code. Other bot
+settings, such as SEND_WORKERS or OUTBOX_WORKERS, are read from the environment
+as usual. Button handling is covered separately by bench_interaction.py.
+
+Run every scenario, each in a fresh process, from the repository root:
+
+    python benchmarks/loadtest.py
+
+Or one scenario, with overrides, failing if the p95 tick exceeds a budget:
+
+    python benchmarks/loadtest.py --scenario burst --guilds 2000 --max-tick-p95 500
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import resource
+import tempfile
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_upstream import FakeUpstream
+from fake_discord import FakeDiscord
+
+OFFENDER_POOL_SIZE = 50_000
+DRAIN_TIMEOUT = 120  # seconds to wait for the outbox to empty after the last tick
+
+SCENARIOS = {
+    # A typical day: a few events per tick, most guilds only care about members
+    "steady": dict(guilds=500, blacklists=20, unblacklists=1, ticks=5, members=200,
+                   auto_scan=True, delivery="individual", auto_ban="off", latency=0.05, rate_limit_ratio=0.0),
+    # A mass ban wave hitting a large deployment
+    "burst": dict(guilds=5000, blacklists=500, unblacklists=0, ticks=3, members=50,
+                  auto_scan=True, delivery="individual", auto_ban="off", latency=0.02, rate_limit_ratio=0.0),
+    # Unblacklists and auto-scan off reach every guild; post ten events to a message
+    "fanout": dict(guilds=1000, blacklists=20, unblacklists=0, ticks=3, members=0,
+                   auto_scan=False, delivery="batched", auto_ban="off", latency=0.02, rate_limit_ratio=0.0),
+    # Slow REST calls and frequent 429s exercise the outbox retries
+    "rate-limited": dict(guilds=100, blacklists=2, unblacklists=0, ticks=3, members=0,
+                         auto_scan=False, delivery="individual", auto_ban="off", latency=0.1, rate_limit_ratio=0.1),
+    # The burst again, with every guild auto-banning blacklisted members
+    "auto-ban": dict(guilds=5000, blacklists=500, unblacklists=0, ticks=3, members=50,
+                     auto_scan=True, delivery="individual", auto_ban="members", latency=0.02, rate_limit_ratio=0.0),
+    # Three sources reporting the same events, merged into one delivery each
+    "multi-source": dict(guilds=500, blacklists=50, unblacklists=1, ticks=3, members=200, sources=3,
+                         auto_scan=True, delivery="individual", auto_ban="off", latency=0.05, rate_limit_ratio=0.0),
+}
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+async def setup_bot(main):
+    """The parts of setup_hook the pipeline needs, without logging in to Discord."""
+    from outbox import Outbox
+    from sources import load_cursors
+
+    bot = main.bot
+    bot.cursors = load_cursors(bot.sources)
+    bot.blacklist_store.load()
+    for seen in bot.seen.values():
+        seen.load()
+    bot.write_behind.start()
+    bot.send_scheduler.start()
+    bot.outbox = Outbox(main.deliver_to_guild)
+    bot.outbox.load()
+    bot.outbox.start()
+    return bot
+
+async def teardown_bot(bot, api, storage):
+    await bot.outbox.stop()
+    await bot.send_scheduler.stop()
+    await bot.write_behind.stop()
+    await api.close_session()
+    storage.close_connection()
+
+async def run(options: dict, discord_rate: bool) -> dict:
+    pool = list(range(10 ** 17, 10 ** 17 + OFFENDER_POOL_SIZE))
+    upstream = FakeUpstream(offender_ids=pool)
+    await upstream.start()
+
+    # Point the bot at the fakes before any of its modules read their settings
+    os.environ.update({
+        "DISCORD_TOKEN": "loadtest",
+        "BLACKLIST_API_URL": f"{upstream.base_url}/api/recent-blacklists",
+        "UNBLACKLIST_API_URL": f"{upstream.base_url}/api/recent-unblacklists",
+        "BLACKLIST_SYNC_API_URL": "",
+        "MOJANG_SESSION_SERVER_URL": f"{upstream.base_url}/session/minecraft/profile/",
+        "USERNAME_CACHE_SNAPSHOT": "",
+        "METRICS_PORT": "0",
+        "PUSH_PORT": "0",
+    })
+    # Extra sources are mirrors of the same fake feeds, so every event is reported by each
+    names = ["primary"] + [f"mirror{i}" for i in range(1, options.get("sources", 1))]
+    os.environ["BLACKLIST_SOURCES"] = ",".join(names)
+    for name in names[1:]:
+        os.environ[f"SOURCE_{name.upper()}_BLACKLIST_URL"] = f"{upstream.base_url}/api/recent-blacklists"
+        os.environ[f"SOURCE_{name.upper()}_UNBLACKLIST_URL"] = f"{upstream.base_url}/api/recent-unblacklists"
+    if not discord_rate:
+        os.environ.setdefault("SEND_GLOBAL_RATE", "100000")
+    import main
+    import api
+    import storage
+    from guild_config import load_config, ensure_guild_config, save_config
+    # Simulated failures are counted below; logging each one would bury the report
+    logging.disable(logging.ERROR)
+
+    fake = FakeDiscord(latency=options["latency"], rate_limit_ratio=options["rate_limit_ratio"])
+    config = load_config()
+    for i in range(options["guilds"]):
+        # Spread the guilds over shards the way real snowflakes are
+        guild_id = (i + 1) << 22
+        guild = fake.add_guild(guild_id, guild_id + 1, random.sample(pool, options["members"]))
+        main.bot.member_index.build(guild)
+        guild_data = ensure_guild_config(config, guild_id)
+        guild_data.update(logChannelId=str(guild_id + 1), autoScan=options["auto_scan"],
+                          deliveryMode=options["delivery"], autoBan=options["auto_ban"])
+    save_config(config)
+    main.bot.get_guild = fake.get_guild
+    bot = await setup_bot(main)
+
+    # A cold cursor only reads the newest page, so start from a known position
+    upstream.publish(blacklists=1)
+    await main.poll_apis()
+    await bot.write_behind.flush()
+    fake.calls.clear()
+    upstream.requests.clear()
+
+    started = time.perf_counter()
+    durations, events = [], 0
+    for _ in range(options["ticks"]):
+        upstream.publish(options["blacklists"], options["unblacklists"])
+        tick_start = time.perf_counter()
+        events += await main.poll_apis()
+        durations.append(time.perf_counter() - tick_start)
+        await asyncio.sleep(0)
+
+    deadline = time.monotonic() + DRAIN_TIMEOUT
+    while (bot.outbox.pending() or bot.send_scheduler.depth) and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    drained = time.perf_counter() - started
+    pending = bot.outbox.pending()
+    await teardown_bot(bot, api, storage)
+    await upstream.stop()
+
+    sent = fake.calls["send_message"] - fake.calls["429"]
+    return {
+        "ticks": len(durations),
+        "events": events,
+        "tick_p50_ms": percentile(durations, 0.5) * 1000,
+        "tick_p95_ms": percentile(durations, 0.95) * 1000,
+        "tick_p99_ms": percentile(durations, 0.99) * 1000,
+        "tick_max_ms": max(durations) * 1000,
+        "events_per_s": events / sum(durations) if sum(durations) else 0.0,
+        "messages_sent": sent,
+        "messages_per_s": sent / drained if drained else 0.0,
+        "drain_s": drained,
+        "outbox_pending": pending,
+        "rest_calls": dict(fake.calls),
+        "upstream_requests": dict(upstream.requests),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+def report(name: str, options: dict, result: dict) -> None:
+    print(f"== {name}: {options['guilds']} guilds, {options['blacklists']} blacklists + "
+          f"{options['unblacklists']} unblacklists per tick from {options.get('sources', 1)} source(s), "
+          f"{options['ticks']} ticks")
+    print(f"   tick      p50={result['tick_p50_ms']:.1f}ms p95={result['tick_p95_ms']:.1f}ms "
+          f"p99={result['tick_p99_ms']:.1f}ms max={result['tick_max_ms']:.1f}ms")
+    print(f"   ingest    {result['events']} events, {result['events_per_s']:.0f} events/s of tick time")
+    print(f"   delivery  {result['messages_sent']} messages in {result['drain_s']:.1f}s "
+          f"({result['messages_per_s']:.0f}/s), {result['outbox_pending']} left pending")
+    print(f"   REST      {result['rest_calls']}")
+    print(f"   upstream  {result['upstream_requests']}")
+    print(f"   memory    peak RSS {result['peak_rss_mb']:.0f}MB")
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline load test of the bot pipeline")
+    parser.add_argument("--scenario", choices=["all", *SCENARIOS], default="all")
+    for option in ("guilds", "blacklists", "unblacklists", "ticks", "members", "sources"):
+        parser.add_argument(f"--{option}", type=int)
+    parser.add_argument("--latency", type=float, help="seconds per Discord REST call")
+    parser.add_argument("--rate-limit-ratio", type=float, help="fraction of REST calls answered with 429")
+    parser.add_argument("--discord-rate", action="store_true", help="keep Discord's global send rate limit")
+    parser.add_argument("--max-tick-p95", type=float, help="fail if any scenario's p95 tick exceeds this many ms")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    if args.scenario == "all":
+        # Each scenario gets a fresh process, so memory and module state do not carry over
+        failed = False
+        passthrough = [arg for arg in sys.argv[1:] if arg not in ("--scenario", "all")]
+        for name in SCENARIOS:
+            command = [sys.executable, __file__, "--scenario", name, *passthrough]
+            failed |= subprocess.run(command).returncode != 0
+        return 1 if failed else 0
+
+    options = dict(SCENARIOS[args.scenario])
+    for option in ("guilds", "blacklists", "unblacklists", "ticks", "members", "sources", "latency", "rate_limit_ratio"):
+        if getattr(args, option) is not None:
+            options[option] = getattr(args, option)
+
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as workdir:
+        os.chdir(workdir)
+        result = asyncio.run(run(options, args.discord_rate))
+        os.chdir(ROOT)
+
+    if args.json:
+        print(json.dumps({"scenario": args.scenario, "options": options, **result}))
+    else:
+        report(args.scenario, options, result)
+    if args.max_tick_p95 is not None and result["tick_p95_ms"] > args.max_tick_p95:
+        print(f"FAIL: {args.scenario} p95 tick {result['tick_p95_ms']:.1f}ms exceeds {args.max_tick_p95}ms")
+        return 1
+    if result["outbox_pending"]:
+        print(f"FAIL: {args.scenario} left {result['outbox_pending']} deliveries undelivered")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
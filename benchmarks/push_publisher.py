@@ -0,0 +1,159 @@
+"""Stand-in publisher for the push receiver.
+
+Posts signed batches of synthetic blacklist events and reports how long the
+receiver took to accept each one. Against a running bot (PUSH_PORT and
+PUSH_SECRET set), run from the repository root:
+
+    python benchmarks/push_publisher.py --url http://127.0.0.1:9109/webhook/events --secret <PUSH_SECRET>
+
+With --local the bot's own receiver and pipeline run in-process, the way
+loadtest.py runs them: pushed events go through ingest_pushed, username
+resolution against benchmarks/fake_upstream.py, the fan-out to --guilds guilds
+and the outbox, and are delivered to benchmarks/fake_discord.py. The accept
+latency then covers everything up to the outbox write, and the report adds how
+long delivery took:
+
+    python benchmarks/push_publisher.py --local --guilds 100 --batches 5
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import aiohttp
+
+from push_receiver import sign, SIGNATURE_HEADER, TIMESTAMP_HEADER
+
+LOCAL_PORT = 9199
+LOCAL_SECRET = "local-test-secret"
+
+def make_event(kind: str) -> dict:
+    entry = {
+        "offender_uuid": str(uuid.uuid4()),
+        "offender_discord_id": str(random.randint(10 ** 17, 10 ** 18)),
+        "offense_type": "Stand-in offense",
+        "ban_date": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    if kind == "unblacklist":
+        entry["unban_date"] = entry["ban_date"]
+    return {"type": kind, "data": entry}
+
+async def publish(session: aiohttp.ClientSession, url: str, secret: str, events: list) -> float:
+    """Post one signed batch; returns the seconds until the receiver answered."""
+    body = json.dumps({"events": events}).encode()
+    timestamp = str(int(time.time()))
+    headers = {
+        "Content-Type": "application/json",
+        TIMESTAMP_HEADER: timestamp,
+        SIGNATURE_HEADER: sign(secret, timestamp, body),
+    }
+    start = time.perf_counter()
+    async with session.post(url, data=body, headers=headers) as resp:
+        result = await resp.json()
+        if resp.status != 200:
+            raise RuntimeError(f"Receiver answered {resp.status}: {result}")
+    return time.perf_counter() - start
+
+async def start_local(args, upstream):
+    """Start the bot's pipeline and push receiver against the fakes, without logging in to Discord."""
+    os.environ.update({
+        "DISCORD_TOKEN": "push-publisher",
+        "BLACKLIST_SYNC_API_URL": "",
+        "MOJANG_SESSION_SERVER_URL": f"{upstream.base_url}/session/minecraft/profile/",
+        "USERNAME_CACHE_SNAPSHOT": "",
+        "METRICS_PORT": "0",
+        "SEND_GLOBAL_RATE": os.environ.get("SEND_GLOBAL_RATE", "100000"),
+    })
+    import main
+    from fake_discord import FakeDiscord
+    from loadtest import setup_bot
+    from guild_config import load_config, ensure_guild_config, save_config
+    logging.disable(logging.ERROR)
+
+    fake = FakeDiscord(latency=args.latency)
+    config = load_config()
+    for i in range(args.guilds):
+        guild_id = (i + 1) << 22
+        fake.add_guild(guild_id, guild_id + 1)
+        # Pushed offenders are nobody's members, so post every event
+        ensure_guild_config(config, guild_id).update(logChannelId=str(guild_id + 1), autoScan=False)
+    save_config(config)
+    main.bot.get_guild = fake.get_guild
+    bot = await setup_bot(main)
+    bot.push_receiver.secret = LOCAL_SECRET
+    await bot.push_receiver.start("127.0.0.1", LOCAL_PORT)
+    args.url = f"http://127.0.0.1:{LOCAL_PORT}/webhook/events"
+    args.secret = LOCAL_SECRET
+    return bot, fake
+
+async def run(args) -> None:
+    bot = fake = upstream = None
+    if args.local:
+        from fake_upstream import FakeUpstream
+        upstream = FakeUpstream()
+        await upstream.start()
+        bot, fake = await start_local(args, upstream)
+
+    latencies = []
+    try:
+        async with aiohttp.ClientSession() as session:
+            started = time.perf_counter()
+            for _ in range(args.batches):
+                events = [make_event(args.kind) for _ in range(args.batch_size)]
+                latencies.append(await publish(session, args.url, args.secret, events))
+                if args.interval:
+                    await asyncio.sleep(args.interval)
+        if bot:
+            while bot.outbox.pending() or bot.send_scheduler.depth:
+                await asyncio.sleep(0.05)
+            delivered = time.perf_counter() - started
+    finally:
+        if bot:
+            import api
+            import storage
+            from loadtest import teardown_bot
+            await bot.push_receiver.stop()
+            await teardown_bot(bot, api, storage)
+            await upstream.stop()
+
+    latencies.sort()
+    print(f"published {args.batches} batch(es) of {args.batch_size} {args.kind} event(s)")
+    print(f"accept latency: median {statistics.median(latencies) * 1000:.2f}ms, "
+          f"p99 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000:.2f}ms, "
+          f"max {latencies[-1] * 1000:.2f}ms")
+    if bot:
+        print(f"delivered {fake.calls['send_message'] - fake.calls['429']} message(s) to {args.guilds} guild(s) "
+              f"in {delivered:.2f}s after the first push")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:9109/webhook/events")
+    parser.add_argument("--secret", default="")
+    parser.add_argument("--local", action="store_true", help="run the bot's receiver and pipeline in-process")
+    parser.add_argument("--guilds", type=int, default=100, help="guilds to deliver to with --local")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per Discord REST call with --local")
+    parser.add_argument("--kind", choices=["blacklist", "unblacklist"], default="blacklist")
+    parser.add_argument("--batches", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--interval", type=float, default=0, help="seconds between batches")
+    args = parser.parse_args()
+    if not args.local and not args.secret:
+        parser.error("--secret is required unless --local is given")
+    if args.local:
+        # The bot keeps its state under the working directory
+        os.chdir(tempfile.mkdtemp(prefix="push-publisher-"))
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import json
+import time
+import asyncio
+import logging
+from typing import AsyncIterator, Callable, Dict, Iterable, KeysView, List, Optional, Set
+
+from storage import transaction, fetch_all
+
+logger = logging.getLogger(__name__)
+
+def offender_discord_id(entry: Dict) -> Optional[int]:
+    """Return an entry's offender Discord ID as an int, if it has a valid one."""
+    try:
+        return int(entry.get("offender_discord_id"))
+    except (TypeError, ValueError):
+        return None
+
+def normalize_uuid(uuid: str) -> str:
+    """Canonical lookup key for a Minecraft UUID (lowercase, no dashes)."""
+    return str(uuid).replace("-", "").lower()
+
+class BlacklistStore:
+    """Local replica of every active blacklist entry.
+
+    Entries are indexed in memory by Minecraft UUID and by offender Discord ID,
+    so lookups never touch the network or the disk. The replica is seeded by a
+    bulk paginated sync and then kept current from the blacklist and unblacklist
+    feeds. Changes are written to the database on ``flush``.
+    """
+
+    def __init__(self):
+        self._by_uuid: Dict[str, Dict] = {}
+        self._by_discord_id: Dict[int, Set[str]] = {}
+        self._upserts: Set[str] = set()
+        self._deletes: Set[str] = set()
+        self.synced_at: Optional[float] = None
+        # Feed changes seen while a bulk sync is downloading, replayed after the swap
+        self._journal: Optional[List[tuple]] = None
+
+    def load(self) -> None:
+        """Create the backing tables and load every active entry."""
+        with transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS blacklist ("
+                "uuid TEXT PRIMARY KEY, discord_id INTEGER, data TEXT NOT NULL)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS blacklist_meta (key TEXT PRIMARY KEY, value TEXT)")
+
+        for uuid, entry in self._read_rows():
+            self._index(uuid, entry)
+        self.synced_at = self.stored_synced_at()
+        logger.info(f"Loaded {len(self._by_uuid)} local blacklist entries")
+
+    @staticmethod
+    def _read_rows() -> List[tuple]:
+        return [(uuid, json.loads(data)) for uuid, data in fetch_all("SELECT uuid, data FROM blacklist")]
+
+    @staticmethod
+    def stored_synced_at() -> Optional[float]:
+        """When the stored replica was last bulk-synced, by any process sharing the database."""
+        rows = fetch_all("SELECT value FROM blacklist_meta WHERE key = 'synced_at'")
+        return float(rows[0][0]) if rows else None
+
+    async def reload_if_synced(self) -> bool:
+        """Reload the replica if another process bulk-synced the database since it was loaded.
+
+        Rows are read and parsed off the event loop. Changes made here that are
+        not flushed yet, or that arrive while reading, are applied on top.
+        Returns whether the replica was reloaded.
+        """
+        synced_at = self.stored_synced_at()
+        if synced_at is None or self._journal is not None or (self.synced_at or 0) >= synced_at:
+            return False
+        fresh = BlacklistStore()
+        self._journal = []
+        try:
+            for uuid, entry in await asyncio.to_thread(self._read_rows):
+                fresh._index(uuid, entry)
+            for uuid in self._upserts:
+                fresh._index(uuid, self._by_uuid[uuid])
+            for uuid in self._deletes:
+                fresh._unindex(uuid)
+            self._by_uuid, self._by_discord_id = fresh._by_uuid, fresh._by_discord_id
+            journal, self._journal = self._journal, None
+            for apply, entries in journal:
+                apply(entries)
+        finally:
+            self._journal = None
+        self.synced_at = synced_at
+        logger.info(f"Reloaded {len(self._by_uuid)} blacklist entries synced by another process")
+        return True
+
+    @staticmethod
+    def _row(entry: Dict) -> tuple:
+        return normalize_uuid(entry["offender_uuid"]), offender_discord_id(entry), json.dumps(entry)
+
+    def _index(self, uuid: str, entry: Dict) -> None:
+        self._unindex(uuid)
+        self._by_uuid[uuid] = entry
+        discord_id = offender_discord_id(entry)
+        if discord_id is not None:
+            self._by_discord_id.setdefault(discord_id, set()).add(uuid)
+
+    def _unindex(self, uuid: str) -> Optional[Dict]:
+        entry = self._by_uuid.pop(uuid, None)
+        if entry is None:
+            return None
+        discord_id = offender_discord_id(entry)
+        uuids = self._by_discord_id.get(discord_id)
+        if uuids is not None:
+            uuids.discard(uuid)
+            if not uuids:
+                del self._by_discord_id[discord_id]
+        return entry
+
+    def get(self, discord_id: int) -> Optional[Dict]:
+        """Return one active entry for an offender Discord ID."""
+        uuids = self._by_discord_id.get(discord_id)
+        if not uuids:
+            return None
+        return self._by_uuid[next(iter(uuids))]
+
+    def get_all(self, discord_id: int) -> List[Dict]:
+        """Return every active entry (one per Minecraft account) for a Discord ID."""
+        return [self._by_uuid[uuid] for uuid in self._by_discord_id.get(discord_id, ())]
+
+    def get_by_uuid(self, uuid: str) -> Optional[Dict]:
+        return self._by_uuid.get(normalize_uuid(uuid))
+
+    def discord_ids(self) -> KeysView[int]:
+        """Every blacklisted Discord ID; a live view, do not mutate."""
+        return self._by_discord_id.keys()
+
+    def add(self, entries: Iterable[Dict]) -> None:
+        entries = list(entries)
+        if self._journal is not None:
+            self._journal.append((self.add, entries))
+        for entry in entries:
+            if not isinstance(entry, dict) or not entry.get("offender_uuid"):
+                continue
+            uuid = normalize_uuid(entry["offender_uuid"])
+            self._index(uuid, entry)
+            self._upserts.add(uuid)
+            self._deletes.discard(uuid)
+
+    def remove(self, entries: Iterable[Dict]) -> None:
+        entries = list(entries)
+        if self._journal is not None:
+            self._journal.append((self.remove, entries))
+        for entry in entries:
+            if not isinstance(entry, dict) or not entry.get("offender_uuid"):
+                continue
+            uuid = normalize_uuid(entry["offender_uuid"])
+            if self._unindex(uuid) is None:
+                continue
+            self._deletes.add(uuid)
+            self._upserts.discard(uuid)
+
+    def __len__(self) -> int:
+        return len(self._by_uuid)
+
+    async def bulk_sync(self, pages: AsyncIterator[List[Dict]]) -> int:
+        """Replace the replica with a full paginated download.
+
+        Entries not present in the download are dropped. Pages are applied to a
+        fresh index and swapped in only once every page has arrived, so a failed
+        sync, or one that downloads nothing, leaves the current replica untouched
+        and does not record ``synced_at``.
+        """
+        fresh = BlacklistStore()
+        self._journal = []
+        try:
+            async for page in pages:
+                fresh.add(page)
+            if not fresh._by_uuid:
+                # Swapping in nothing would wipe the replica and mark it seeded
+                raise ValueError("bulk sync downloaded no blacklist entries")
+            stale = set(self._by_uuid) - set(fresh._by_uuid)
+            self._by_uuid, self._by_discord_id = fresh._by_uuid, fresh._by_discord_id
+            self._upserts = set(self._by_uuid)
+            self._deletes = stale
+            journal, self._journal = self._journal, None
+            for apply, entries in journal:
+                apply(entries)
+        finally:
+            self._journal = None
+        self.synced_at = time.time()
+        write = self.prepare_flush()
+        if write:
+            await asyncio.to_thread(write)
+        logger.info(f"Bulk-synced {len(self._by_uuid)} blacklist entries ({len(stale)} stale removed)")
+        return len(self._by_uuid)
+
+    def prepare_flush(self) -> Optional[Callable[[], None]]:
+        """Snapshot the entries added or removed since the last flush.
+
+        Returns:
+            A function that writes the snapshot, safe to run off the event loop,
+            or None when there is nothing to write
+        """
+        if not self._upserts and not self._deletes:
+            return None
+        upserts = [self._row(self._by_uuid[uuid]) for uuid in self._upserts]
+        deletes = [(uuid,) for uuid in self._deletes]
+        synced_at = self.synced_at
+        self._upserts, self._deletes = set(), set()
+
+        def write() -> None:
+            with transaction() as conn:
+                conn.executemany(
+                    "INSERT INTO blacklist (uuid, discord_id, data) VALUES (?, ?, ?) "
+                    "ON CONFLICT(uuid) DO UPDATE SET discord_id = excluded.discord_id, data = excluded.data",
+                    upserts
+                )
+                conn.executemany("DELETE FROM blacklist WHERE uuid = ?", deletes)
+                if synced_at is not None:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO blacklist_meta (key, value) VALUES ('synced_at', ?)",
+                        (str(synced_at),)
+                    )
+        return write
+
+    def flush(self) -> None:
+        """Write entries added or removed since the last flush."""
+        write = self.prepare_flush()
+        if write:
+            write()
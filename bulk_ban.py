@@ -0,0 +1,106 @@
+import os
+import random
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional
+
+import discord
+
+import metrics
+from guild_config import ConfigDict, AUTO_BAN_OFF, AUTO_BAN_ALL
+
+# Bulk ban settings
+BULK_BAN_MAX = 200  # users per bulk-ban request, Discord's limit
+BULK_BAN_CONCURRENCY = int(os.getenv("BULK_BAN_CONCURRENCY", "4"))  # single bans in flight per guild
+BULK_BAN_MAX_ATTEMPTS = 3  # per user, while Discord answers 429 or 5xx
+BULK_BAN_RETRY_DELAY = 2  # seconds, base of the backoff between attempts
+BAN_DELETE_MESSAGE_SECONDS = 7 * 86400
+
+logger = logging.getLogger(__name__)
+
+def should_auto_ban(guild_data: ConfigDict, offense_type: Optional[str], is_member: Optional[bool]) -> bool:
+    """Whether the guild's policy bans this offender without asking a moderator."""
+    mode = guild_data.get("autoBan", AUTO_BAN_OFF)
+    if mode == AUTO_BAN_OFF:
+        return False
+    offenses = guild_data.get("autoBanOffenses") or []
+    if offenses and (offense_type or "").strip().lower() not in offenses:
+        return False
+    return mode == AUTO_BAN_ALL or bool(is_member)
+
+class BanReport:
+    """Outcome of one bulk ban: who was banned, and why the rest were not."""
+    __slots__ = ("banned", "failed")
+
+    def __init__(self):
+        self.banned: List[int] = []
+        self.failed: Dict[int, str] = {}
+
+async def _ban_one(guild: discord.Guild, user_id: int, reason: str, semaphore: asyncio.Semaphore) -> Optional[str]:
+    """Ban a single user; returns why it failed, or None."""
+    async with semaphore:
+        for attempt in range(1, BULK_BAN_MAX_ATTEMPTS + 1):
+            try:
+                await guild.ban(
+                    discord.Object(id=user_id), reason=reason, delete_message_seconds=BAN_DELETE_MESSAGE_SECONDS
+                )
+                return None
+            except discord.Forbidden:
+                return "missing permission, or the user's role is above the bot's"
+            except discord.NotFound:
+                return "unknown user"
+            except discord.HTTPException as e:
+                # discord.py already waits out rate limits; this only covers ones it gave up on
+                if (e.status != 429 and e.status < 500) or attempt == BULK_BAN_MAX_ATTEMPTS:
+                    return str(e)
+                metrics.inc("bans.retries", status=str(e.status))
+                await asyncio.sleep(random.uniform(0, BULK_BAN_RETRY_DELAY * 2 ** attempt))
+    return None
+
+async def ban_many(guild: discord.Guild, user_ids: Iterable[int], reason: str) -> BanReport:
+    """Ban every user, through Discord's bulk-ban endpoint where it can be used.
+
+    Bulk bans take up to ``BULK_BAN_MAX`` users per request but also need the
+    Manage Server permission; without it, or when a request fails, the users
+    are banned one at a time by up to ``BULK_BAN_CONCURRENCY`` concurrent calls.
+    Users the bulk endpoint skipped are retried singly so the report says why.
+    """
+    report = BanReport()
+    user_ids = list(dict.fromkeys(user_ids))
+    singles: List[int] = []
+    use_bulk = True
+    with metrics.timed("bans.execute"):
+        for start in range(0, len(user_ids), BULK_BAN_MAX):
+            chunk = user_ids[start:start + BULK_BAN_MAX]
+            if not use_bulk:
+                singles.extend(chunk)
+                continue
+            try:
+                result = await guild.bulk_ban(
+                    [discord.Object(id=user_id) for user_id in chunk],
+                    reason=reason,
+                    delete_message_seconds=BAN_DELETE_MESSAGE_SECONDS
+                )
+            except discord.HTTPException as e:
+                logger.info(f"Bulk ban unavailable in {guild.name} ({e}), banning one by one")
+                # Missing Manage Server will not change within this run
+                use_bulk = not isinstance(e, discord.Forbidden)
+                singles.extend(chunk)
+                continue
+            banned = {user.id for user in result.banned}
+            report.banned.extend(user_id for user_id in chunk if user_id in banned)
+            singles.extend(user_id for user_id in chunk if user_id not in banned)
+
+        if singles:
+            semaphore = asyncio.Semaphore(BULK_BAN_CONCURRENCY)
+            failures = await asyncio.gather(*(_ban_one(guild, user_id, reason, semaphore) for user_id in singles))
+            for user_id, failure in zip(singles, failures):
+                if failure is None:
+                    report.banned.append(user_id)
+                else:
+                    report.failed[user_id] = failure
+
+    metrics.inc("bans.banned", len(report.banned))
+    metrics.inc("bans.failed", len(report.failed))
+    logger.info(f"Auto-banned {len(report.banned)} user(s) in {guild.name}, {len(report.failed)} failed")
+    return report
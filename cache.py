@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+class AsyncTTLCache:
+    """Async LRU cache with per-entry TTL, negative caching and single-flight loads.
+
+    ``None`` results are treated as negative answers and kept for ``negative_ttl``.
+    Exceptions raised by the loader are never cached. Concurrent ``get`` calls for
+    the same missing key share one in-flight load.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        loader: Callable[[str], Awaitable[Any]],
+        maxsize: int,
+        ttl: float,
+        negative_ttl: float
+    ):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._loader = loader
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    def _count(self, counter: str) -> None:
+        setattr(self, counter, getattr(self, counter) + 1)
+        metrics.inc(f"{self.name}.{counter}")
+        if counter in ("hits", "misses"):
+            metrics.set_gauge(f"{self.name}.hit_ratio", self.hits / (self.hits + self.misses))
+
+    def peek(self, key: str, default: Any = None) -> Any:
+        """Return a fresh cached value without loading or touching LRU order."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.time():
+            return default
+        return entry[1]
+
+    def put(self, key: str, value: Any) -> None:
+        ttl = self.ttl if value is not None else self.negative_ttl
+        self._store(key, time.time() + ttl, value)
+
+    def _store(self, key: str, expires_at: float, value: Any) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._count("evictions")
+
+    async def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.time():
+                self._entries.move_to_end(key)
+                self._count("hits")
+                return value
+            del self._entries[key]
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self._count("coalesced")
+            return await asyncio.shield(future)
+
+        self._count("misses")
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._loader(key)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception retrieved in case nobody else was waiting
+            future.exception()
+            raise
+        else:
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            del self._inflight[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+        }
+
+    def read_snapshot(self, path: Path) -> list:
+        """Read a snapshot file; does no cache access, so it can run on a worker thread."""
+        if not path.exists():
+            return []
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable {self.name} snapshot {path}: {e}")
+            return []
+
+    def load_snapshot(self, path: Path, entries: list = None) -> int:
+        """Restore unexpired entries from a snapshot written by ``save_snapshot``.
+
+        Args:
+            path: Snapshot file
+            entries: Contents already read with ``read_snapshot``, if any
+        """
+        if entries is None:
+            entries = self.read_snapshot(path)
+        now = time.time()
+        loaded = 0
+        for key, expires_at, value in entries:
+            # Entries cached since startup are fresher than the snapshot
+            if expires_at > now and key not in self._entries:
+                self._store(key, expires_at, value)
+                loaded += 1
+        logger.info(f"Restored {loaded} {self.name} entries from {path}")
+        return loaded
+
+    def save_snapshot(self, path: Path) -> None:
+        """Atomically write every unexpired entry to ``path``."""
+        now = time.time()
+        entries = [
+            [key, expires_at, value]
+            for key, (expires_at, value) in self._entries.items()
+            if expires_at > now
+        ]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
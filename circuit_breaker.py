@@ -0,0 +1,74 @@
+import time
+import logging
+from typing import Dict
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one upstream.
+
+    After ``failure_threshold`` failures in a row the breaker opens and calls
+    fail fast for ``reset_timeout`` seconds. Then a single trial call is let
+    through (half-open): success closes the breaker, failure re-opens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go through now."""
+        if self.opened_at is None:
+            return
+        if time.monotonic() - self.opened_at < self.reset_timeout or self._trial_running:
+            metrics.inc("upstream.breaker_rejections", upstream=self.name)
+            raise CircuitOpenError(f"Circuit for {self.name} is open")
+        self._trial_running = True
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            logger.info(f"Circuit for {self.name} closed")
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        metrics.set_gauge("upstream.breaker_open", 0, upstream=self.name)
+
+    def abandon_call(self) -> None:
+        """A call ended without a verdict: cancelled, or failed in a way that is not retried.
+
+        A half-open trial that ends this way counts as failed, so the breaker
+        re-opens and lets another trial through later instead of waiting forever.
+        """
+        if self._trial_running:
+            self.record_failure()
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._trial_running or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning(f"Circuit for {self.name} opened after {self.failures} failure(s)")
+            self.opened_at = time.monotonic()
+            self._trial_running = False
+            metrics.set_gauge("upstream.breaker_open", 1, upstream=self.name)
+
+# Breakers keyed by upstream name
+_breakers: Dict[str, CircuitBreaker] = {}
+
+def get_breaker(name: str, failure_threshold: int, reset_timeout: float) -> CircuitBreaker:
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(name, failure_threshold, reset_timeout)
+    return breaker
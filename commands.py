@@ -1,7 +1,13 @@
 import discord
-from discord.ext import commands
 from discord import app_commands
-from guild_config import load_config, set_log_channel, set_mod_role, get_guild_config
+from guild_config import (
+    load_config, set_log_channel, set_mod_role, set_auto_scan, set_delivery_mode, set_auto_ban, get_guild_config,
+    DELIVERY_INDIVIDUAL, DELIVERY_BATCHED, AUTO_BAN_OFF, AUTO_BAN_MEMBERS, AUTO_BAN_ALL
+)
+from permissions import invalidate as invalidate_permissions, can_manage_blacklists
+from sweep import Sweep, get_sweep
+from embeds import create_blacklist_embed
+from api import username_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -35,12 +41,135 @@ class BlacklistCommands(app_commands.Group):
             
         config = load_config()
         set_mod_role(config, interaction.guild_id, role.id)
+        invalidate_permissions(interaction.guild_id)
         await interaction.response.send_message(
             f"Moderator role set to {role.mention} for this guild. "
             f"Users with this role can now manage blacklists.",
             ephemeral=True
         )
 
+    @app_commands.command(name="autoscan", description="Only prompt for blacklisted users who are members of this guild.")
+    async def auto_scan_command(self, interaction: discord.Interaction, enabled: bool):
+        if interaction.user != interaction.guild.owner:
+            return await interaction.response.send_message(
+                "Only the server owner can use this command.", 
+                ephemeral=True
+            )
+
+        config = load_config()
+        set_auto_scan(config, interaction.guild_id, enabled)
+        if enabled:
+            message = ("Auto-scan enabled. Blacklists are only posted for current members, "
+                       "and members are checked when they join.")
+        else:
+            message = "Auto-scan disabled. Every new blacklist will be posted."
+        await interaction.response.send_message(message, ephemeral=True)
+
+    @app_commands.command(name="delivery", description="Chooses how new blacklists are posted in this guild.")
+    @app_commands.choices(mode=[
+        app_commands.Choice(name="One message per entry", value=DELIVERY_INDIVIDUAL),
+        app_commands.Choice(name="Up to 10 entries per message", value=DELIVERY_BATCHED),
+    ])
+    async def delivery_command(self, interaction: discord.Interaction, mode: app_commands.Choice[str]):
+        if interaction.user != interaction.guild.owner:
+            return await interaction.response.send_message(
+                "Only the server owner can use this command.", 
+                ephemeral=True
+            )
+
+        config = load_config()
+        set_delivery_mode(config, interaction.guild_id, mode.value)
+        await interaction.response.send_message(f"Delivery mode set to: {mode.name}.", ephemeral=True)
+
+    @app_commands.command(name="autoban", description="Bans matching blacklisted users without asking a moderator.")
+    @app_commands.describe(offenses="Comma-separated offense types to auto-ban; leave empty for every offense")
+    @app_commands.choices(mode=[
+        app_commands.Choice(name="Off, ask a moderator every time", value=AUTO_BAN_OFF),
+        app_commands.Choice(name="Ban blacklisted members", value=AUTO_BAN_MEMBERS),
+        app_commands.Choice(name="Ban every blacklisted user, even before they join", value=AUTO_BAN_ALL),
+    ])
+    async def auto_ban_command(self, interaction: discord.Interaction, mode: app_commands.Choice[str], offenses: str = ""):
+        if interaction.user != interaction.guild.owner:
+            return await interaction.response.send_message(
+                "Only the server owner can use this command.", 
+                ephemeral=True
+            )
+
+        offense_types = sorted({o.strip().lower() for o in offenses.split(",") if o.strip()})
+        config = load_config()
+        set_auto_ban(config, interaction.guild_id, mode.value, offense_types)
+        message = f"Auto-ban set to: {mode.name}."
+        if mode.value != AUTO_BAN_OFF:
+            message += f" Offenses: {', '.join(offense_types) if offense_types else 'all'}."
+            if not interaction.guild.me.guild_permissions.ban_members:
+                message += "\n⚠️ I don't have the Ban Members permission yet, so bans will fail until it is granted."
+        await interaction.response.send_message(message, ephemeral=True)
+
+    @app_commands.command(name="check", description="Checks whether a user is on the blacklist.")
+    async def check_command(self, interaction: discord.Interaction, user: discord.User):
+        # Answered from the local replica; no upstream request is made
+        entries = interaction.client.blacklist_store.get_all(user.id)
+        if not entries:
+            return await interaction.response.send_message(
+                f"{user.mention} is not on the blacklist.",
+                ephemeral=True
+            )
+
+        embeds = []
+        for entry in entries[:10]:
+            username = username_cache.peek(entry["offender_uuid"].replace("-", "").lower())
+            try:
+                embed = create_blacklist_embed(entry, username or "Unknown")
+            except (KeyError, ValueError) as e:
+                logger.warning(f"Incomplete blacklist entry for {user.id}: {e}")
+                continue
+            embed.title = "🚫 User Is Blacklisted"
+            embeds.append(embed)
+        await interaction.response.send_message(
+            f"{user.mention} is blacklisted on {len(entries)} account(s).",
+            embeds=embeds,
+            ephemeral=True
+        )
+
+    @app_commands.command(name="sweep", description="Checks every current member against the blacklist.")
+    @app_commands.describe(cancel="Cancel the sweep that is currently running")
+    async def sweep_command(self, interaction: discord.Interaction, cancel: bool = False):
+        if not can_manage_blacklists(interaction.user, interaction.guild):
+            return await interaction.response.send_message(
+                "❌ Only server owners and moderators can manage blacklists.",
+                ephemeral=True
+            )
+
+        running = get_sweep(interaction.guild_id)
+        if cancel:
+            if not running:
+                return await interaction.response.send_message("No sweep is running.", ephemeral=True)
+            running.cancel()
+            return await interaction.response.send_message("Cancelling the running sweep.", ephemeral=True)
+        if running:
+            return await interaction.response.send_message(
+                f"A sweep is already running ({running.scanned} members scanned so far).",
+                ephemeral=True
+            )
+
+        # Results go to the log channel when one is set, otherwise to this channel
+        config = load_config()
+        log_channel_id = get_guild_config(config, interaction.guild_id).get("logChannelId")
+        channel = interaction.guild.get_channel(int(log_channel_id)) if log_channel_id else None
+        channel = channel or interaction.channel
+
+        Sweep(
+            interaction.guild,
+            channel,
+            interaction.client.blacklist_store,
+            interaction.client.send_scheduler,
+            interaction.user
+        ).start()
+        await interaction.response.send_message(
+            f"Sweep started; progress and matches will be posted in {channel.mention}.",
+            ephemeral=True
+        )
+
     @app_commands.command(name="viewsettings", description="Displays the current guild's log channel and moderator role.")
     async def view_settings_command(self, interaction: discord.Interaction):
         config = load_config()
@@ -59,6 +188,20 @@ class BlacklistCommands(app_commands.Group):
         )
         embed.add_field(name="Log Channel", value=log_channel_mention, inline=False)
         embed.add_field(name="Moderator Role", value=mod_role_mention, inline=False)
+        embed.add_field(name="Auto-scan", value="Enabled" if guild_config.get("autoScan", True) else "Disabled", inline=False)
+        delivery_mode = guild_config.get("deliveryMode", DELIVERY_INDIVIDUAL)
+        embed.add_field(
+            name="Delivery",
+            value="Up to 10 entries per message" if delivery_mode == DELIVERY_BATCHED else "One message per entry",
+            inline=False
+        )
+        auto_ban = guild_config.get("autoBan", AUTO_BAN_OFF)
+        if auto_ban == AUTO_BAN_OFF:
+            auto_ban_text = "Off"
+        else:
+            auto_ban_text = "Members only" if auto_ban == AUTO_BAN_MEMBERS else "All blacklisted users"
+            auto_ban_text += f" ({', '.join(guild_config.get('autoBanOffenses') or []) or 'all offenses'})"
+        embed.add_field(name="Auto-ban", value=auto_ban_text, inline=False)
         
         if interaction.user == interaction.guild.owner:
             embed.set_footer(text="You can change these settings using /blacklist commands")
@@ -1,4 +1,11 @@
 import discord
+
+def make_custom_id(action, discord_id=None, event_id=None):
+    """Build a button custom_id that carries the offender and event IDs."""
+    if discord_id is None:
+        return action
+    return f"{action}:{discord_id}:{event_id or ''}"
+
 def create_blacklist_embed(blacklist_data, username):
     embed = discord.Embed(
         title="🚫 New Blacklist Detected",
@@ -19,6 +26,10 @@ def create_blacklist_embed(blacklist_data, username):
         if duration > 0:
             days = duration // 86400  # Convert seconds to days
             embed.add_field(name="Ban Duration", value=f"{days} days" if days > 1 else "Permanent", inline=True)
+
+    # Which blacklist providers reported it, when several are subscribed
+    if blacklist_data.get('sources'):
+        embed.add_field(name="Source", value=", ".join(blacklist_data['sources']), inline=True)
     
     return embed
 
@@ -27,15 +38,60 @@ def create_unblacklist_embed(event_data, username):
         title="✅ Unblacklist Detected",
         color=discord.Color.green()
     )
-    embed.add_field(name="Offender UUID → username", value=f"{username} ({event_data['uuid']})", inline=False)
-    embed.add_field(name="Offender ID → <@discord_id>", value=f"<@{event_data['discord_id']}>", inline=False)
-    embed.add_field(name="Offense", value=event_data['offense'], inline=False)
-    embed.add_field(name="Unban Date", value=event_data['unban_date'], inline=True)
+    # Accept both the feed's offender_* field names and the short legacy names
+    uuid = event_data.get('offender_uuid', event_data.get('uuid'))
+    discord_id = event_data.get('offender_discord_id', event_data.get('discord_id'))
+    embed.add_field(name="Offender UUID → username", value=f"{username} ({uuid})", inline=False)
+    embed.add_field(name="Offender ID → <@discord_id>", value=f"<@{discord_id}>", inline=False)
+    embed.add_field(name="Offense", value=event_data.get('offense_type', event_data.get('offense', 'N/A')), inline=False)
+    embed.add_field(name="Unban Date", value=event_data.get('unban_date', 'N/A'), inline=True)
+    if event_data.get('sources'):
+        embed.add_field(name="Source", value=", ".join(event_data['sources']), inline=True)
+    return embed
+
+def _capped_lines(lines, limit):
+    """Join lines, cutting off with a count of the rest once ``limit`` characters are reached."""
+    text = ""
+    for index, line in enumerate(lines):
+        more = f"\n…and {len(lines) - index} more"
+        if len(text) + len(line) + 1 + len(more) > limit:
+            return text + more
+        text += ("\n" if text else "") + line
+    return text
+
+def create_auto_ban_summary_embed(banned, failed):
+    """One message for a whole auto-ban run.
+
+    Args:
+        banned: (discord_id, username, offense_type) of every user banned
+        failed: (discord_id, username, reason) of every ban that failed
+    """
+    embed = discord.Embed(
+        title=f"🔨 Auto-Banned {len(banned)} Blacklisted User(s)",
+        color=discord.Color.orange() if failed else discord.Color.dark_red(),
+        timestamp=discord.utils.utcnow()
+    )
+    embed.description = _capped_lines(
+        [f"<@{discord_id}> — {username or 'Unknown'} — {offense or 'N/A'}" for discord_id, username, offense in banned],
+        4000
+    ) or "Nobody could be banned."
+    if failed:
+        embed.add_field(
+            name=f"⚠️ {len(failed)} Ban(s) Failed",
+            value=_capped_lines(
+                [f"<@{discord_id}> — {username or 'Unknown'}: {reason}" for discord_id, username, reason in failed],
+                1000
+            ),
+            inline=False
+        )
+    embed.set_footer(text="Banned by this server's auto-ban policy; change it with /blacklist autoban")
     return embed
 
 class BlacklistButtons(discord.ui.View):
-    def __init__(self):
+    def __init__(self, discord_id=None, event_id=None):
         super().__init__(timeout=None)
+        self.accept_ban_button.custom_id = make_custom_id("accept_ban", discord_id, event_id)
+        self.reject_blacklist_button.custom_id = make_custom_id("reject_blacklist", discord_id, event_id)
 
     @discord.ui.button(label="✅ Accept & Ban", style=discord.ButtonStyle.green, custom_id="accept_ban")
     async def accept_ban_button(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -45,9 +101,40 @@ class BlacklistButtons(discord.ui.View):
     async def reject_blacklist_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         pass
 
+# Accept and reject labels for each event kind in a batched message
+BATCH_BUTTON_LABELS = {
+    "blacklist": (("accept_ban", "✅ Ban"), ("reject_blacklist", "❌ Reject")),
+    "unblacklist": (("accept_unban", "✅ Unban"), ("reject_unblacklist", "❌ Reject")),
+}
+
+class BatchButtons(discord.ui.View):
+    """Accept and reject buttons for every entry of a batched message.
+
+    Entries are laid out two per row, so the 10 embeds Discord allows in one
+    message need 20 buttons across 5 rows. Each button carries its entry's IDs
+    in the custom_id, exactly like the single-entry views.
+    """
+
+    def __init__(self, entries):
+        """
+        Args:
+            entries: (kind, discord_id, event_id, label) tuples in embed order
+        """
+        super().__init__(timeout=None)
+        for index, (kind, discord_id, event_id, label) in enumerate(entries):
+            for action, text in BATCH_BUTTON_LABELS[kind]:
+                self.add_item(discord.ui.Button(
+                    label=f"{text} {label}"[:80],
+                    style=discord.ButtonStyle.green if action.startswith("accept") else discord.ButtonStyle.red,
+                    custom_id=make_custom_id(action, discord_id, event_id),
+                    row=index // 2
+                ))
+
 class UnblacklistButtons(discord.ui.View):
-    def __init__(self):
+    def __init__(self, discord_id=None, event_id=None):
         super().__init__(timeout=None)
+        self.accept_unban_button.custom_id = make_custom_id("accept_unban", discord_id, event_id)
+        self.reject_unblacklist_button.custom_id = make_custom_id("reject_unblacklist", discord_id, event_id)
 
     @discord.ui.button(label="✅ Accept & Unban", style=discord.ButtonStyle.green, custom_id="accept_unban")
     async def accept_unban_button(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -0,0 +1,105 @@
+import os
+import json
+import time
+import logging
+from typing import Callable, List, Optional
+
+from storage import transaction, fetch_all
+from pipeline import PreparedEvent, render_event
+
+# Published events are kept this long so a restarting shard can catch up
+EVENT_LOG_RETENTION = float(os.getenv("EVENT_LOG_RETENTION", str(24 * 3600)))  # seconds
+# While pushes are received, followers read the log this often instead of only on their poll ticks
+EVENT_LOG_POLL_INTERVAL = float(os.getenv("EVENT_LOG_POLL_INTERVAL", "2"))  # seconds
+
+logger = logging.getLogger(__name__)
+
+class EventLog:
+    """Shared, append-only log that carries prepared events from the leader to every shard.
+
+    The polling leader publishes each event once, with its resolved username, so
+    shard processes never call the upstream APIs or Mojang themselves. Each
+    consumer keeps its own position in the log in the same database.
+    """
+
+    def __init__(self, consumer: str):
+        self.consumer = consumer
+        self.position = 0
+        self._saved_position = 0
+
+    def load(self) -> None:
+        """Create the tables and restore this consumer's position.
+
+        A consumer seen for the first time starts at the end of the log instead
+        of replaying its whole history.
+        """
+        with transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS event_log ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, data TEXT NOT NULL, "
+                "username TEXT, published_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS event_log_consumers (consumer TEXT PRIMARY KEY, position INTEGER NOT NULL)"
+            )
+            row = conn.execute(
+                "SELECT position FROM event_log_consumers WHERE consumer = ?", (self.consumer,)
+            ).fetchone()
+            if row is None:
+                row = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM event_log").fetchone()
+            self.position = self._saved_position = row[0]
+
+    def publish(self, events: List[PreparedEvent]) -> None:
+        """Append events for every shard; the publisher's own position moves past them."""
+        if not events:
+            return
+        now = time.time()
+        with transaction() as conn:
+            conn.executemany(
+                "INSERT INTO event_log (kind, data, username, published_at) VALUES (?, ?, ?, ?)",
+                [(event.kind, json.dumps(event.data), event.username, now) for event in events]
+            )
+            self.position = conn.execute("SELECT MAX(seq) FROM event_log").fetchone()[0]
+        self.save()
+
+    def read(self, limit: Optional[int] = None) -> List[PreparedEvent]:
+        """Render every event published after this consumer's position and advance past them."""
+        rows = fetch_all(
+            "SELECT seq, kind, data, username FROM event_log WHERE seq > ? ORDER BY seq LIMIT ?",
+            (self.position, limit or -1)
+        )
+        events = []
+        for seq, kind, data, username in rows:
+            event = render_event(kind, json.loads(data), username)
+            if event is not None:
+                events.append(event)
+            self.position = seq
+        return events
+
+    def prepare_save(self) -> Optional[Callable[[], None]]:
+        """Snapshot the position if it moved; the returned write is safe to run off the event loop."""
+        if self.position == self._saved_position:
+            return None
+        position = self._saved_position = self.position
+
+        def write() -> None:
+            with transaction() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO event_log_consumers (consumer, position) VALUES (?, ?)",
+                    (self.consumer, position)
+                )
+        return write
+
+    def save(self) -> None:
+        write = self.prepare_save()
+        if write:
+            write()
+
+    def prune(self, retention: float = EVENT_LOG_RETENTION) -> None:
+        """Drop events older than the retention window."""
+        with transaction() as conn:
+            deleted = conn.execute(
+                "DELETE FROM event_log WHERE published_at < ?", (time.time() - retention,)
+            ).rowcount
+        if deleted:
+            logger.debug(f"Pruned {deleted} event(s) from the event log")
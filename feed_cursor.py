@@ -0,0 +1,140 @@
+import json
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from storage import transaction, fetch_all
+
+logger = logging.getLogger(__name__)
+
+def _sort_key(value: Any) -> tuple:
+    """Order numeric positions numerically and everything else as strings."""
+    try:
+        return (0, float(value))
+    except (TypeError, ValueError):
+        return (1, str(value))
+
+class FeedCursor:
+    """Position of the last consumed entry in an upstream feed, plus HTTP validators.
+
+    ``position`` is the newest entry's ``id`` (or ``position_field`` when the feed
+    has no ids). Entries that share that position are remembered by key in
+    ``tail_keys`` so a coarse timestamp never causes an event to be dropped or
+    reprocessed.
+    """
+
+    def __init__(self, feed: str, position_field: str, key_field: str = "offender_uuid"):
+        self.feed = feed
+        self.position_field = position_field
+        self.key_field = key_field
+        self.position: Optional[Any] = None
+        self.tail_keys: List[str] = []
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        # Position the validators were issued for; they only apply to that query
+        self.validator_position: Optional[Any] = None
+        self.dirty = False
+
+    def copy(self) -> "FeedCursor":
+        """An independent copy, to fetch with and only keep if the fetch succeeds."""
+        cursor = FeedCursor(self.feed, self.position_field, self.key_field)
+        cursor.__dict__.update(self.__dict__, tail_keys=list(self.tail_keys))
+        return cursor
+
+    def entry_position(self, entry: Dict) -> Any:
+        return entry.get("id", entry.get(self.position_field))
+
+    def is_new(self, entry: Dict) -> bool:
+        if self.position is None:
+            return True
+        position = self.entry_position(entry)
+        if position is None:
+            return True
+        current, candidate = _sort_key(self.position), _sort_key(position)
+        if candidate != current:
+            return candidate > current
+        return str(entry.get(self.key_field)) not in self.tail_keys
+
+    def advance(self, entries: Iterable[Dict]) -> None:
+        """Move the cursor past ``entries``."""
+        for entry in entries:
+            position = self.entry_position(entry)
+            if position is None:
+                continue
+            key = str(entry.get(self.key_field))
+            if self.position is None or _sort_key(position) > _sort_key(self.position):
+                self.position = position
+                self.tail_keys = [key]
+            elif _sort_key(position) == _sort_key(self.position) and key not in self.tail_keys:
+                self.tail_keys.append(key)
+            self.dirty = True
+
+    def set_validators(self, etag: Optional[str], last_modified: Optional[str], position: Any) -> None:
+        """Remember the validators returned for a request made at ``position``."""
+        if (etag, last_modified, position) != (self.etag, self.last_modified, self.validator_position):
+            self.etag = etag
+            self.last_modified = last_modified
+            self.validator_position = position
+            self.dirty = True
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Validators for a request made at the current position, if still valid."""
+        if self.position != self.validator_position:
+            return {}
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    @classmethod
+    def load(cls, feed: str, position_field: str, key_field: str = "offender_uuid") -> "FeedCursor":
+        """Load a persisted cursor, or start a fresh one."""
+        cursor = cls(feed, position_field, key_field)
+        with transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS feed_cursors (feed TEXT PRIMARY KEY, data TEXT NOT NULL)"
+            )
+        rows = fetch_all("SELECT data FROM feed_cursors WHERE feed = ?", (feed,))
+        if rows:
+            data = json.loads(rows[0][0])
+            cursor.position = data.get("position")
+            cursor.tail_keys = data.get("tail_keys", [])
+            cursor.etag = data.get("etag")
+            cursor.last_modified = data.get("last_modified")
+            cursor.validator_position = data.get("validator_position")
+            logger.info(f"Resuming {feed} feed from position {cursor.position}")
+        return cursor
+
+    def prepare_save(self) -> Optional[Callable[[], None]]:
+        """Snapshot the cursor if it moved since the last save.
+
+        Returns:
+            A function that writes the snapshot, safe to run off the event loop,
+            or None when the cursor has not moved
+        """
+        if not self.dirty:
+            return None
+        data = json.dumps({
+            "position": self.position,
+            "tail_keys": self.tail_keys,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "validator_position": self.validator_position,
+        })
+        self.dirty = False
+
+        def write() -> None:
+            with transaction() as conn:
+                conn.execute(
+                    "INSERT INTO feed_cursors (feed, data) VALUES (?, ?) "
+                    "ON CONFLICT(feed) DO UPDATE SET data = excluded.data",
+                    (self.feed, data)
+                )
+        return write
+
+    def save(self) -> None:
+        """Persist the cursor if it moved since the last save."""
+        write = self.prepare_save()
+        if write:
+            write()
@@ -1,43 +1,157 @@
 import json
+import logging
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, Optional
 
+from storage import transaction, fetch_all
+
+# Legacy whole-file config, migrated into the state database on first start
 CONFIG_FILE = Path("data/guild_config.json")
 
 # Type alias for guild configuration
 ConfigDict = Dict[str, Any]
 
+logger = logging.getLogger(__name__)
+
+# In-memory index of guild records keyed by guild ID string
+_config: Optional[Dict[str, ConfigDict]] = None
+# Serialized form of each record as last written, used to find dirty guilds
+_persisted: Dict[str, str] = {}
+
+def _serialize(guild_data: ConfigDict) -> str:
+    return json.dumps(guild_data, sort_keys=True, separators=(",", ":"))
+
+def _init_store() -> Dict[str, ConfigDict]:
+    """Create the guild table, migrate the legacy JSON file and load every record."""
+    with transaction() as conn:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS guild_config ("
+            "guild_id TEXT PRIMARY KEY, data TEXT NOT NULL)"
+        )
+        empty = conn.execute("SELECT 1 FROM guild_config LIMIT 1").fetchone() is None
+        if empty and CONFIG_FILE.exists():
+            with open(CONFIG_FILE, "r") as f:
+                legacy = json.load(f)
+            conn.executemany(
+                "INSERT INTO guild_config (guild_id, data) VALUES (?, ?)",
+                [(guild_id, _serialize(data)) for guild_id, data in legacy.items()]
+            )
+            logger.info(f"Migrated {len(legacy)} guild(s) from {CONFIG_FILE}")
+    if empty and CONFIG_FILE.exists():
+        CONFIG_FILE.rename(CONFIG_FILE.with_suffix(".json.migrated"))
+
+    config = {}
+    for guild_id, data in fetch_all("SELECT guild_id, data FROM guild_config"):
+        config[guild_id] = json.loads(data)
+        _persisted[guild_id] = data
+    return config
+
 def load_config():
-    if CONFIG_FILE.exists():
-        with open(CONFIG_FILE, "r") as f:
-            return json.load(f)
-    return {}
+    """Return the in-memory guild config index, loading it from disk on first use."""
+    global _config
+    if _config is None:
+        _config = _init_store()
+    return _config
+
+def prepare_save_config(config) -> Optional[Callable[[], None]]:
+    """Snapshot the guild records that changed since they were last written.
+
+    Returns:
+        A function that writes the snapshot, safe to run off the event loop,
+        or None when nothing changed
+    """
+    global _config
+    _config = config
+    changed = []
+    for guild_id, guild_data in config.items():
+        serialized = _serialize(guild_data)
+        if _persisted.get(guild_id) != serialized:
+            changed.append((guild_id, serialized))
+    removed = [guild_id for guild_id in _persisted if guild_id not in config]
+    if not changed and not removed:
+        return None
+    _persisted.update(changed)
+    for guild_id in removed:
+        del _persisted[guild_id]
+
+    def write() -> None:
+        with transaction() as conn:
+            conn.executemany(
+                "INSERT INTO guild_config (guild_id, data) VALUES (?, ?) "
+                "ON CONFLICT(guild_id) DO UPDATE SET data = excluded.data",
+                changed
+            )
+            conn.executemany("DELETE FROM guild_config WHERE guild_id = ?", [(g,) for g in removed])
+    return write
 
 def save_config(config):
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(config, f, indent=2)
+    """Persist only the guild records that changed since they were last written."""
+    write = prepare_save_config(config)
+    if write:
+        write()
+
+def save_guild_config(config, guild_id):
+    """Persist a single guild record."""
+    guild_id = str(guild_id)
+    serialized = _serialize(config[guild_id])
+    if _persisted.get(guild_id) == serialized:
+        return
+    with transaction() as conn:
+        conn.execute(
+            "INSERT INTO guild_config (guild_id, data) VALUES (?, ?) "
+            "ON CONFLICT(guild_id) DO UPDATE SET data = excluded.data",
+            (guild_id, serialized)
+        )
+    _persisted[guild_id] = serialized
+
+# Delivery modes: one message per event, or up to 10 embeds per message
+DELIVERY_INDIVIDUAL = "individual"
+DELIVERY_BATCHED = "batched"
+
+# Auto-ban policies: prompt a moderator for everything, ban blacklisted members
+# without asking, or also ban offenders who have not joined yet
+AUTO_BAN_OFF = "off"
+AUTO_BAN_MEMBERS = "members"
+AUTO_BAN_ALL = "all"
 
 def ensure_guild_config(config, guild_id):
     if str(guild_id) not in config:
         config[str(guild_id)] = {
             "logChannelId": None,
             "moderatorRoleId": None,
-            "lastSeenBlacklistIds": [],
-            "lastSeenUnblacklistIds": []
+            "autoScan": True,
+            "deliveryMode": DELIVERY_INDIVIDUAL,
+            "autoBan": AUTO_BAN_OFF,
+            # Offense types the auto-ban applies to; empty means every offense
+            "autoBanOffenses": []
         }
     return config[str(guild_id)]
 
 def set_log_channel(config, guild_id, channel_id):
     ensure_guild_config(config, guild_id)
     config[str(guild_id)]["logChannelId"] = channel_id
-    save_config(config)
+    save_guild_config(config, guild_id)
 
 def set_mod_role(config, guild_id, role_id):
     ensure_guild_config(config, guild_id)
     config[str(guild_id)]["moderatorRoleId"] = role_id
-    save_config(config)
+    save_guild_config(config, guild_id)
 
-def get_guild_config(config, guild_id):
-    return ensure_guild_config(config, guild_id)
+def set_auto_scan(config, guild_id, enabled):
+    ensure_guild_config(config, guild_id)
+    config[str(guild_id)]["autoScan"] = enabled
+    save_guild_config(config, guild_id)
 
+def set_delivery_mode(config, guild_id, mode):
+    ensure_guild_config(config, guild_id)
+    config[str(guild_id)]["deliveryMode"] = mode
+    save_guild_config(config, guild_id)
+
+def set_auto_ban(config, guild_id, mode, offenses):
+    ensure_guild_config(config, guild_id)
+    config[str(guild_id)]["autoBan"] = mode
+    config[str(guild_id)]["autoBanOffenses"] = offenses
+    save_guild_config(config, guild_id)
 
+def get_guild_config(config, guild_id):
+    return ensure_guild_config(config, guild_id)
@@ -1,83 +1,190 @@
+import time
+import asyncio
+import weakref
+from collections import OrderedDict
 import discord
 import logging
-from discord import app_commands
-from guild_config import load_config, get_guild_config
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler()]
-)
+from typing import Optional, Set, Tuple
+from permissions import can_manage_blacklists
+from metrics import observe
+from embeds import BATCH_BUTTON_LABELS, make_custom_id
+
 logger = logging.getLogger(__name__)
 
-async def handle_button_interaction(interaction: discord.Interaction, custom_id: str, default_mod_role_id: int = None):
+BUTTON_ACTIONS = ("accept_ban", "reject_blacklist", "accept_unban", "reject_unblacklist")
+# Event kind each button decides
+ACTION_KINDS = {
+    "accept_ban": "blacklist",
+    "reject_blacklist": "blacklist",
+    "accept_unban": "unblacklist",
+    "reject_unblacklist": "unblacklist",
+}
+# Embed field that carries the offender UUID, per event kind
+UUID_FIELDS = {"blacklist": "Minecraft UUID", "unblacklist": "Offender UUID → username"}
+
+# Decisions on one message are made one at a time, so two moderators clicking
+# entries of the same batched message never overwrite each other's edit
+_message_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+# Buttons already decided per message, checked under the message's lock; a
+# click that raced the decision still carries them in its snapshot
+DECIDED_CACHE_SIZE = 10_000  # messages
+_decided: "OrderedDict[int, Set[str]]" = OrderedDict()
+
+def _record_decided(message_id: int, custom_ids: Set[str]) -> None:
+    _decided.setdefault(message_id, set()).update(custom_ids)
+    _decided.move_to_end(message_id)
+    while len(_decided) > DECIDED_CACHE_SIZE:
+        _decided.popitem(last=False)
+
+def parse_custom_id(custom_id: str) -> Tuple[str, Optional[int], Optional[str]]:
+    """Split a button custom_id of the form ``action:discord_id:event_id``.
+
+    Buttons posted before IDs were embedded carry only the action.
+
+    Returns:
+        Tuple of action, offender Discord ID and event ID (None when absent)
+    """
+    action, _, rest = custom_id.partition(":")
+    discord_id, _, event_id = rest.partition(":")
+    return action, int(discord_id) if discord_id.isdigit() else None, event_id or None
+
+def _discord_id_from_embed(embed: discord.Embed) -> Optional[int]:
+    """Fallback for legacy buttons: read the offender ID back out of the embed."""
+    for field in embed.fields:
+        # For blacklist embeds
+        if field.name == "Discord User":
+            return int(''.join(filter(str.isdigit, field.value)))
+        # For unblacklist embeds
+        elif field.name.startswith("Offender ID →"):
+            return int(''.join(filter(str.isdigit, field.value)))
+    return None
+
+def _entry_index(embeds, kind: str, event_id: Optional[str]) -> int:
+    """Position of the entry's undecided embed in a (possibly batched) message.
+
+    Entries are matched on kind as well as UUID, since one batch can carry both
+    a blacklist and an unblacklist of the same player.
+    """
+    if event_id and len(embeds) > 1:
+        for index, embed in enumerate(embeds):
+            fields = {field.name: field.value for field in embed.fields}
+            if "Decision" not in fields and event_id in fields.get(UUID_FIELDS[kind], ""):
+                return index
+    return 0
+
+def _button_ids(message: discord.Message) -> Set[str]:
+    """custom_ids of the buttons still on a message."""
+    return {
+        item.custom_id
+        for row in message.components
+        for item in getattr(row, "children", ())
+        if getattr(item, "custom_id", None)
+    }
+
+def _remaining_view(
+    message: discord.Message, kind: str, discord_id: int, event_id: Optional[str]
+) -> Optional[discord.ui.View]:
+    """The message's buttons minus the ones for the entry that was just decided."""
+    decided = {make_custom_id(action, discord_id, event_id) for action, _ in BATCH_BUTTON_LABELS[kind]}
+    view = discord.ui.View.from_message(message, timeout=None)
+    for item in list(view.children):
+        if getattr(item, "custom_id", None) in decided:
+            view.remove_item(item)
+    return view if view.children else None
+
+async def handle_button_interaction(
+    interaction: discord.Interaction,
+    custom_id: str,
+    default_mod_role_id: int = None,
+    discord_id: Optional[int] = None,
+    event_id: Optional[str] = None
+):
     """Handle button interactions for blacklist actions.
     
     Args:
         interaction: The Discord interaction object
-        custom_id: The ID of the button that was clicked
+        custom_id: The action of the button that was clicked
         default_mod_role_id: Optional default moderator role ID if not set in config
+        discord_id: Offender Discord ID parsed from the button, if present
+        event_id: Event ID parsed from the button, if present
     """
+    # Defer first so nothing below counts against the interaction deadline
+    start = time.perf_counter()
+    await interaction.response.defer(ephemeral=False)
+    observe("interaction.defer", time.perf_counter() - start, action=custom_id)
+
+    # Followups and edits go through the bot's send scheduler ahead of log posts
+    scheduler = interaction.client.send_scheduler
+
     # Check if user is server owner or has moderator role
-    is_owner = interaction.user == interaction.guild.owner
-    has_mod_role = False
-    
-    # Check for moderator role if set in config or provided as default
-    config = load_config()
-    guild_config = get_guild_config(config, interaction.guild_id)
-    
-    # Only check for moderator role if one is set
-    if moderator_role_id := guild_config.get("moderatorRoleId"):
-        has_mod_role = any(role.id == moderator_role_id for role in interaction.user.roles)
-    
-    if not (is_owner or has_mod_role):
-        return await interaction.response.send_message(
+    if not can_manage_blacklists(interaction.user, interaction.guild, default_mod_role_id):
+        return await scheduler.followup(
+            interaction,
             "❌ Only server owners and moderators can manage blacklists.",
             ephemeral=True
         )
 
-    # Defer the response to avoid interaction timeout
-    await interaction.response.defer(ephemeral=False)
+    lock = _message_locks.setdefault(interaction.message.id, asyncio.Lock())
+    async with lock:
+        await _decide(interaction, scheduler, custom_id, discord_id, event_id)
 
+async def _decide(
+    interaction: discord.Interaction,
+    scheduler,
+    custom_id: str,
+    discord_id: Optional[int],
+    event_id: Optional[str]
+):
+    """Carry out the clicked decision and update its entry, holding the message's lock."""
     try:
-        original_embed = interaction.message.embeds[0]
+        clicked = interaction.data.get("custom_id", custom_id)
+        message = interaction.message
+        if clicked in _decided.get(message.id, ()):
+            await scheduler.followup(interaction, "❌ This entry has already been decided.", ephemeral=True)
+            return
+        if len(message.embeds) > 1:
+            # The click's snapshot may predate another moderator's edit, and the
+            # other entries are rebuilt from it, so work on the current message
+            message = await interaction.channel.fetch_message(message.id)
+            if clicked not in _button_ids(message):
+                await scheduler.followup(interaction, "❌ This entry has already been decided.", ephemeral=True)
+                return
+
+        # Batched messages carry several entries; only the clicked one is updated
+        kind = ACTION_KINDS[custom_id]
+        embeds = message.embeds
+        index = _entry_index(embeds, kind, event_id)
+        original_embed = embeds[index]
         new_embed = discord.Embed.from_dict(original_embed.to_dict())
         moderator_name = interaction.user.display_name
         
-        # Get ID from the embed - handle both blacklist and unblacklist embeds
-        discord_id = None
-        for field in original_embed.fields:
-            # For blacklist embeds
-            if field.name == "Discord User":
-                discord_id = int(''.join(filter(str.isdigit, field.value)))
-                break
-            # For unblacklist embeds
-            elif field.name.startswith("Offender ID →"):
-                discord_id = int(''.join(filter(str.isdigit, field.value)))
-                break
-        
+        if discord_id is None:
+            discord_id = _discord_id_from_embed(original_embed)
         if discord_id is None:
             raise ValueError("Could not find Discord ID in embed")
         
-        # Get the member object
-        member = await interaction.guild.fetch_member(discord_id)
+        # Ban and unban only need the ID, so the member is taken from the gateway
+        # cache for logging and never fetched over REST; this also works for
+        # users who are no longer (or not yet) in the guild
+        member = interaction.guild.get_member(discord_id) or f"ID {discord_id}"
+        target = discord.Object(id=discord_id)
         
         if custom_id == "accept_ban":
             # Ban the user
             reason = f"Blacklist accepted by {moderator_name}"
             try:
-                await member.ban(reason=reason, delete_message_days=7)  # Delete last 7 days of messages
+                # Delete last 7 days of messages
+                await interaction.guild.ban(target, reason=reason, delete_message_seconds=7 * 86400)
                 new_embed.title = "🚫 User Banned"
                 new_embed.color = discord.Color.dark_red()
                 new_embed.add_field(name="Decision", value=f"Banned by {moderator_name}", inline=False)
                 new_embed.add_field(name="Reason", value=reason, inline=False)
                 logger.info(f"Banned user {member} in guild {interaction.guild.name}")
             except discord.Forbidden:
-                await interaction.followup.send("❌ I don't have permission to ban members.", ephemeral=True)
+                await scheduler.followup(interaction, "❌ I don't have permission to ban members.", ephemeral=True)
                 return
             except discord.HTTPException as e:
-                await interaction.followup.send(f"❌ Failed to ban user: {e}", ephemeral=True)
+                await scheduler.followup(interaction, f"❌ Failed to ban user: {e}", ephemeral=True)
                 return
                 
         elif custom_id == "reject_blacklist":
@@ -90,17 +197,17 @@ async def handle_button_interaction(interaction: discord.Interaction, custom_id:
             # Unban the user
             reason = f"Unblacklist accepted by {moderator_name}"
             try:
-                await interaction.guild.unban(member, reason=reason)
+                await interaction.guild.unban(target, reason=reason)
                 new_embed.title = "✅ User Unbanned"
                 new_embed.color = discord.Color.dark_green()
                 new_embed.add_field(name="Decision", value=f"Unbanned by {moderator_name}", inline=False)
                 new_embed.add_field(name="Reason", value=reason, inline=False)
                 logger.info(f"Unbanned user {member} in guild {interaction.guild.name}")
             except discord.Forbidden:
-                await interaction.followup.send("❌ I don't have permission to unban members.", ephemeral=True)
+                await scheduler.followup(interaction, "❌ I don't have permission to unban members.", ephemeral=True)
                 return
             except discord.HTTPException as e:
-                await interaction.followup.send(f"❌ Failed to unban user: {e}", ephemeral=True)
+                await scheduler.followup(interaction, f"❌ Failed to unban user: {e}", ephemeral=True)
                 return
                 
         elif custom_id == "reject_unblacklist":
@@ -109,7 +216,16 @@ async def handle_button_interaction(interaction: discord.Interaction, custom_id:
             new_embed.add_field(name="Decision", value=f"Rejected by {moderator_name}", inline=False)
             logger.info(f"Unblacklist rejected for user {member} in guild {interaction.guild.name}")
 
-        await interaction.message.edit(embed=new_embed, view=None)
+        if len(embeds) > 1:
+            embeds = embeds[:index] + [new_embed] + embeds[index + 1:]
+            view = _remaining_view(message, kind, discord_id, event_id)
+            await scheduler.edit_message(interaction, message, embeds=embeds, view=view)
+            _record_decided(message.id, {
+                make_custom_id(action, discord_id, event_id) for action, _ in BATCH_BUTTON_LABELS[kind]
+            })
+        else:
+            await scheduler.edit_message(interaction, message, embed=new_embed, view=None)
+            _record_decided(message.id, _button_ids(message) | {clicked})
 
         action = {
             "accept_ban": "banned the user",
@@ -118,15 +234,15 @@ async def handle_button_interaction(interaction: discord.Interaction, custom_id:
             "reject_unblacklist": "rejected the unblacklist"
         }.get(custom_id, "performed an action")
         
-        await interaction.followup.send(f"{moderator_name} has {action}.")
+        await scheduler.followup(interaction, f"{moderator_name} has {action}.")
         
     except discord.NotFound:
-        await interaction.followup.send("❌ User not found in this server.", ephemeral=True)
+        await scheduler.followup(interaction, "❌ User not found in this server.", ephemeral=True)
     except discord.HTTPException as e:
-        await interaction.followup.send(f"❌ An error occurred: {e}", ephemeral=True)
+        await scheduler.followup(interaction, f"❌ An error occurred: {e}", ephemeral=True)
         logger.error(f"Error in handle_button_interaction: {e}")
     except Exception as e:
-        await interaction.followup.send("❌ An unexpected error occurred.", ephemeral=True)
+        await scheduler.followup(interaction, "❌ An unexpected error occurred.", ephemeral=True)
         logger.error(f"Unexpected error in handle_button_interaction: {e}", exc_info=True)
 
 
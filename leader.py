@@ -0,0 +1,70 @@
+import os
+import time
+import socket
+import logging
+
+from storage import transaction, fetch_all
+
+# Leader lease settings
+LEADER_LEASE_TTL = float(os.getenv("LEADER_LEASE_TTL", "30"))  # seconds
+INSTANCE_ID = os.getenv("INSTANCE_ID") or f"{socket.gethostname()}:{os.getpid()}"
+
+logger = logging.getLogger(__name__)
+
+class LeaderLease:
+    """A named lease in the shared database that at most one process holds.
+
+    The holder renews the lease well before it expires; if the holder dies,
+    any other process takes the lease over once it has expired. Renewal is a
+    single conditional upsert, so two processes can never both win.
+    """
+
+    def __init__(self, name: str, holder: str = INSTANCE_ID, ttl: float = LEADER_LEASE_TTL):
+        self.name = name
+        self.holder = holder
+        self.ttl = ttl
+        self._expires_at = 0.0
+
+    def load(self) -> None:
+        with transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                "name TEXT PRIMARY KEY, holder TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    @property
+    def is_leader(self) -> bool:
+        """Whether this process held the lease at its last renewal and it has not lapsed."""
+        return time.time() < self._expires_at
+
+    def try_acquire(self) -> bool:
+        """Take or renew the lease; returns whether this process now holds it."""
+        was_leader = self.is_leader
+        now = time.time()
+        expires_at = now + self.ttl
+        with transaction() as conn:
+            conn.execute(
+                "INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at "
+                "WHERE leases.holder = excluded.holder OR leases.expires_at < ?",
+                (self.name, self.holder, expires_at, now)
+            )
+            row = conn.execute("SELECT holder FROM leases WHERE name = ?", (self.name,)).fetchone()
+        self._expires_at = expires_at if row and row[0] == self.holder else 0.0
+        if self.is_leader != was_leader:
+            logger.info(f"{self.holder} {'acquired' if self.is_leader else 'lost'} the {self.name} lease")
+        return self.is_leader
+
+    def release(self) -> None:
+        """Give the lease up so another process can take over immediately."""
+        if not self.is_leader:
+            return
+        self._expires_at = 0.0
+        with transaction() as conn:
+            conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (self.name, self.holder))
+
+    def current_holder(self) -> str:
+        rows = fetch_all("SELECT holder, expires_at FROM leases WHERE name = ?", (self.name,))
+        if not rows or rows[0][1] < time.time():
+            return ""
+        return rows[0][0]
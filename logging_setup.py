@@ -0,0 +1,137 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import itertools
+import contextvars
+import logging.handlers
+from typing import Dict, Optional, Tuple
+
+import metrics
+
+# Logging settings
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "text" or "json"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))  # records waiting for the writer
+# Records below ERROR from one call site beyond this many per interval are dropped and counted
+LOG_RATE_LIMIT = int(os.getenv("LOG_RATE_LIMIT", "20"))  # 0 disables rate limiting
+LOG_RATE_INTERVAL = float(os.getenv("LOG_RATE_INTERVAL", "10"))  # seconds
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Structured fields copied into JSON output when a record carries them (via ``extra``)
+CONTEXT_FIELDS = ("correlation_id", "guild_id", "event_id", "kind")
+
+# Ties together every line logged while handling one poll tick, push or interaction
+correlation_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("correlation_id", default=None)
+_sequence = itertools.count(1)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def new_correlation_id(prefix: str) -> str:
+    """Start a new correlation ID for the current task and the tasks it spawns."""
+    value = f"{prefix}-{next(_sequence)}"
+    correlation_id.set(value)
+    return value
+
+class ContextFilter(logging.Filter):
+    """Stamp records with the current correlation ID while still on the logging task."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "correlation_id", None) is None:
+            record.correlation_id = correlation_id.get()
+        return True
+
+class RateLimitFilter(logging.Filter):
+    """Let at most ``limit`` records per call site through per ``interval`` seconds.
+
+    Errors always pass. The first record after a suppressed stretch says how
+    many similar lines were dropped.
+    """
+
+    def __init__(self, limit: int = LOG_RATE_LIMIT, interval: float = LOG_RATE_INTERVAL):
+        super().__init__()
+        self.limit = limit
+        self.interval = interval
+        # (pathname, lineno) -> [window start, records in window, suppressed]
+        self._sites: Dict[Tuple[str, int], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not self.limit or record.levelno >= logging.ERROR:
+            return True
+        now = time.monotonic()
+        site = self._sites.setdefault((record.pathname, record.lineno), [now, 0, 0])
+        if now - site[0] >= self.interval:
+            if site[2]:
+                record.msg = f"{record.msg} (suppressed {site[2]} similar line(s))"
+            site[0], site[1], site[2] = now, 0, 0
+        site[1] += 1
+        if site[1] > self.limit:
+            site[2] += 1
+            metrics.inc("logging.suppressed")
+            return False
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the structured context fields as keys.
+
+    Tracebacks arrive already folded into the message by the queue handler.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        return json.dumps(entry, default=str)
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread and never blocks; a full queue drops the record."""
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.inc("logging.dropped")
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT) -> None:
+    """Route all logging through a queue to a background writer thread.
+
+    The event loop only formats the message and enqueues the record; writing
+    to stderr happens on the listener's thread.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+    handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    handler.addFilter(ContextFilter())
+    handler.addFilter(RateLimitFilter())
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+
+    _listener = logging.handlers.QueueListener(handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+def stop_logging() -> None:
+    """Write out every queued record and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
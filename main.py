@@ -1,95 +1,269 @@
 import os
 import sys
+import json
+import time
 import asyncio
+import hashlib
+import itertools
 import logging
-from typing import Dict, Any, Set, Optional
+from typing import Dict, List, Set, Optional, Tuple
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from dotenv import load_dotenv
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
-from guild_config import load_config, save_config, get_guild_config, ConfigDict
-from api import get_recent_blacklists, get_minecraft_username, close_session
-from embeds import create_blacklist_embed, BlacklistButtons
-from handlers import handle_button_interaction
+# Startup timing starts before anything else is loaded
+STARTED_AT = time.monotonic()
+
+# Load environment variables before local modules read their settings
+load_dotenv()
+
+# Log through a background writer thread so the event loop never waits on stderr
+from logging_setup import setup_logging, stop_logging, new_correlation_id, correlation_id
+setup_logging()
+
+from guild_config import load_config, prepare_save_config, save_guild_config, get_guild_config, ConfigDict, DELIVERY_BATCHED, AUTO_BAN_OFF, AUTO_BAN_ALL
+from api import iter_all_blacklists, BLACKLIST_SYNC_API_URL, close_session, load_username_cache, save_username_cache, username_cache
+from storage import close_connection, get_meta, set_meta, DB_FILE
+from seen_index import SeenIndex
+from feed_cursor import FeedCursor
+from sources import load_sources, load_cursors, fetch_sources, CursorKey
+from pipeline import prepare_events, make_batch_view, chronological, event_key, PreparedEvent, BLACKLIST, UNBLACKLIST, MAX_EMBEDS_PER_MESSAGE
+from metrics import timed, last, observe, set_gauge, start_server as start_metrics_server
+from send_scheduler import SendScheduler
+from member_index import MemberIndex
+from blacklist_store import BlacklistStore, offender_discord_id, normalize_uuid
+from poller import AdaptivePoller
+from leader import LeaderLease
+from event_log import EventLog, EVENT_LOG_POLL_INTERVAL
+from outbox import Outbox
+from write_behind import WriteBehind
+from bulk_ban import ban_many, should_auto_ban
+from embeds import create_auto_ban_summary_embed
+from push_receiver import PushReceiver, PUSH_PORT, PUSH_RECONCILE_INTERVAL
+from handlers import handle_button_interaction, parse_custom_id, BUTTON_ACTIONS
 
 # Import commands after bot is defined to avoid circular imports
 from commands import BlacklistCommands
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler()]
-)
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
-
 # Constants
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 if not DISCORD_TOKEN:
     logger.error("No DISCORD_TOKEN environment variable set!")
     sys.exit(1)
 
-CONFIG_UPDATE_BATCH_SIZE = 5  # Number of config updates before saving
+# Sync the command tree even when its hash has not changed
+FORCE_COMMAND_SYNC = os.getenv("FORCE_COMMAND_SYNC", "").lower() in ("1", "true", "yes")
+
+# Pseudo guild under which the poller records, in each kind's dedup index,
+# every event it has ingested; Discord never assigns guild ID 0
+INGESTED = 0
+
+# Guilds processed per step of a fan-out before other tasks get the event loop
+FANOUT_CHUNK = 250
+
+# A warm boot finds state left by a previous run
+BOOT_KIND = "warm" if DB_FILE.exists() else "cold"
+
+def parse_shard_ids(value: str) -> Optional[List[int]]:
+    """Parse a shard list such as "0-3" or "0,2,4"; empty means all shards."""
+    shard_ids = []
+    for part in filter(None, (p.strip() for p in value.split(","))):
+        first, _, last = part.partition("-")
+        shard_ids.extend(range(int(first), int(last or first) + 1))
+    return shard_ids or None
+
+# Sharding: SHARD_COUNT shards in total, of which SHARD_IDS run in this process.
+# Setting SHARD_IDS enables the multi-process mode, where one elected leader polls
+# upstream and the other processes take its events from the shared event log.
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0")) or None
+SHARD_IDS = parse_shard_ids(os.getenv("SHARD_IDS", ""))
+if SHARD_IDS and not SHARD_COUNT:
+    logger.error("SHARD_IDS requires SHARD_COUNT to be set!")
+    sys.exit(1)
 
 # Initialize bot
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
 
-class BlacklistBot(commands.Bot):
+class BlacklistBot(commands.AutoShardedBot):
     def __init__(self):
-        super().__init__(command_prefix="!", intents=intents)
+        super().__init__(command_prefix="!", intents=intents, shard_count=SHARD_COUNT, shard_ids=SHARD_IDS)
         self.scheduler = AsyncIOScheduler()
-        self.pending_config_updates: Dict[str, Dict] = {}
-        self.config_update_counter = 0
+        # Coalesces state writes and runs them off the event loop
+        self.write_behind = WriteBehind(self.prepare_state_flush)
+        self.ready_once = False
+        # Dedup index per event kind
+        self.seen: Dict[str, SeenIndex] = {kind: SeenIndex(kind) for kind in (BLACKLIST, UNBLACKLIST)}
+        self.send_scheduler = SendScheduler()
+        # Every configured blacklist provider, with a feed cursor per (source, kind)
+        self.sources = load_sources()
+        self.cursors: Dict[CursorKey, FeedCursor] = {}
+        self.member_index = MemberIndex()
+        self.blacklist_store = BlacklistStore()
+        self.feed_poller: Optional[AdaptivePoller] = None
+        self.metrics_runner = None
+        self.outbox: Optional[Outbox] = None
+        # Pushed events are taken by whichever process currently polls
+        self.push_receiver = PushReceiver(lambda batches: ingest_pushed(batches), [BLACKLIST, UNBLACKLIST],
+                                          accepting=lambda: self.is_poller)
+        self.last_fetch_at = float("-inf")
+        # Slowest guild of the last fan-out, as (guild ID, seconds)
+        self.slowest_guild: Tuple[Optional[str], float] = (None, 0.0)
+        # Only used when several processes share the shards
+        self.leader_lease = LeaderLease("poller")
+        self.event_log: Optional[EventLog] = EventLog(f"shards:{os.getenv('SHARD_IDS')}") if SHARD_IDS else None
+
+    @property
+    def is_poller(self) -> bool:
+        """Whether this process polls upstream (always, unless it is a non-leader shard process)."""
+        return self.event_log is None or self.leader_lease.is_leader
+
+    def owns_guild(self, guild_id: int) -> bool:
+        """Whether the guild lives on one of this process's shards."""
+        if self.shard_ids is None:
+            return True
+        return (guild_id >> 22) % self.shard_count in self.shard_ids
 
     async def setup_hook(self) -> None:
         """Setup hook that runs when the bot starts."""
+        # Resume every source's feeds where the last run stopped
+        self.cursors = load_cursors(self.sources)
+        self.feed_poller = AdaptivePoller("feeds", poll_apis, self.scheduler)
+
+        # In multi-process mode, elect the polling leader and keep the lease renewed
+        if self.event_log:
+            self.leader_lease.load()
+            self.event_log.load()
+            self.leader_lease.try_acquire()
+            self.scheduler.add_job(
+                self.renew_lease, "interval", seconds=self.leader_lease.ttl / 3, id="leader_lease"
+            )
+
+        # Warm the Mojang username cache from the last snapshot in the background
+        self.loop.create_task(load_username_cache())
+
+        # Load the local blacklist replica, seeding it in the background on first start
+        self.blacklist_store.load()
+        if BLACKLIST_SYNC_API_URL and self.blacklist_store.synced_at is None and self.is_poller:
+            self.loop.create_task(self.sync_blacklist())
+
+        # Open the dedup indexes (each guild is loaded on first use), moving any
+        # legacy per-guild ID lists into them
+        config = load_config()
+        migrated = False
+        for kind, legacy_key in ((BLACKLIST, "lastSeenBlacklistIds"), (UNBLACKLIST, "lastSeenUnblacklistIds")):
+            self.seen[kind].load()
+            migrated = self.seen[kind].migrate_from_config(config, legacy_key) or migrated
+        if migrated:
+            await self.write_behind.flush()
+        self.write_behind.start()
+
+        # Start the outbound send workers; the outbox resumes its deliveries from on_ready
+        self.send_scheduler.start()
+        self.outbox = Outbox(deliver_to_guild, shard_count=SHARD_COUNT, shard_ids=SHARD_IDS)
+        self.outbox.load()
+        self.outbox.prune()
+        self.scheduler.add_job(self.outbox.prune, "interval", hours=1, id="outbox_prune")
+
+        # Expose metrics for scraping on a local port
+        self.metrics_runner = await start_metrics_server()
+
+        # Take pushed events as they happen; polling then only reconciles
+        await self.push_receiver.start()
+
         # Register command group
         self.tree.add_command(BlacklistCommands(self.tree))
         
-        # Sync commands with Discord
+        # Global command sync is slow and heavily rate limited, so only sync when the tree changed
+        await self.sync_commands()
+        observe("startup.setup_hook", time.monotonic() - STARTED_AT, boot=BOOT_KIND)
+
+    async def sync_commands(self) -> None:
+        """Sync the command tree with Discord if it changed since the last sync."""
+        payload = json.dumps(
+            [command.to_dict(self.tree) for command in self.tree.get_commands()],
+            sort_keys=True
+        )
+        tree_hash = hashlib.sha256(f"{self.application_id}:{payload}".encode()).hexdigest()
+        if not FORCE_COMMAND_SYNC and get_meta("command_tree_hash") == tree_hash:
+            logger.info("Application commands unchanged, skipping sync")
+            return
         await self.tree.sync()
+        set_meta("command_tree_hash", tree_hash)
         logger.info("Successfully synced application commands")
         
     async def close(self):
         """Cleanup when the bot is shutting down."""
-        # Save any pending config changes
-        await self.save_pending_config()
-        # Close the HTTP session
-        await close_session()
-        # Stop the scheduler
+        # Stop polling and the scheduler, handing leadership to another process
+        if self.feed_poller:
+            self.feed_poller.stop()
+        await self.push_receiver.stop()
+        if self.event_log:
+            self.leader_lease.release()
         if self.scheduler.running:
             self.scheduler.shutdown()
+        # Write any pending state changes
+        await self.write_behind.stop()
+        # Keep the username cache warm for the next start
+        await asyncio.to_thread(save_username_cache)
+        # Stop the outbox and send workers; undelivered rows stay pending for the next start
+        if self.outbox:
+            await self.outbox.stop()
+        await self.send_scheduler.stop()
+        # Close the HTTP session and the metrics endpoint
+        await close_session()
+        if self.metrics_runner:
+            await self.metrics_runner.cleanup()
+        # Close the state database
+        close_connection()
         await super().close()
     
-    async def save_pending_config(self) -> None:
-        """Save any pending configuration changes."""
-        if self.pending_config_updates:
-            logger.info(f"Saving {len(self.pending_config_updates)} pending config updates...")
-            config = load_config()
-            for guild_id, guild_data in self.pending_config_updates.items():
-                if guild_id in config:
-                    config[guild_id].update(guild_data)
-            save_config(config)
-            self.pending_config_updates.clear()
-            self.config_update_counter = 0
-
-    def queue_config_update(self, guild_id: int, updates: Dict[str, Any]) -> None:
-        """Queue configuration updates to be saved in batches."""
-        guild_id_str = str(guild_id)
-        if guild_id_str not in self.pending_config_updates:
-            self.pending_config_updates[guild_id_str] = {}
-        self.pending_config_updates[guild_id_str].update(updates)
-        self.config_update_counter += 1
-        
-        # Save if we've reached the batch size
-        if self.config_update_counter >= CONFIG_UPDATE_BATCH_SIZE:
-            asyncio.create_task(self.save_pending_config())
+    def prepare_state_flush(self) -> list:
+        """Snapshot every piece of state that changed; the writes run off the event loop."""
+        for seen in self.seen.values():
+            seen.evict()
+        writes = [seen.prepare_flush() for seen in self.seen.values()]
+        writes.append(self.blacklist_store.prepare_flush())
+        writes.extend(cursor.prepare_save() for cursor in self.cursors.values())
+        if self.event_log:
+            writes.append(self.event_log.prepare_save())
+        writes.append(prepare_save_config(load_config()))
+        return [write for write in writes if write]
+
+    async def renew_lease(self) -> None:
+        """Renew or take over the polling lease."""
+        was_leader = self.leader_lease.is_leader
+        try:
+            self.leader_lease.try_acquire()
+        except Exception as e:
+            logger.error(f"Failed to renew the leader lease: {e}")
+            return
+        if self.leader_lease.is_leader and not was_leader:
+            # Resume from where the previous leader left the feed cursors; the
+            # next poll first delivers what it published since our last read
+            self.cursors = load_cursors(self.sources)
+            if BLACKLIST_SYNC_API_URL and self.blacklist_store.synced_at is None:
+                self.loop.create_task(self.sync_blacklist())
+        if self.leader_lease.is_leader:
+            self.event_log.prune()
+        else:
+            # Only the leader bulk-syncs; pick up its replica once it has
+            try:
+                await self.blacklist_store.reload_if_synced()
+            except Exception as e:
+                logger.error(f"Failed to reload the synced blacklist replica: {e}")
+
+    async def sync_blacklist(self) -> None:
+        """Download the full blacklist into the local replica."""
+        try:
+            with timed("blacklist.bulk_sync"):
+                await self.blacklist_store.bulk_sync(iter_all_blacklists())
+        except Exception as e:
+            logger.error(f"Bulk blacklist sync failed: {e}", exc_info=True)
 
 # Initialize bot instance
 bot = BlacklistBot()
@@ -98,10 +272,31 @@ bot = BlacklistBot()
 async def on_ready():
     """Event triggered when the bot is ready."""
     logger.info(f"Logged in as {bot.user} (ID: {bot.user.id})")
-    bot.scheduler.start()
-    logger.info("Scheduler started.")
-    poll_apis.start()
+    if not bot.ready_once:
+        bot.ready_once = True
+        startup = time.monotonic() - STARTED_AT
+        observe("startup.ready", startup, boot=BOOT_KIND)
+        logger.info(
+            f"Ready after {startup:.2f}s ({BOOT_KIND} boot, "
+            f"setup {last('startup.setup_hook', boot=BOOT_KIND):.2f}s)"
+        )
+    # on_ready fires again after reconnects, so only start things once
+    if not bot.scheduler.running:
+        bot.scheduler.start()
+        logger.info("Scheduler started.")
+    # Deliveries need the guild cache, which is only filled once the bot is ready
+    bot.outbox.start()
+    bot.feed_poller.start()
     logger.info("API polling started.")
+    if bot.event_log and PUSH_PORT:
+        # Pushed events reach the leader within seconds; without this, followers
+        # would only see them on their next adaptive poll tick
+        bot.scheduler.add_job(
+            follow_event_log, "interval", seconds=EVENT_LOG_POLL_INTERVAL, id="event_log_follow", replace_existing=True
+        )
+    # Index every guild whose member list the gateway has finished chunking
+    indexed = sum(bot.member_index.build(guild) for guild in bot.guilds)
+    logger.info(f"Indexed members of {indexed}/{len(bot.guilds)} guild(s).")
 
 @bot.event
 async def on_guild_join(guild: discord.Guild):
@@ -109,16 +304,49 @@ async def on_guild_join(guild: discord.Guild):
     logger.info(f"Joined guild: {guild.name} (ID: {guild.id})")
     config = load_config()
     get_guild_config(config, guild.id)
-    save_config(config)
+    save_guild_config(config, guild.id)
+    if not guild.chunked:
+        await guild.chunk()
+    bot.member_index.build(guild)
+
+@bot.event
+async def on_guild_remove(guild: discord.Guild):
+    """Event triggered when the bot leaves or is removed from a guild."""
+    bot.member_index.drop(guild.id)
+
+@bot.event
+async def on_member_join(member: discord.Member):
+    """Check joining members against the local blacklist."""
+    bot.member_index.add(member.guild.id, member.id)
+    entry = bot.blacklist_store.get(member.id)
+    if entry is None:
+        return
+
+    guild_data = load_config().get(str(member.guild.id))
+    if not guild_data:
+        return
+    logger.info(f"Blacklisted user {member} joined {member.guild.name}")
+    events = await prepare_events({BLACKLIST: [entry]})
+    async with bot.write_behind.hold():
+        delivery = await process_guild_updates(str(member.guild.id), guild_data, events)
+        if delivery:
+            await bot.outbox.enqueue(dict([delivery]))
+    bot.write_behind.mark_dirty()
+
+@bot.event
+async def on_member_remove(member: discord.Member):
+    """Keep the member index current."""
+    bot.member_index.remove(member.guild.id, member.id)
 
 @bot.event
 async def on_interaction(interaction: discord.Interaction):
     """Handle all interactions, including button clicks and application commands."""
+    correlation_id.set(f"interaction-{interaction.id}")
     try:
         if interaction.type == discord.InteractionType.component:
-            custom_id = interaction.data.get("custom_id")
-            if custom_id in ["accept_ban", "reject_blacklist", "accept_unban", "reject_unblacklist"]:
-                await handle_button_interaction(interaction, custom_id)
+            action, discord_id, event_id = parse_custom_id(interaction.data.get("custom_id", ""))
+            if action in BUTTON_ACTIONS:
+                await handle_button_interaction(interaction, action, discord_id=discord_id, event_id=event_id)
     except Exception as e:
         logger.error(f"Error handling interaction: {e}", exc_info=True)
         try:
@@ -130,95 +358,420 @@ async def on_interaction(interaction: discord.Interaction):
         except Exception as e:
             logger.error(f"Failed to send error message: {e}")
 
-@tasks.loop(minutes=1.0)
-async def poll_apis():
-    """Poll the blacklist and unblacklist APIs and process new entries."""
-    try:
+async def fetch_feeds() -> Tuple[Dict[str, list], Optional[Exception]]:
+    """Fetch every source's feeds at once, merged into one batch per kind.
+
+    Returns:
+        New entries keyed by event kind, and a fetch error if every source failed
+    """
+    with timed("poll.fetch"):
+        batches, fetch_error = await fetch_sources(bot.sources, bot.cursors)
+
+    # Log new entries if any; per-entry lines are formatted lazily and rate limited
+    for kind, entries in batches.items():
+        for entry in entries:
+            logger.info(
+                "%s - UUID: %s, Discord ID: %s, Offense: %s",
+                kind.capitalize(),
+                entry.get('offender_uuid', 'N/A'),
+                entry.get('offender_discord_id', 'N/A'),
+                entry.get('offense_type', 'N/A'),
+                extra={"kind": kind, "event_id": entry.get('offender_uuid')}
+            )
+    return batches, fetch_error
+
+async def poll_apis() -> int:
+    """Poll the blacklist and unblacklist feeds of every source and process new entries.
+
+    All feeds are fetched concurrently, merged, and share one normalize,
+    resolve, render and delivery pass. In multi-process mode only the leader
+    polls; it publishes the prepared events to the shared event log, and the
+    other processes read them from there; a process that takes over the lease
+    first delivers whatever the previous leader published since its last read.
+    While the push receiver is running, the leader only fetches every
+    ``PUSH_RECONCILE_INTERVAL`` seconds to pick up anything a push missed.
+    Returns the number of new events; when every source failed, the error is
+    raised after anything fetched has been processed so the poller can back off.
+    """
+    new_correlation_id("poll")
+    # Nothing the tick marks (cursors, dedup marks) is persisted before its
+    # deliveries are in the outbox, so a crash in between cannot drop them
+    with timed("poll.tick"):
+        async with bot.write_behind.hold():
+            fetch_error = None
+            # Followers take the leader's events from the log; a new leader first takes
+            # whatever the previous one published after this process last read it
+            events = take_logged_events()
+            pushed = bot.push_receiver.running and time.monotonic() - bot.last_fetch_at < PUSH_RECONCILE_INTERVAL
+            if bot.is_poller and not pushed:
+                bot.last_fetch_at = time.monotonic()
+                batches, fetch_error = await fetch_feeds()
+
+                # Validate, resolve usernames and render embeds once for every guild
+                polled = fresh_events(await prepare_events(skip_ingested(batches)))
+                if bot.event_log:
+                    bot.event_log.publish(polled)
+                events += polled
+            await ingest(events)
+
+    if fetch_error:
+        raise fetch_error
+    return len(events)
+
+async def ingest_pushed(batches: Dict[str, list]) -> int:
+    """Process entries pushed by the publisher; returns the number of events prepared."""
+    new_correlation_id("push")
+    with timed("push.ingest"):
+        async with bot.write_behind.hold():
+            for kind, entries in batches.items():
+                logger.info(f"Received {len(entries)} pushed {kind}(s)")
+            backlog = take_logged_events()
+            events = fresh_events(await prepare_events(skip_ingested(batches)))
+            if bot.event_log:
+                bot.event_log.publish(events)
+            await ingest(backlog + events)
+    return len(events)
+
+async def follow_event_log() -> None:
+    """Ingest what the leader published since this follower last read the log."""
+    if bot.is_poller:
+        return
+    async with bot.write_behind.hold():
+        events = take_logged_events()
+        if events:
+            new_correlation_id("follow")
+            with timed("event_log.follow"):
+                await ingest(events)
+
+def take_logged_events() -> List[PreparedEvent]:
+    """Read the events published to the shared log since this process last read it.
+
+    For a follower these are the leader's events. For the leader the log is
+    empty unless it just took over (or booted into the lease), in which case it
+    holds what the previous leader published meanwhile; it must be read before
+    publishing, which moves the position past everything.
+    """
+    if not bot.event_log:
+        return []
+    events = bot.event_log.read()
+    _mark_ingested(events)
+    return events
+
+def skip_ingested(batches: Dict[str, list]) -> Dict[str, list]:
+    """Drop entries already ingested before any username is resolved for them.
+
+    Pushes do not move the feed cursors, so that a reconcile fetch still
+    catches whatever a push missed; the entries it re-reads that were pushed
+    only cost a lookup here. fresh_events stays the final check, for entries
+    that arrive from both paths at once.
+    """
+    unseen, skipped = {}, 0
+    for kind, entries in batches.items():
+        unseen[kind] = []
+        for entry in entries:
+            if (isinstance(entry, dict) and entry.get("offender_uuid")
+                    and bot.seen[kind].is_seen(INGESTED, event_key(kind, entry))):
+                skipped += 1
+            else:
+                unseen[kind].append(entry)
+    if skipped:
+        logger.info(f"Skipped {skipped} entry(ies) already ingested")
+    return unseen
+
+def fresh_events(events: List[PreparedEvent]) -> List[PreparedEvent]:
+    """Drop events the poller has already ingested and record the rest.
+
+    Pushes and polls overlap: a reconcile fetch returns events that were pushed
+    earlier, possibly followed by newer events for the same player. Replaying
+    an old blacklist would otherwise post it again, or re-ban a player who has
+    since been unblacklisted.
+    """
+    fresh = [event for event in events if not bot.seen[event.kind].is_seen(INGESTED, event.key)]
+    _mark_ingested(fresh)
+    if len(fresh) < len(events):
+        logger.info(f"Skipped {len(events) - len(fresh)} event(s) already ingested")
+    return fresh
+
+def _mark_ingested(events: List[PreparedEvent]) -> None:
+    # Events taken from the log count too, so a process that later becomes the
+    # leader does not ingest them again from a fetch
+    for kind in (BLACKLIST, UNBLACKLIST):
+        keys = [event.key for event in events if event.kind == kind]
+        if keys:
+            bot.seen[kind].mark_seen(INGESTED, keys)
+
+async def ingest(events: List[PreparedEvent]) -> None:
+    """Apply prepared events to the local replica and queue them for every guild on our shards.
+
+    Events are applied in the order they happened, so an unblacklist and a
+    re-blacklist of the same offender leave the entry active, and every guild
+    gets its prompts in that order.
+    """
+    events = chronological(events)
+
+    # Keep the local blacklist in sync for on-join checks
+    for kind, run in itertools.groupby(events, key=lambda e: e.kind):
+        apply = bot.blacklist_store.add if kind == BLACKLIST else bot.blacklist_store.remove
+        apply(e.data for e in run)
+
+    if events:
         config = load_config()
-        
-        # Get recent blacklists
-        blacklists = await get_recent_blacklists()
-        
-        # Log new blacklists if any
-        if blacklists:
-            logger.info(f"Received {len(blacklists)} new blacklist(s) from API")
-            for blacklist in blacklists:
-                logger.info(
-                    f"Blacklist - UUID: {blacklist.get('offender_uuid', 'N/A')}, "
-                    f"Discord ID: {blacklist.get('offender_discord_id', 'N/A')}, "
-                    f"Offense: {blacklist.get('offense_type', 'N/A')}"
+
+        # Fan the prepared events out to every guild on our shards, a chunk of
+        # guilds at a time so a large deployment does not hold the event loop
+        bot.slowest_guild = (None, 0.0)
+        with timed("pipeline.fanout"):
+            fanout = Fanout(events)
+            guilds = [
+                (guild_id, guild_data) for guild_id, guild_data in config.items() if bot.owns_guild(int(guild_id))
+            ]
+            results = []
+            for start in range(0, len(guilds), FANOUT_CHUNK):
+                results += await asyncio.gather(
+                    *(process_guild_updates(guild_id, guild_data, events, fanout)
+                      for guild_id, guild_data in guilds[start:start + FANOUT_CHUNK]),
+                    return_exceptions=True
                 )
-        
-        # Process each guild
-        tasks = []
-        for guild_id, guild_data in config.items():
-            tasks.append(process_guild_updates(guild_id, guild_data, blacklists, []))
-        
-        # Run guild updates concurrently
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
+                await asyncio.sleep(0)
+
+        set_gauge("guild.process.slowest", bot.slowest_guild[1])
+
         # Log any errors from guild updates
+        deliveries = {}
         for result in results:
             if isinstance(result, Exception):
                 logger.error(f"Error in guild update: {result}", exc_info=result)
-        
-        # Save any pending config updates
-        await bot.save_pending_config()
-        
-        logger.debug("Finished processing API updates")
-        
-    except Exception as e:
-        logger.error(f"Error in poll_apis: {e}", exc_info=True)
+            elif result:
+                deliveries[result[0]] = result[1]
+
+        # Record every guild's deliveries durably, in one write, before anything
+        # is sent; the outbox workers post them and retry failures
+        await bot.outbox.enqueue(deliveries)
+
+        # Dated events are new by their key alone, so a blacklist after an unblacklist
+        # is delivered; undated ones are keyed on the bare UUID, which a new event
+        # of the opposite kind has to re-open. Only fresh events get here.
+        undated = {BLACKLIST: set(), UNBLACKLIST: set()}
+        for event in events:
+            undated[UNBLACKLIST if event.kind == BLACKLIST else BLACKLIST].add(normalize_uuid(event.event_id))
+        for kind, keys in undated.items():
+            bot.seen[kind].forget(keys)
+            await bot.outbox.forget(kind, keys)
+
+    # Persist seen IDs, cursors and the replica in the background
+    bot.write_behind.mark_dirty(len(events) or 1)
+
+    if events:
+        logger.info(f"Username cache: {username_cache.stats()}")
+        logger.info(
+            f"Outbox pending: {bot.outbox.pending()}, "
+            f"send queue depth: {bot.send_scheduler.depth}, "
+            f"last send latency: {last('send_queue.latency') * 1000:.1f}ms"
+        )
+        logger.info(
+            "Pipeline stage timings: "
+            + ", ".join(
+                f"{stage}={last(stage) * 1000:.1f}ms"
+                for stage in ("poll.fetch", "pipeline.normalize", "pipeline.resolve",
+                              "pipeline.render", "pipeline.fanout")
+            )
+            + f", slowest guild {bot.slowest_guild[0]}={bot.slowest_guild[1] * 1000:.1f}ms"
+        )
+    logger.debug("Finished processing API updates")
+
+def _log_channel(guild: discord.Guild, guild_data: ConfigDict) -> Optional[discord.TextChannel]:
+    """The guild's configured log channel, logging why there is none."""
+    log_channel_id = guild_data.get("logChannelId")
+    if not log_channel_id:
+        logger.warning("No log channel configured for guild %s, skipping.", guild.name, extra={"guild_id": guild.id})
+        return None
+
+    log_channel = guild.get_channel(int(log_channel_id))
+    if not log_channel or not isinstance(log_channel, discord.TextChannel):
+        logger.warning(
+            "Log channel %s not found in guild %s, skipping.", log_channel_id, guild.name, extra={"guild_id": guild.id}
+        )
+        return None
+    return log_channel
+
+class Fanout:
+    """Lookups built once per fan-out so each guild only looks at the events it can need.
+
+    Unblacklists go to every guild; blacklists are indexed by offender Discord ID
+    so an auto-scan guild intersects them with its members instead of testing
+    every event.
+    """
+    __slots__ = ("everyone", "by_offender")
+
+    def __init__(self, events: List[PreparedEvent]):
+        self.everyone: List[Tuple[int, PreparedEvent]] = []
+        self.by_offender: Dict[int, List[Tuple[int, PreparedEvent]]] = {}
+        for position, event in enumerate(events):
+            if event.kind != BLACKLIST:
+                self.everyone.append((position, event))
+                continue
+            discord_id = offender_discord_id(event.data)
+            if discord_id is not None:
+                self.by_offender.setdefault(discord_id, []).append((position, event))
+
+    def for_members(self, members: Set[int]) -> List[PreparedEvent]:
+        """Unblacklists plus the blacklists of these members, in event order."""
+        picked = list(self.everyone)
+        for discord_id in self.by_offender.keys() & members:
+            picked.extend(self.by_offender[discord_id])
+        picked.sort(key=lambda item: item[0])
+        return [event for _, event in picked]
 
 async def process_guild_updates(
-    guild_id: str, 
-    guild_data: ConfigDict, 
-    blacklists: list,
-    _unused: list = None  # Keep for backward compatibility
-) -> None:
-    """Process updates for a single guild."""
+    guild_id: str,
+    guild_data: ConfigDict,
+    events: List[PreparedEvent],
+    fanout: Optional[Fanout] = None
+) -> Optional[Tuple[int, List[PreparedEvent]]]:
+    """Pick the prepared events this guild has not seen yet and mark them seen.
+
+    Returns:
+        The guild's ID and its new events, for the caller to enqueue, or None
+        when the guild is skipped
+    """
+    start = time.perf_counter()
     try:
         guild = bot.get_guild(int(guild_id))
         if not guild:
-            logger.warning(f"Guild {guild_id} not found, skipping.")
-            return
+            logger.warning("Guild %s not found, skipping.", guild_id, extra={"guild_id": guild_id})
+            return None
+        if not _log_channel(guild, guild_data):
+            return None
 
-        log_channel_id = guild_data.get("logChannelId")
-        if not log_channel_id:
-            logger.warning(f"No log channel configured for guild {guild.name}, skipping.")
-            return
+        # With auto-scan on, blacklists are only posted for offenders who are members;
+        # the rest are left unseen so on_member_join can post them later
+        auto_scan = guild_data.get("autoScan", True)
+        members = bot.member_index.members(guild.id)
+        # A policy that bans non-members pre-emptively needs every blacklist
+        if auto_scan and members is not None and guild_data.get("autoBan", AUTO_BAN_OFF) != AUTO_BAN_ALL:
+            candidates = (fanout or Fanout(events)).for_members(members)
+        else:
+            def is_relevant(event: PreparedEvent) -> bool:
+                if not auto_scan or event.kind != BLACKLIST:
+                    return True
+                discord_id = offender_discord_id(event.data)
+                if discord_id is None:
+                    return False
+                return (members is None or discord_id in members
+                        or should_auto_ban(guild_data, event.data.get("offense_type"), False))
 
-        log_channel = guild.get_channel(int(log_channel_id))
-        if not log_channel or not isinstance(log_channel, discord.TextChannel):
-            logger.warning(f"Log channel {log_channel_id} not found in guild {guild.name}, skipping.")
-            return
+            candidates = [event for event in events if is_relevant(event)]
 
-        # Process blacklists
-        new_blacklist_ids = []
-        for bl in blacklists:
-            # Check if required fields exist
-            if not isinstance(bl, dict) or not all(k in bl for k in ["offender_uuid", "offender_discord_id"]):
-                logger.warning("Blacklist item missing required fields (offender_uuid, offender_discord_id)")
-                continue
+        new_events = [event for event in candidates if not bot.seen[event.kind].is_seen(guild.id, event.key)]
+
+        # Record the new IDs in the dedup indexes
+        for kind in (BLACKLIST, UNBLACKLIST):
+            new_ids = [event.key for event in new_events if event.kind == kind]
+            if new_ids:
+                bot.seen[kind].mark_seen(guild.id, new_ids)
+        return guild.id, new_events
 
-            if bl["offender_uuid"] not in guild_data.get("lastSeenBlacklistIds", []):
-                new_blacklist_ids.append(bl["offender_uuid"])
-                try:
-                    username = await get_minecraft_username(bl["offender_uuid"])
-                    embed = create_blacklist_embed(bl, username or "Unknown")
-                    await log_channel.send(embed=embed, view=BlacklistButtons())
-                    logger.info(f"Posted new blacklist to {guild.name} for {username or bl['offender_uuid']}")
-                except Exception as e:
-                    logger.error(f"Error processing blacklist: {e}")
-        
-        # Update config with new blacklist IDs
-        if new_blacklist_ids:
-            bot.queue_config_update(guild.id, {
-                "lastSeenBlacklistIds": guild_data.get("lastSeenBlacklistIds", []) + new_blacklist_ids
-            })
-            
     except Exception as e:
         logger.error(f"Error processing guild {guild_id}: {e}", exc_info=True)
+        return None
+    finally:
+        _record_guild_time(guild_id, time.perf_counter() - start)
+
+def _record_guild_time(guild_id: str, seconds: float) -> None:
+    """One histogram for all guilds, plus the slowest guild of the current fan-out."""
+    observe("guild.process", seconds)
+    if seconds > bot.slowest_guild[1]:
+        bot.slowest_guild = (guild_id, seconds)
+
+async def deliver_to_guild(
+    guild_id: int,
+    events: List[PreparedEvent]
+) -> List[Tuple[List[PreparedEvent], Optional[BaseException]]]:
+    """Post outbox deliveries to a guild's log channel.
+
+    Returns:
+        Each message's events paired with the error that stopped it, if any
+    """
+    guild = bot.get_guild(guild_id)
+    guild_data = load_config().get(str(guild_id))
+    log_channel = _log_channel(guild, guild_data) if guild and guild_data else None
+    if log_channel is None:
+        return [(events, LookupError(f"No usable log channel for guild {guild_id}"))]
+
+    # Blacklists the guild's auto-ban policy covers are banned together and
+    # reported in one summary instead of one prompt each
+    outcome = []
+    auto_bans, prompts = [], []
+    for event in events:
+        (auto_bans if _is_auto_ban(guild, guild_data, event) else prompts).append(event)
+    if auto_bans:
+        outcome.append((auto_bans, await auto_ban(guild, log_channel, auto_bans)))
+    events = prompts
+
+    # In batched mode each message carries up to 10 events, cutting REST calls in a burst
+    if guild_data.get("deliveryMode") == DELIVERY_BATCHED:
+        messages = [
+            events[start:start + MAX_EMBEDS_PER_MESSAGE]
+            for start in range(0, len(events), MAX_EMBEDS_PER_MESSAGE)
+        ]
+        sends = [
+            bot.send_scheduler.send(log_channel, embeds=[e.embed for e in batch], view=make_batch_view(batch))
+            for batch in messages
+        ]
+    else:
+        messages = [[event] for event in events]
+        sends = [
+            bot.send_scheduler.send(log_channel, embed=event.embed, view=event.make_view())
+            for event in events
+        ]
+
+    # Queue every send at once; the scheduler paces them and keeps channel order
+    results = await asyncio.gather(*sends, return_exceptions=True)
+    for batch, result in zip(messages, results):
+        if isinstance(result, BaseException):
+            logger.error(
+                "Error posting %d event(s) to %s: %s", len(batch), guild.name, result, extra={"guild_id": guild.id}
+            )
+            outcome.append((batch, result))
+            continue
+        for event in batch:
+            logger.info(
+                "Posted new %s to %s for %s", event.kind, guild.name, event.username or event.event_id,
+                extra={"guild_id": guild.id, "event_id": event.event_id, "kind": event.kind}
+            )
+        outcome.append((batch, None))
+    return outcome
+
+def _is_auto_ban(guild: discord.Guild, guild_data: ConfigDict, event: PreparedEvent) -> bool:
+    if event.kind != BLACKLIST:
+        return False
+    discord_id = offender_discord_id(event.data)
+    if discord_id is None:
+        return False
+    is_member = bot.member_index.contains(guild.id, discord_id)
+    if is_member is None:
+        is_member = guild.get_member(discord_id) is not None
+    return should_auto_ban(guild_data, event.data.get("offense_type"), is_member)
+
+async def auto_ban(
+    guild: discord.Guild,
+    log_channel: discord.TextChannel,
+    events: List[PreparedEvent]
+) -> Optional[BaseException]:
+    """Ban the offenders of these events and post one summary; returns the error if the summary failed."""
+    by_id = {offender_discord_id(event.data): event for event in events}
+    report = await ban_many(guild, by_id, "Blacklisted; banned automatically by this server's auto-ban policy")
+    embed = create_auto_ban_summary_embed(
+        [(discord_id, by_id[discord_id].username, by_id[discord_id].data.get("offense_type"))
+         for discord_id in report.banned],
+        [(discord_id, by_id[discord_id].username, reason) for discord_id, reason in report.failed.items()]
+    )
+    try:
+        await bot.send_scheduler.send(log_channel, embed=embed)
+    except Exception as e:
+        logger.error(f"Error posting auto-ban summary to {guild.name}: {e}")
+        return e
+    return None
 
 async def main():
     """Main entry point for the bot."""
@@ -253,4 +806,6 @@ if __name__ == "__main__":
         logger.info("Shutting down...")
     except Exception as e:
         logger.critical(f"Unhandled exception: {e}", exc_info=True)
+    finally:
+        stop_logging()
 # Made by RedstoneLayer with love!
\ No newline at end of file
@@ -0,0 +1,52 @@
+import logging
+from typing import Dict, Optional, Set
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+class MemberIndex:
+    """Per-guild sets of member IDs built from the gateway cache.
+
+    The index is filled once a guild's member list has been chunked and is kept
+    current from member join/remove events. Guilds that have not been indexed
+    yet answer ``None`` so callers can fall back to not filtering.
+    """
+
+    def __init__(self):
+        self._members: Dict[int, Set[int]] = {}
+
+    def build(self, guild: discord.Guild) -> bool:
+        """Index a guild's cached members; returns False if the cache is incomplete."""
+        if not guild.chunked:
+            return False
+        self._members[guild.id] = {member.id for member in guild.members}
+        logger.debug(f"Indexed {len(self._members[guild.id])} member(s) of {guild.name}")
+        return True
+
+    def add(self, guild_id: int, user_id: int) -> None:
+        members = self._members.get(guild_id)
+        if members is not None:
+            members.add(user_id)
+
+    def remove(self, guild_id: int, user_id: int) -> None:
+        members = self._members.get(guild_id)
+        if members is not None:
+            members.discard(user_id)
+
+    def drop(self, guild_id: int) -> None:
+        self._members.pop(guild_id, None)
+
+    def members(self, guild_id: int) -> Optional[Set[int]]:
+        """The guild's member IDs, or None when it is not indexed; a live set, do not mutate."""
+        return self._members.get(guild_id)
+
+    def contains(self, guild_id: int, user_id: int) -> Optional[bool]:
+        """Whether the user is a member, or None when the guild is not indexed."""
+        members = self._members.get(guild_id)
+        if members is None:
+            return None
+        return user_id in members
+
+    def __len__(self) -> int:
+        return len(self._members)
@@ -0,0 +1,155 @@
+import os
+import time
+import bisect
+import logging
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from aiohttp import web
+
+# Metrics endpoint settings; port 0 disables the endpoint
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+METRICS_PREFIX = "blacklistbot"
+
+# Histogram bucket upper bounds in seconds, shared by every timing
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+logger = logging.getLogger(__name__)
+
+# Series key: metric name plus sorted (label, value) pairs
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+class _Histogram:
+    __slots__ = ("buckets", "count", "total", "last", "max")
+
+    def __init__(self):
+        # Per-bucket (non-cumulative) counts; the extra slot is +Inf
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        self.max = max(self.max, seconds)
+
+# Duration histograms, monotonic counters and point-in-time values
+_timings: Dict[Key, _Histogram] = {}
+_counters: Dict[Key, float] = {}
+_gauges: Dict[Key, float] = {}
+
+def _key(name: str, labels: Dict[str, object]) -> Key:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def observe(name: str, seconds: float, **labels) -> None:
+    """Record one duration sample."""
+    key = _key(name, labels)
+    histogram = _timings.get(key)
+    if histogram is None:
+        histogram = _timings[key] = _Histogram()
+    histogram.observe(seconds)
+
+@contextmanager
+def timed(name: str, **labels) -> Iterator[None]:
+    """Record the duration of the enclosed block."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    """Increment a counter."""
+    key = _key(name, labels)
+    _counters[key] = _counters.get(key, 0) + value
+
+def set_gauge(name: str, value: float, **labels) -> None:
+    """Set a gauge to its current value."""
+    _gauges[_key(name, labels)] = value
+
+def last(name: str, **labels) -> float:
+    """Return the most recent duration recorded for a metric, in seconds."""
+    histogram = _timings.get(_key(name, labels))
+    return histogram.last if histogram else 0.0
+
+def _series_name(key: Key) -> str:
+    name, labels = key
+    if not labels:
+        return name
+    return name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+
+def snapshot() -> Dict[str, Dict]:
+    """Return a copy of every recorded metric."""
+    return {
+        "timings": {
+            _series_name(key): {"count": h.count, "total": h.total, "last": h.last, "max": h.max}
+            for key, h in _timings.items()
+        },
+        "counters": {_series_name(key): value for key, value in _counters.items()},
+        "gauges": {_series_name(key): value for key, value in _gauges.items()},
+    }
+
+def _metric_name(name: str, suffix: str = "") -> str:
+    return f"{METRICS_PREFIX}_{name.replace('.', '_').replace('-', '_')}{suffix}"
+
+def _labels(labels: Tuple[Tuple[str, str], ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+def render() -> str:
+    """Render every metric in the Prometheus text exposition format."""
+    lines: List[str] = []
+    typed = set()
+
+    def header(name: str, kind: str) -> None:
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in sorted(_counters.items()):
+        metric = _metric_name(name, "_total")
+        header(metric, "counter")
+        lines.append(f"{metric}{_labels(labels)} {value}")
+    for (name, labels), value in sorted(_gauges.items()):
+        metric = _metric_name(name)
+        header(metric, "gauge")
+        lines.append(f"{metric}{_labels(labels)} {value}")
+    for (name, labels), histogram in sorted(_timings.items()):
+        metric = _metric_name(name, "_seconds")
+        header(metric, "histogram")
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), histogram.buckets):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{metric}_bucket{_labels(labels, ('le', le))} {cumulative}")
+        lines.append(f"{metric}_sum{_labels(labels)} {histogram.total}")
+        lines.append(f"{metric}_count{_labels(labels)} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+async def _handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+async def start_server(host: str = METRICS_HOST, port: int = METRICS_PORT) -> Optional[web.AppRunner]:
+    """Serve ``/metrics`` on a local HTTP port; returns the runner to clean up, if started."""
+    if not port:
+        return None
+    app = web.Application()
+    app.router.add_get("/metrics", _handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        logger.error(f"Failed to start metrics endpoint on {host}:{port}: {e}")
+        await runner.cleanup()
+        return None
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return runner
@@ -0,0 +1,293 @@
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import discord
+
+import metrics
+from storage import transaction, fetch_all
+from logging_setup import new_correlation_id
+from pipeline import PreparedEvent, render_event
+
+# Outbox settings
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "8"))  # guilds drained in parallel
+OUTBOX_BATCH_SIZE = 50  # deliveries taken per guild per drain
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_RETRY_DELAY = 5  # seconds, base of the exponential backoff
+OUTBOX_MAX_RETRY_DELAY = 900  # seconds
+OUTBOX_RETENTION = 7 * 24 * 3600  # seconds delivered rows are kept to catch duplicates
+OUTBOX_IDLE_WAIT = 30  # seconds between checks when nothing is due
+
+PENDING = "pending"
+DONE = "done"
+DEAD = "dead"
+
+logger = logging.getLogger(__name__)
+
+# Sends the events to a guild; returns each message's events with its error, if any
+Deliver = Callable[[int, List[PreparedEvent]], Awaitable[List[Tuple[List[PreparedEvent], Optional[BaseException]]]]]
+
+class Outbox:
+    """Durable queue of (event, guild) deliveries in the state database.
+
+    Deliveries are recorded before anything is sent, so a crash or restart
+    resumes where it stopped instead of dropping or re-posting a whole batch;
+    each event's payload is stored once for all the guilds it goes to.
+    A delivery is marked done once its message is posted; failures are retried
+    with jittered exponential backoff and given up after ``OUTBOX_MAX_ATTEMPTS``.
+    Guilds are drained in parallel, each in order, by up to ``OUTBOX_WORKERS``
+    tasks. Delivered rows are kept for a while so a re-enqueued event is
+    recognised as a duplicate.
+    """
+
+    def __init__(
+        self,
+        deliver: Deliver,
+        workers: int = OUTBOX_WORKERS,
+        shard_count: Optional[int] = None,
+        shard_ids: Optional[Sequence[int]] = None
+    ):
+        self.deliver = deliver
+        self.workers = workers
+        # Only drain guilds on this process's shards
+        self._shard_filter = ""
+        if shard_ids is not None:
+            self._shard_filter = (
+                f" AND ((guild_id >> 22) % {int(shard_count)}) IN ({','.join(str(int(s)) for s in shard_ids)})"
+            )
+        self._semaphore = asyncio.Semaphore(workers)
+        self._draining: Set[int] = set()
+        self._drains: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def load(self) -> None:
+        with transaction() as conn:
+            # Each event's payload is stored once, however many guilds it goes to
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS outbox_events ("
+                "kind TEXT NOT NULL, event_id TEXT NOT NULL, data TEXT NOT NULL, username TEXT, "
+                "PRIMARY KEY (kind, event_id))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER NOT NULL, kind TEXT NOT NULL, "
+                "event_id TEXT NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+                "next_attempt_at REAL NOT NULL, updated_at REAL NOT NULL, "
+                "UNIQUE (guild_id, kind, event_id))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, guild_id, next_attempt_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS outbox_event ON outbox (kind, event_id)")
+        pending = self.pending()
+        if pending:
+            logger.info(f"Resuming {pending} pending deliveries from the outbox")
+
+    def pending(self) -> int:
+        count = fetch_all(f"SELECT COUNT(*) FROM outbox WHERE status = ?{self._shard_filter}", (PENDING,))[0][0]
+        metrics.set_gauge("outbox.pending", count)
+        return count
+
+    async def enqueue(self, deliveries: Dict[int, List[PreparedEvent]]) -> int:
+        """Record deliveries of events to guilds, keyed by guild ID; returns how many were new.
+
+        Every guild's rows go in one transaction, written off the event loop.
+        """
+        payloads = {}
+        for events in deliveries.values():
+            for event in events:
+                if (event.kind, event.key) not in payloads:
+                    payloads[(event.kind, event.key)] = (event.kind, event.key, json.dumps(event.data), event.username)
+        if not payloads:
+            return 0
+        now = time.time()
+        rows = [
+            (guild_id, event.kind, event.key, PENDING, now, now)
+            for guild_id, events in deliveries.items()
+            for event in events
+        ]
+
+        def write() -> int:
+            with transaction() as conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO outbox_events (kind, event_id, data, username) VALUES (?, ?, ?, ?)",
+                    list(payloads.values())
+                )
+                before = conn.total_changes
+                conn.executemany(
+                    "INSERT OR IGNORE INTO outbox (guild_id, kind, event_id, status, next_attempt_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                return conn.total_changes - before
+
+        with metrics.timed("outbox.enqueue"):
+            added = await asyncio.to_thread(write)
+        if added < len(rows):
+            logger.info(f"Skipped {len(rows) - added} delivery(ies) already in the outbox")
+        self._wakeup.set()
+        return added
+
+    async def forget(self, kind: str, event_keys: Iterable[str]) -> None:
+        """Drop finished deliveries of these events (by key) so they can be delivered again."""
+        rows = [(kind, key, PENDING) for key in event_keys]
+        if not rows:
+            return
+
+        def write() -> None:
+            with transaction() as conn:
+                conn.executemany("DELETE FROM outbox WHERE kind = ? AND event_id = ? AND status != ?", rows)
+        await asyncio.to_thread(write)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # Interrupted deliveries stay pending and are sent on the next start
+        for task in self._drains:
+            task.cancel()
+        await asyncio.gather(*self._drains, return_exceptions=True)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                wait = await self._dispatch()
+            except Exception as e:
+                logger.error(f"Outbox dispatch failed: {e}", exc_info=True)
+                wait = OUTBOX_IDLE_WAIT
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _dispatch(self) -> float:
+        """Start draining every guild with due deliveries; returns seconds until the next one."""
+        rows = await asyncio.to_thread(
+            fetch_all,
+            f"SELECT guild_id, MIN(next_attempt_at) FROM outbox WHERE status = ?{self._shard_filter} GROUP BY guild_id",
+            (PENDING,)
+        )
+        now = time.time()
+        wait = OUTBOX_IDLE_WAIT
+        for guild_id, next_attempt_at in rows:
+            if guild_id in self._draining:
+                continue
+            if next_attempt_at > now:
+                wait = min(wait, next_attempt_at - now)
+                continue
+            self._draining.add(guild_id)
+            task = asyncio.create_task(self._drain(guild_id))
+            self._drains.add(task)
+            task.add_done_callback(self._drains.discard)
+        metrics.set_gauge("outbox.pending_guilds", len(rows))
+        return max(wait, 0.1)
+
+    async def _drain(self, guild_id: int) -> None:
+        new_correlation_id("outbox")
+        try:
+            async with self._semaphore:
+                await self._drain_guild(guild_id)
+        except Exception as e:
+            logger.error(f"Error draining outbox for guild {guild_id}: {e}", exc_info=True)
+        finally:
+            self._draining.discard(guild_id)
+            # More may be due for this guild, or a worker slot freed up
+            self._wakeup.set()
+
+    async def _drain_guild(self, guild_id: int) -> None:
+        # A small indexed read; only the writes and the dispatcher's scan leave the loop
+        rows = fetch_all(
+            "SELECT o.id, o.kind, e.data, e.username, o.attempts FROM outbox o "
+            "LEFT JOIN outbox_events e ON e.kind = o.kind AND e.event_id = o.event_id "
+            "WHERE o.guild_id = ? AND o.status = ? AND o.next_attempt_at <= ? ORDER BY o.id LIMIT ?",
+            (guild_id, PENDING, time.time(), OUTBOX_BATCH_SIZE)
+        )
+        row_ids: Dict[Tuple[str, str], Tuple[int, int]] = {}
+        events = []
+        updates = []
+        for row_id, kind, data, username, attempts in rows:
+            # A row whose payload is gone can never be sent; left due, it would spin the dispatcher
+            event = render_event(kind, json.loads(data), username) if data is not None else None
+            if event is None:
+                updates += self._finish([(row_id, attempts)], DEAD)
+                continue
+            row_ids[(event.kind, event.key)] = (row_id, attempts)
+            events.append(event)
+
+        if events:
+            try:
+                with metrics.timed("outbox.drain"):
+                    results = await self.deliver(guild_id, events)
+            except Exception as e:
+                # Back the whole batch off; left due, it would be taken again at once
+                results = [(events, e)]
+            for batch, error in results:
+                batch_rows = [row_ids[(event.kind, event.key)] for event in batch]
+                if error is None:
+                    updates += self._finish(batch_rows, DONE)
+                    metrics.inc("outbox.delivered", len(batch_rows))
+                else:
+                    updates += self._retry(guild_id, batch_rows, error)
+
+        # Every outcome of the drain in one write, off the event loop
+        if updates:
+            await asyncio.to_thread(self._write_updates, updates)
+
+    @staticmethod
+    def _write_updates(updates: List[tuple]) -> None:
+        with transaction() as conn:
+            conn.executemany(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, updated_at = ? WHERE id = ?",
+                updates
+            )
+
+    def _finish(self, rows: List[Tuple[int, int]], status: str) -> List[tuple]:
+        """Row updates that close these deliveries with ``status``."""
+        now = time.time()
+        return [(status, attempts, now, now, row_id) for row_id, attempts in rows]
+
+    def _retry(self, guild_id: int, rows: List[Tuple[int, int]], error: BaseException) -> List[tuple]:
+        """Row updates that back these deliveries off, or give up on them."""
+        now = time.time()
+        updates, dead = [], []
+        for row_id, attempts in rows:
+            attempts += 1
+            # Missing access or a deleted channel will not fix itself on a retry
+            if attempts >= OUTBOX_MAX_ATTEMPTS or isinstance(error, (discord.Forbidden, discord.NotFound)):
+                dead.append((DEAD, attempts, now, now, row_id))
+                continue
+            delay = random.uniform(0, min(OUTBOX_MAX_RETRY_DELAY, OUTBOX_RETRY_DELAY * 2 ** attempts))
+            updates.append((PENDING, attempts, now + delay, now, row_id))
+        if updates:
+            metrics.inc("outbox.retries", len(updates))
+            logger.warning(
+                "Delivery of %d event(s) to guild %s failed, will retry: %s", len(updates), guild_id, error,
+                extra={"guild_id": guild_id}
+            )
+        if dead:
+            metrics.inc("outbox.dead", len(dead))
+            logger.error(f"Gave up delivering {len(dead)} event(s) to guild {guild_id}: {error}")
+        return updates + dead
+
+    def prune(self, retention: float = OUTBOX_RETENTION) -> None:
+        """Drop delivered and abandoned rows older than the retention window."""
+        with transaction() as conn:
+            conn.execute(
+                "DELETE FROM outbox WHERE status != ? AND updated_at < ?",
+                (PENDING, time.time() - retention)
+            )
+            conn.execute(
+                "DELETE FROM outbox_events WHERE NOT EXISTS ("
+                "SELECT 1 FROM outbox WHERE outbox.kind = outbox_events.kind "
+                "AND outbox.event_id = outbox_events.event_id)"
+            )
+        self.pending()
@@ -0,0 +1,41 @@
+import logging
+from typing import Dict, Optional
+
+import discord
+
+from guild_config import load_config
+
+logger = logging.getLogger(__name__)
+
+# Hot cache of guild ID -> moderator role ID (None when unset)
+_moderator_roles: Dict[int, Optional[int]] = {}
+
+def get_moderator_role_id(guild_id: int) -> Optional[int]:
+    """Return the guild's moderator role ID, reading the config only on a cache miss."""
+    try:
+        return _moderator_roles[guild_id]
+    except KeyError:
+        guild_data = load_config().get(str(guild_id)) or {}
+        role_id = guild_data.get("moderatorRoleId")
+        _moderator_roles[guild_id] = role_id
+        return role_id
+
+def invalidate(guild_id: int) -> None:
+    """Forget the cached moderator role after the guild's settings change."""
+    _moderator_roles.pop(guild_id, None)
+
+def can_manage_blacklists(user: discord.abc.User, guild: discord.Guild, default_role_id: Optional[int] = None) -> bool:
+    """Check whether a user is the guild owner or holds its moderator role.
+
+    Args:
+        user: The user who triggered the interaction
+        guild: The guild the interaction happened in
+        default_role_id: Moderator role to fall back to when none is configured
+    """
+    if user.id == guild.owner_id:
+        return True
+    role_id = get_moderator_role_id(guild.id) or default_role_id
+    if role_id is None or not isinstance(user, discord.Member):
+        return False
+    # Member keeps its role IDs sorted, so this is a lookup rather than a scan
+    return user.get_role(role_id) is not None
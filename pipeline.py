@@ -0,0 +1,148 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+import discord
+
+from api import get_minecraft_username
+from blacklist_store import normalize_uuid
+from embeds import create_blacklist_embed, create_unblacklist_embed, BlacklistButtons, UnblacklistButtons, BatchButtons
+from metrics import timed
+
+# Maximum concurrent Mojang lookups while resolving one batch
+USERNAME_LOOKUP_CONCURRENCY = 8
+
+REQUIRED_EVENT_FIELDS = ("offender_uuid", "offender_discord_id")
+
+# Discord allows at most 10 embeds in one message
+MAX_EMBEDS_PER_MESSAGE = 10
+
+# Event kinds in processing order, with their embed renderer and button view
+BLACKLIST = "blacklist"
+UNBLACKLIST = "unblacklist"
+EVENT_KINDS = {
+    BLACKLIST: (create_blacklist_embed, BlacklistButtons),
+    UNBLACKLIST: (create_unblacklist_embed, UnblacklistButtons),
+}
+
+# Field that dates each kind's events
+EVENT_DATE_FIELDS = {BLACKLIST: "ban_date", UNBLACKLIST: "unban_date"}
+
+logger = logging.getLogger(__name__)
+
+def event_key(kind: str, entry: Dict) -> str:
+    """Identity of one upstream event, used for dedup and the outbox.
+
+    The UUID names the offender, not the event: a player blacklisted again
+    after an unblacklist is a new event. Entries are told apart by their date,
+    or their feed ``id`` when undated, and only fall back to the bare UUID when
+    they carry neither.
+    """
+    uuid = normalize_uuid(entry["offender_uuid"])
+    stamp = entry.get(EVENT_DATE_FIELDS[kind]) or entry.get("id")
+    return f"{uuid}@{stamp}" if stamp not in (None, "") else uuid
+
+class PreparedEvent:
+    """A feed event that has been validated, resolved and rendered once for all guilds.
+
+    ``event_id`` is the offender's UUID, carried in the buttons; ``key`` is the
+    event's identity (see event_key).
+    """
+    __slots__ = ("kind", "event_id", "key", "data", "username", "embed")
+
+    def __init__(self, kind: str, event_id: str, data: Dict, username: Optional[str], embed: discord.Embed):
+        self.kind = kind
+        self.event_id = event_id
+        self.key = event_key(kind, data)
+        self.data = data
+        self.username = username
+        self.embed = embed
+
+    def make_view(self) -> discord.ui.View:
+        """Build the moderation buttons for one delivery of this event."""
+        return EVENT_KINDS[self.kind][1](self.data["offender_discord_id"], self.event_id)
+
+def chronological(events: List[PreparedEvent]) -> List[PreparedEvent]:
+    """Order events of both kinds by date, then feed ``id``; undated events go last, in their order."""
+    def order(event: PreparedEvent) -> tuple:
+        date = event.data.get(EVENT_DATE_FIELDS[event.kind])
+        try:
+            feed_id = float(event.data.get("id"))
+        except (TypeError, ValueError):
+            feed_id = float("inf")
+        return date in (None, ""), str(date or ""), feed_id
+
+    return sorted(events, key=order)
+
+def make_batch_view(events: List[PreparedEvent]) -> discord.ui.View:
+    """Build the per-entry moderation buttons for one batched delivery."""
+    return BatchButtons([
+        (event.kind, event.data["offender_discord_id"], event.event_id, event.username or f"#{index}")
+        for index, event in enumerate(events, 1)
+    ])
+
+def render_event(kind: str, entry: Dict, username: Optional[str]) -> Optional[PreparedEvent]:
+    """Render one validated entry, or return None if its embed cannot be built."""
+    try:
+        embed = EVENT_KINDS[kind][0](entry, username or "Unknown")
+    except Exception as e:
+        logger.error(f"Error rendering {kind} {entry['offender_uuid']}: {e}")
+        return None
+    return PreparedEvent(kind, entry["offender_uuid"], entry, username, embed)
+
+def normalize_events(kind: str, entries: list) -> List[Dict]:
+    """Drop malformed entries and duplicate events within a single batch."""
+    seen = set()
+    valid = []
+    for entry in entries:
+        if not isinstance(entry, dict) or not all(k in entry for k in REQUIRED_EVENT_FIELDS):
+            logger.warning("%s item missing required fields (offender_uuid, offender_discord_id)", kind.capitalize())
+            continue
+        key = event_key(kind, entry)
+        if key in seen:
+            continue
+        seen.add(key)
+        valid.append(entry)
+    return valid
+
+async def resolve_usernames(uuids: List[str]) -> Dict[str, Optional[str]]:
+    """Look up each distinct UUID's Minecraft username exactly once."""
+    semaphore = asyncio.Semaphore(USERNAME_LOOKUP_CONCURRENCY)
+
+    async def resolve(uuid: str) -> Optional[str]:
+        async with semaphore:
+            try:
+                return await get_minecraft_username(uuid)
+            except Exception as e:
+                logger.error(f"Error resolving username for {uuid}: {e}")
+                return None
+
+    usernames = await asyncio.gather(*(resolve(uuid) for uuid in uuids))
+    return dict(zip(uuids, usernames))
+
+async def prepare_events(batches: Dict[str, list]) -> List[PreparedEvent]:
+    """Run the shared normalize, resolve and render stages over every feed's batch.
+
+    Args:
+        batches: Raw feed entries keyed by event kind
+
+    Returns:
+        Prepared events, blacklists first, each rendered once
+    """
+    with timed("pipeline.normalize"):
+        valid = {kind: normalize_events(kind, batches.get(kind) or []) for kind in EVENT_KINDS}
+    if not any(valid.values()):
+        return []
+
+    with timed("pipeline.resolve"):
+        uuids = list(dict.fromkeys(entry["offender_uuid"] for entries in valid.values() for entry in entries))
+        usernames = await resolve_usernames(uuids)
+
+    events = []
+    with timed("pipeline.render"):
+        for kind, entries in valid.items():
+            for entry in entries:
+                event = render_event(kind, entry, usernames.get(entry["offender_uuid"]))
+                if event is not None:
+                    events.append(event)
+    return events
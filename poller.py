@@ -0,0 +1,108 @@
+import os
+import time
+import random
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+import metrics
+
+# Adaptive polling settings, in seconds
+POLL_MIN_INTERVAL = float(os.getenv("POLL_MIN_INTERVAL", "10"))
+POLL_BASE_INTERVAL = float(os.getenv("POLL_BASE_INTERVAL", "60"))
+POLL_IDLE_MAX_INTERVAL = float(os.getenv("POLL_IDLE_MAX_INTERVAL", "120"))
+POLL_ERROR_MAX_INTERVAL = float(os.getenv("POLL_ERROR_MAX_INTERVAL", "600"))
+POLL_JITTER = float(os.getenv("POLL_JITTER", "0.1"))  # fraction of the interval
+
+logger = logging.getLogger(__name__)
+
+class AdaptivePoller:
+    """Runs one feed's poll tick on the bot's scheduler with an adaptive interval.
+
+    ``tick`` returns the number of new events it handled, or raises on failure.
+    The interval halves while events are arriving, grows gradually while the feed
+    is idle and doubles on errors, each within its own bound, and every delay is
+    jittered. The next run is only scheduled once the current one has finished,
+    so a slow tick can never overlap the next.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        tick: Callable[[], Awaitable[int]],
+        scheduler: AsyncIOScheduler,
+        min_interval: float = POLL_MIN_INTERVAL,
+        base_interval: float = POLL_BASE_INTERVAL,
+        idle_max_interval: float = POLL_IDLE_MAX_INTERVAL,
+        error_max_interval: float = POLL_ERROR_MAX_INTERVAL,
+        jitter: float = POLL_JITTER
+    ):
+        self.name = name
+        self.tick = tick
+        self.scheduler = scheduler
+        self.min_interval = min_interval
+        self.base_interval = base_interval
+        self.idle_max_interval = idle_max_interval
+        self.error_max_interval = error_max_interval
+        self.jitter = jitter
+        self.interval = base_interval
+        self.consecutive_errors = 0
+        self.started = False
+
+    @property
+    def job_id(self) -> str:
+        return f"poll:{self.name}"
+
+    def start(self) -> None:
+        if self.started:
+            return
+        self.started = True
+        self._schedule(0)
+        logger.info(f"Started {self.name} poller")
+
+    def stop(self) -> None:
+        self.started = False
+        if self.scheduler.running and self.scheduler.get_job(self.job_id):
+            self.scheduler.remove_job(self.job_id)
+
+    def _schedule(self, delay: float) -> None:
+        self.scheduler.add_job(
+            self._run,
+            "date",
+            run_date=datetime.now(self.scheduler.timezone) + timedelta(seconds=delay),
+            id=self.job_id,
+            replace_existing=True,
+            misfire_grace_time=None
+        )
+
+    def _next_interval(self, events: int, failed: bool) -> float:
+        if failed:
+            return min(self.error_max_interval, max(self.interval, self.base_interval) * 2)
+        if events:
+            return max(self.min_interval, min(self.interval, self.base_interval) / 2)
+        return min(self.idle_max_interval, self.interval * 1.25)
+
+    async def _run(self) -> None:
+        start = time.perf_counter()
+        events, failed = 0, False
+        try:
+            events = await self.tick() or 0
+            self.consecutive_errors = 0
+        except Exception as e:
+            failed = True
+            self.consecutive_errors += 1
+            logger.error(f"Error in {self.name} poll (failure #{self.consecutive_errors}): {e}", exc_info=True)
+        finally:
+            duration = time.perf_counter() - start
+            metrics.observe(f"poll.{self.name}.tick", duration)
+            self.interval = self._next_interval(events, failed)
+            delay = self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+            metrics.set_gauge(f"poll.{self.name}.interval", self.interval)
+            logger.debug(
+                f"{self.name} poll took {duration * 1000:.1f}ms with {events} event(s), "
+                f"next in {delay:.1f}s"
+            )
+            if self.started:
+                self._schedule(delay)
@@ -0,0 +1,125 @@
+import os
+import hmac
+import json
+import time
+import hashlib
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from aiohttp import web
+
+import metrics
+
+# Push receiver settings; port 0 disables the receiver
+PUSH_HOST = os.getenv("PUSH_HOST", "127.0.0.1")
+PUSH_PORT = int(os.getenv("PUSH_PORT", "0"))
+PUSH_SECRET = os.getenv("PUSH_SECRET", "")
+PUSH_MAX_SKEW = 300  # seconds a signed timestamp may differ from our clock
+PUSH_MAX_BODY = 1024 * 1024  # bytes
+# While pushes arrive, the feeds are only polled this often to catch missed events
+PUSH_RECONCILE_INTERVAL = float(os.getenv("PUSH_RECONCILE_INTERVAL", "900"))  # seconds
+
+SIGNATURE_HEADER = "X-Signature-256"
+TIMESTAMP_HEADER = "X-Timestamp"
+
+logger = logging.getLogger(__name__)
+
+# Processes pushed entries keyed by event kind; returns the number of new events
+Handler = Callable[[Dict[str, List[Dict]]], Awaitable[int]]
+
+def sign(secret: str, timestamp: str, body: bytes) -> str:
+    """Signature of a push: HMAC-SHA256 over ``timestamp.body``, hex encoded."""
+    digest = hmac.new(secret.encode(), timestamp.encode() + b"." + body, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+class PushReceiver:
+    """Accepts signed webhook pushes of blacklist and unblacklist events.
+
+    Publishers POST ``{"events": [{"type": "blacklist", "data": {...}}, ...]}`` to
+    ``/webhook/events`` with a timestamp header and an HMAC signature of the
+    timestamp and body. Verified events are passed to ``handler`` right away;
+    the response is sent once they have been queued for delivery.
+    """
+
+    def __init__(
+        self,
+        handler: Handler,
+        kinds: List[str],
+        secret: str = PUSH_SECRET,
+        accepting: Callable[[], bool] = lambda: True
+    ):
+        self.handler = handler
+        self.kinds = kinds
+        self.secret = secret
+        # In multi-process mode only the polling leader takes pushes
+        self.accepting = accepting
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def running(self) -> bool:
+        return self._runner is not None
+
+    def _verify(self, request: web.Request, body: bytes) -> bool:
+        timestamp = request.headers.get(TIMESTAMP_HEADER, "")
+        signature = request.headers.get(SIGNATURE_HEADER, "")
+        try:
+            if abs(time.time() - float(timestamp)) > PUSH_MAX_SKEW:
+                return False
+        except ValueError:
+            return False
+        return hmac.compare_digest(signature, sign(self.secret, timestamp, body))
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        start = time.perf_counter()
+        body = await request.read()
+        if not self._verify(request, body):
+            metrics.inc("push.rejected", reason="signature")
+            return web.json_response({"error": "invalid signature"}, status=401)
+        if not self.accepting():
+            metrics.inc("push.rejected", reason="not_leader")
+            return web.json_response({"error": "not accepting pushes"}, status=503)
+        try:
+            payload = json.loads(body)
+            batches: Dict[str, List[Dict]] = {}
+            for event in payload["events"]:
+                if event.get("type") not in self.kinds or not isinstance(event.get("data"), dict):
+                    raise ValueError(f"unsupported event {event.get('type')!r}")
+                batches.setdefault(event["type"], []).append(event["data"])
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            metrics.inc("push.rejected", reason="payload")
+            return web.json_response({"error": f"invalid payload: {e}"}, status=400)
+
+        try:
+            new_events = await self.handler(batches)
+        except Exception as e:
+            logger.error(f"Error processing pushed events: {e}", exc_info=True)
+            return web.json_response({"error": "processing failed"}, status=500)
+        metrics.observe("push.handle", time.perf_counter() - start)
+        metrics.inc("push.events", sum(len(entries) for entries in batches.values()))
+        return web.json_response({"accepted": sum(map(len, batches.values())), "new": new_events})
+
+    async def start(self, host: str = PUSH_HOST, port: int = PUSH_PORT) -> bool:
+        """Start listening; returns False if the receiver is disabled or misconfigured."""
+        if not port:
+            return False
+        if not self.secret:
+            logger.error("PUSH_PORT is set but PUSH_SECRET is empty; push receiver not started")
+            return False
+        app = web.Application(client_max_size=PUSH_MAX_BODY)
+        app.router.add_post("/webhook/events", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        try:
+            await web.TCPSite(self._runner, host, port).start()
+        except OSError as e:
+            logger.error(f"Failed to start push receiver on {host}:{port}: {e}")
+            await self._runner.cleanup()
+            self._runner = None
+            return False
+        logger.info(f"Accepting pushed events on http://{host}:{port}/webhook/events")
+        return True
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,181 @@
+import os
+import time
+import uuid
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from storage import transaction, fetch_all
+
+# Retention for delivered event IDs
+SEEN_TTL_SECONDS = int(os.getenv("SEEN_TTL_SECONDS", str(30 * 86400)))
+SEEN_MAX_PER_GUILD = int(os.getenv("SEEN_MAX_PER_GUILD", "100000"))
+
+logger = logging.getLogger(__name__)
+
+def encode_event_id(event_id: str) -> bytes:
+    """Pack an event key's Minecraft UUID into its 16-byte form, falling back to UTF-8 for other IDs.
+
+    Keys of the form ``uuid@stamp`` keep the stamp after the packed UUID.
+    """
+    offender, at, stamp = str(event_id).partition("@")
+    try:
+        return uuid.UUID(offender).bytes + (at + stamp).encode()
+    except (ValueError, AttributeError, TypeError):
+        return str(event_id).encode()
+
+class SeenIndex:
+    """Per-guild set of already delivered event IDs with TTL and size-bounded retention.
+
+    Membership checks are O(1). Each guild's entries are loaded from the database
+    the first time the guild is touched and kept in insertion order, so eviction
+    only ever looks at the oldest entries; only the entries added or evicted since
+    the last flush are written back.
+    """
+
+    def __init__(self, kind: str, ttl: float = SEEN_TTL_SECONDS, max_entries: int = SEEN_MAX_PER_GUILD):
+        self.kind = kind
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._seen: Dict[int, Dict[bytes, float]] = {}
+        self._added: List[Tuple[int, bytes, float]] = []
+        self._removed: List[Tuple[int, bytes]] = []
+        # Event IDs forgotten in every guild, including guilds not loaded yet
+        self._forgotten: Set[bytes] = set()
+        self._expire_stored = True
+
+    def load(self) -> None:
+        """Create the backing table; guild entries are loaded on first use."""
+        with transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS seen_events ("
+                "kind TEXT NOT NULL, guild_id INTEGER NOT NULL, event_id BLOB NOT NULL, "
+                "seen_at REAL NOT NULL, PRIMARY KEY (kind, guild_id, event_id)) WITHOUT ROWID"
+            )
+            # forget() deletes an event from every guild, which the primary key cannot serve
+            conn.execute("CREATE INDEX IF NOT EXISTS seen_events_event ON seen_events (kind, event_id)")
+
+    def _guild(self, guild_id: int) -> Dict[bytes, float]:
+        guild_seen = self._seen.get(guild_id)
+        if guild_seen is None:
+            rows = fetch_all(
+                "SELECT event_id, seen_at FROM seen_events WHERE kind = ? AND guild_id = ? ORDER BY seen_at",
+                (self.kind, guild_id)
+            )
+            guild_seen = self._seen[guild_id] = {
+                event_id: seen_at for event_id, seen_at in rows if event_id not in self._forgotten
+            }
+            self._evict_guild(guild_id, guild_seen, time.time())
+        return guild_seen
+
+    def migrate_from_config(self, config: dict, key: str) -> bool:
+        """Move a legacy ``lastSeen*Ids`` list out of the guild config into the index.
+
+        The legacy lists hold bare UUIDs; is_seen matches them against any event
+        key for the same offender.
+        """
+        migrated = False
+        now = time.time()
+        for guild_id, guild_data in config.items():
+            legacy_ids = guild_data.pop(key, None)
+            if legacy_ids is None:
+                continue
+            migrated = True
+            self.mark_seen(int(guild_id), legacy_ids, now)
+        return migrated
+
+    def is_seen(self, guild_id: int, event_id: str) -> bool:
+        guild_seen = self._guild(guild_id)
+        if encode_event_id(event_id) in guild_seen:
+            return True
+        # IDs migrated from the legacy lists name only the offender, so they
+        # stand for every dated event of that offender
+        offender, at, _ = str(event_id).partition("@")
+        return bool(at) and encode_event_id(offender) in guild_seen
+
+    def mark_seen(self, guild_id: int, event_ids: Iterable[str], now: float = None) -> None:
+        now = now or time.time()
+        guild_seen = self._guild(guild_id)
+        for event_id in event_ids:
+            key = encode_event_id(event_id)
+            if key in guild_seen:
+                continue
+            guild_seen[key] = now
+            self._added.append((guild_id, key, now))
+        self._evict_guild(guild_id, guild_seen, now)
+
+    def forget(self, event_ids: Iterable[str]) -> None:
+        """Drop event IDs from every guild so a later event for them is delivered again."""
+        keys = {encode_event_id(event_id) for event_id in event_ids}
+        if not keys:
+            return
+        for guild_seen in self._seen.values():
+            for key in keys & guild_seen.keys():
+                del guild_seen[key]
+        self._forgotten.update(keys)
+
+    def evict(self, now: float = None) -> None:
+        """Drop expired entries and trim every loaded guild down to the size limit."""
+        now = now or time.time()
+        for guild_id, guild_seen in self._seen.items():
+            self._evict_guild(guild_id, guild_seen, now)
+
+    def _evict_guild(self, guild_id: int, guild_seen: Dict[bytes, float], now: float) -> None:
+        cutoff = now - self.ttl
+        while guild_seen:
+            oldest = next(iter(guild_seen))
+            if guild_seen[oldest] >= cutoff and len(guild_seen) <= self.max_entries:
+                break
+            del guild_seen[oldest]
+            self._removed.append((guild_id, oldest))
+
+    def __len__(self) -> int:
+        return sum(len(guild_seen) for guild_seen in self._seen.values())
+
+    def prepare_flush(self) -> Optional[Callable[[], None]]:
+        """Snapshot the entries added or evicted since the last flush.
+
+        Returns:
+            A function that writes the snapshot, safe to run off the event loop,
+            or None when there is nothing to write
+        """
+        if not self._added and not self._removed and not self._forgotten and not self._expire_stored:
+            return None
+        # Net out entries that were added and evicted (or the reverse) in between
+        added = [
+            (self.kind, guild_id, key, seen_at) for guild_id, key, seen_at in self._added
+            if key in self._seen.get(guild_id, ())
+        ]
+        removed = [
+            (self.kind, guild_id, key) for guild_id, key in self._removed
+            if key not in self._seen.get(guild_id, ())
+        ]
+        forgotten = [(self.kind, key) for key in self._forgotten]
+        # Expired entries of guilds that are never loaded are dropped once per run
+        expire_before = time.time() - self.ttl if self._expire_stored else None
+        self._added, self._removed, self._expire_stored = [], [], False
+
+        def write() -> None:
+            with transaction() as conn:
+                # Forget first, so IDs seen again since then are written back below
+                conn.executemany("DELETE FROM seen_events WHERE kind = ? AND event_id = ?", forgotten)
+                conn.executemany(
+                    "DELETE FROM seen_events WHERE kind = ? AND guild_id = ? AND event_id = ?",
+                    removed
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO seen_events (kind, guild_id, event_id, seen_at) VALUES (?, ?, ?, ?)",
+                    added
+                )
+                if expire_before is not None:
+                    conn.execute(
+                        "DELETE FROM seen_events WHERE kind = ? AND seen_at < ?", (self.kind, expire_before)
+                    )
+            # Only now can a guild loaded later no longer read these from the table
+            self._forgotten.difference_update(key for _, key in forgotten)
+        return write
+
+    def flush(self) -> None:
+        """Write entries added or evicted since the last flush."""
+        write = self.prepare_flush()
+        if write:
+            write()
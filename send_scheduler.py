@@ -0,0 +1,237 @@
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set
+
+import discord
+
+import metrics
+
+# Send scheduler settings
+SEND_WORKERS = int(os.getenv("SEND_WORKERS", "8"))
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "45"))  # requests per second
+SEND_ROUTE_RATE = float(os.getenv("SEND_ROUTE_RATE", "1"))  # requests per second per route
+SEND_ROUTE_BURST = int(os.getenv("SEND_ROUTE_BURST", "5"))
+
+# Lower value is served first
+PRIORITY_INTERACTION = 0
+PRIORITY_LOG = 1
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at ``rate`` tokens per second."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until one token is available."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+class _Job:
+    __slots__ = ("factory", "guild_id", "route", "priority", "future", "enqueued_at")
+
+    def __init__(self, factory, guild_id, route, priority, future):
+        self.factory = factory
+        self.guild_id = guild_id
+        self.route = route
+        self.priority = priority
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+class SendScheduler:
+    """Paces every outbound Discord send through one bounded worker pool.
+
+    Jobs are queued per guild and served round-robin so one busy guild cannot
+    starve the others, interaction followups are served before log posts, a
+    global token bucket and one bucket per route (channel or interaction) keep
+    us under Discord's rate limits, and at most one job per route runs at a time
+    so messages to the same channel keep their order.
+    """
+
+    def __init__(
+        self,
+        workers: int = SEND_WORKERS,
+        global_rate: float = SEND_GLOBAL_RATE,
+        route_rate: float = SEND_ROUTE_RATE,
+        route_burst: int = SEND_ROUTE_BURST
+    ):
+        self.workers = workers
+        self.route_rate = route_rate
+        self.route_burst = route_burst
+        self._global_bucket = TokenBucket(global_rate, global_rate)
+        self._route_buckets: Dict[Any, TokenBucket] = {}
+        self._queues: Dict[int, "OrderedDict[Any, Deque[_Job]]"] = {
+            PRIORITY_INTERACTION: OrderedDict(),
+            PRIORITY_LOG: OrderedDict(),
+        }
+        self._busy_routes: Set[Any] = set()
+        self._depth = 0
+        self._wakeup = asyncio.Event()
+        self._tasks: list = []
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Send scheduler started with {self.workers} worker(s)")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for queue in self._queues.values():
+            for jobs in queue.values():
+                for job in jobs:
+                    job.future.cancel()
+            queue.clear()
+        self._set_depth(0)
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    def _set_depth(self, depth: int) -> None:
+        self._depth = depth
+        metrics.set_gauge("send_queue.depth", depth)
+
+    def submit(
+        self,
+        factory: Callable[[], Awaitable[Any]],
+        guild_id: Optional[int],
+        route: Any,
+        priority: int = PRIORITY_LOG
+    ) -> "asyncio.Future":
+        """Queue ``factory()`` to run when its guild, route and the global limit allow."""
+        future = asyncio.get_running_loop().create_future()
+        job = _Job(factory, guild_id, route, priority, future)
+        self._queues[priority].setdefault(guild_id, deque()).append(job)
+        self._set_depth(self._depth + 1)
+        self._wakeup.set()
+        return future
+
+    async def send(self, channel: discord.abc.Messageable, **kwargs) -> discord.Message:
+        """Post a log message to a channel."""
+        guild_id = channel.guild.id if getattr(channel, "guild", None) else None
+        return await self.submit(lambda: channel.send(**kwargs), guild_id, ("channel", channel.id))
+
+    async def edit(self, message: discord.Message, **kwargs) -> Any:
+        """Edit a message the bot posted, paced like a log post."""
+        guild_id = message.guild.id if message.guild else None
+        return await self.submit(lambda: message.edit(**kwargs), guild_id, ("channel", message.channel.id))
+
+    async def followup(self, interaction: discord.Interaction, *args, **kwargs) -> Any:
+        """Send an interaction followup ahead of queued log posts."""
+        return await self.submit(
+            lambda: interaction.followup.send(*args, **kwargs),
+            interaction.guild_id,
+            ("interaction", interaction.id),
+            PRIORITY_INTERACTION
+        )
+
+    async def edit_message(self, interaction: discord.Interaction, message: discord.Message, **kwargs) -> Any:
+        """Edit the message an interaction came from ahead of queued log posts."""
+        return await self.submit(
+            lambda: message.edit(**kwargs),
+            interaction.guild_id,
+            ("channel", message.channel.id),
+            PRIORITY_INTERACTION
+        )
+
+    def _pick(self):
+        """Take the next runnable job, or return how long to wait for one."""
+        now = time.monotonic()
+        wait = self._global_bucket.delay(now)
+        if wait > 0:
+            return None, wait
+
+        wait = None
+        for priority in (PRIORITY_INTERACTION, PRIORITY_LOG):
+            queue = self._queues[priority]
+            for guild_id in list(queue):
+                job = queue[guild_id][0]
+                if job.route in self._busy_routes:
+                    continue
+                bucket = self._route_buckets.get(job.route)
+                if bucket is None:
+                    bucket = self._route_buckets[job.route] = TokenBucket(self.route_rate, self.route_burst)
+                route_wait = bucket.delay(now)
+                if route_wait > 0:
+                    wait = route_wait if wait is None else min(wait, route_wait)
+                    continue
+
+                # Serve this guild, then rotate it to the back of the line
+                jobs = queue.pop(guild_id)
+                jobs.popleft()
+                if jobs:
+                    queue[guild_id] = jobs
+                bucket.take(now)
+                self._global_bucket.take(now)
+                self._busy_routes.add(job.route)
+                self._set_depth(self._depth - 1)
+                return job, None
+        return None, wait
+
+    def _prune_buckets(self) -> None:
+        if len(self._route_buckets) < 10000:
+            return
+        now = time.monotonic()
+        for route in [r for r, b in self._route_buckets.items() if r not in self._busy_routes and b.is_full(now)]:
+            del self._route_buckets[route]
+
+    async def _next_job(self) -> _Job:
+        while True:
+            job, wait = self._pick()
+            if job is not None:
+                return job
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._next_job()
+            metrics.observe("send_queue.wait", time.perf_counter() - job.enqueued_at)
+            try:
+                if job.future.cancelled():
+                    continue
+                try:
+                    result = await job.factory()
+                except Exception as e:
+                    if isinstance(e, discord.HTTPException) and e.status == 429:
+                        metrics.inc("discord.429")
+                    if not job.future.cancelled():
+                        job.future.set_exception(e)
+                else:
+                    if not job.future.cancelled():
+                        job.future.set_result(result)
+            finally:
+                metrics.observe("send_queue.latency", time.perf_counter() - job.enqueued_at)
+                self._busy_routes.discard(job.route)
+                self._prune_buckets()
+                # A route freed up, so a waiting worker may now have work
+                self._wakeup.set()
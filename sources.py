@@ -0,0 +1,169 @@
+import os
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import metrics
+from api import BLACKLIST_API_URL, UNBLACKLIST_API_URL, BLACKLIST_UPSTREAM, UNBLACKLIST_FEED_PARAMS, fetch_feed, register_upstream
+from feed_cursor import FeedCursor
+from pipeline import BLACKLIST, UNBLACKLIST, REQUIRED_EVENT_FIELDS, event_key
+
+# Blacklist providers to subscribe to, in priority order. "primary" is the
+# BLACKLIST_API_URL / UNBLACKLIST_API_URL pair; any other name is configured
+# with SOURCE_<NAME>_BLACKLIST_URL, SOURCE_<NAME>_UNBLACKLIST_URL (optional)
+# and SOURCE_<NAME>_TIMEOUT.
+BLACKLIST_SOURCES = os.getenv("BLACKLIST_SOURCES", "primary")
+PRIMARY_SOURCE = "primary"
+SOURCE_TIMEOUT = float(os.getenv("SOURCE_TIMEOUT", "20"))  # seconds per source and feed, paging included
+
+# Position field and feed parameters per event kind
+FEEDS = {
+    BLACKLIST: ("ban_date", None),
+    UNBLACKLIST: ("unban_date", UNBLACKLIST_FEED_PARAMS),
+}
+
+# Short field names some providers use for the offender
+FIELD_ALIASES = {"uuid": "offender_uuid", "discord_id": "offender_discord_id"}
+
+logger = logging.getLogger(__name__)
+
+CursorKey = Tuple[str, str]
+
+class Source:
+    """One blacklist provider, with its feed URLs and fetch timeout.
+
+    Every source but the primary gets its own upstream name, and with it its
+    own connection pool (HTTP_SOURCE_<NAME>_*) and circuit breaker.
+    """
+    __slots__ = ("name", "urls", "timeout", "upstream")
+
+    def __init__(self, name: str, urls: Dict[str, str], timeout: float = SOURCE_TIMEOUT):
+        self.name = name
+        self.urls = {kind: url for kind, url in urls.items() if url}
+        self.timeout = timeout
+        self.upstream = BLACKLIST_UPSTREAM if name == PRIMARY_SOURCE else f"source_{name}"
+        if self.upstream != BLACKLIST_UPSTREAM:
+            for url in self.urls.values():
+                register_upstream(url, self.upstream)
+
+    def feed_name(self, kind: str) -> str:
+        """Cursor name; the primary source keeps the names used before sources existed."""
+        feed = f"{kind}s"
+        return feed if self.name == PRIMARY_SOURCE else f"{feed}:{self.name}"
+
+def load_sources(names: str = BLACKLIST_SOURCES) -> List[Source]:
+    """Build the configured sources, skipping any without a feed URL."""
+    sources = []
+    for name in dict.fromkeys(name.strip().lower() for name in names.split(",") if name.strip()):
+        if name == PRIMARY_SOURCE:
+            urls = {BLACKLIST: BLACKLIST_API_URL, UNBLACKLIST: UNBLACKLIST_API_URL}
+        else:
+            prefix = f"SOURCE_{name.upper()}_"
+            urls = {BLACKLIST: os.getenv(f"{prefix}BLACKLIST_URL", ""), UNBLACKLIST: os.getenv(f"{prefix}UNBLACKLIST_URL", "")}
+        source = Source(name, urls, float(os.getenv(f"SOURCE_{name.upper()}_TIMEOUT", str(SOURCE_TIMEOUT))))
+        if not source.urls:
+            logger.warning(f"Blacklist source {name} has no feed URLs configured, ignoring it")
+            continue
+        sources.append(source)
+    return sources
+
+def load_cursors(sources: List[Source]) -> Dict[CursorKey, FeedCursor]:
+    """Load the persisted feed cursor of every source's feeds."""
+    return {
+        (source.name, kind): FeedCursor.load(source.feed_name(kind), FEEDS[kind][0])
+        for source in sources
+        for kind in source.urls
+    }
+
+def normalize_entry(entry: Dict) -> Dict:
+    """Rename a provider's short offender field names to the feed schema's."""
+    if not isinstance(entry, dict) or not any(alias in entry for alias in FIELD_ALIASES):
+        return entry
+    entry = dict(entry)
+    for alias, field in FIELD_ALIASES.items():
+        if alias in entry and field not in entry:
+            entry[field] = entry.pop(alias)
+    return entry
+
+def merge_entries(kind: str, results: List[Tuple[str, List[Dict]]], attribute: bool) -> List[Dict]:
+    """Merge every source's entries into one list, one entry per event.
+
+    Entries with the same event key (see pipeline.event_key) are the same event,
+    so distinct dated events of one offender are all kept. The first source in
+    priority order wins each field; later ones only fill gaps.
+    With ``attribute`` set, each entry lists the sources that reported it under
+    ``sources``. Malformed entries are passed through for the pipeline to reject.
+    """
+    merged: Dict[str, Dict] = {}
+    malformed = []
+    for source, entries in results:
+        for entry in entries:
+            entry = normalize_entry(entry)
+            if not isinstance(entry, dict) or not all(k in entry for k in REQUIRED_EVENT_FIELDS):
+                malformed.append(entry)
+                continue
+            key = event_key(kind, entry)
+            existing = merged.get(key)
+            if existing is None:
+                merged[key] = entry
+                if attribute:
+                    entry["sources"] = [source]
+                continue
+            metrics.inc("source.duplicates", kind=kind)
+            for field, value in entry.items():
+                if existing.get(field) in (None, ""):
+                    existing[field] = value
+            if attribute and source not in existing["sources"]:
+                existing["sources"].append(source)
+    return list(merged.values()) + malformed
+
+async def _fetch_source_feed(source: Source, kind: str, cursors: Dict[CursorKey, FeedCursor]) -> List[Dict]:
+    """Fetch one of a source's feeds within the source's timeout.
+
+    The fetch advances a copy of the cursor, which only replaces the stored one
+    once the whole fetch succeeded, so entries on a timed-out page are fetched
+    again next time instead of being skipped.
+    """
+    key = (source.name, kind)
+    cursor = cursors[key].copy()
+    with metrics.timed("source.fetch", source=source.name, kind=kind):
+        entries = await asyncio.wait_for(fetch_feed(source.urls[kind], cursor, FEEDS[kind][1]), source.timeout)
+    cursors[key] = cursor
+    return entries
+
+async def fetch_sources(
+    sources: List[Source], cursors: Dict[CursorKey, FeedCursor]
+) -> Tuple[Dict[str, List[Dict]], Optional[Exception]]:
+    """Fetch every feed of every source at once and merge the results per kind.
+
+    Each fetch has its own timeout, and each source its own breaker, so a slow
+    or failing source never holds back the others: whatever arrived in time is
+    merged and returned.
+
+    Returns:
+        New entries keyed by event kind, and the first fetch error if every
+        source had a feed fail
+    """
+    jobs = [(source, kind) for source in sources for kind in source.urls]
+    results = await asyncio.gather(
+        *(_fetch_source_feed(source, kind, cursors) for source, kind in jobs),
+        return_exceptions=True
+    )
+
+    per_kind: Dict[str, List[Tuple[str, List[Dict]]]] = {}
+    failed: Dict[str, Exception] = {}
+    for (source, kind), result in zip(jobs, results):
+        if isinstance(result, Exception):
+            reason = str(result) or type(result).__name__
+            logger.error(f"Failed to fetch {kind}s from source {source.name}: {reason}")
+            metrics.inc("source.errors", source=source.name, kind=kind)
+            failed.setdefault(source.name, result)
+            continue
+        per_kind.setdefault(kind, []).append((source.name, result))
+        if result:
+            logger.info(f"Received {len(result)} new {kind}(s) from source {source.name}")
+
+    attribute = len(sources) > 1
+    batches = {kind: merge_entries(kind, results, attribute) for kind, results in per_kind.items()}
+    fetch_error = next(iter(failed.values())) if failed and len(failed) == len(sources) else None
+    return batches, fetch_error
@@ -0,0 +1,79 @@
+import sqlite3
+import threading
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+DB_FILE = Path("data/bot.db")
+BUSY_TIMEOUT_MS = 5000
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# One connection per thread, so reads on the event loop never wait behind a
+# write-behind flush in a worker thread; WAL lets each see every committed write.
+_local = threading.local()
+_conns: List[sqlite3.Connection] = []
+_conns_lock = threading.Lock()  # guards _conns and _generation only
+_generation = 0  # bumped by close_connection so threads reopen
+
+def get_connection() -> sqlite3.Connection:
+    """Get or create this thread's SQLite connection."""
+    if getattr(_local, "generation", None) == _generation:
+        return _local.conn
+    DB_FILE.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(DB_FILE, check_same_thread=False, isolation_level=None)
+    # WAL keeps readers unblocked and makes every commit crash-safe
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    # Other threads and shard processes share the file; wait for another writer instead of failing
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    with _conns_lock:
+        if not _conns:
+            logger.info(f"Opened state database {DB_FILE}")
+        _conns.append(conn)
+        _local.conn, _local.generation = conn, _generation
+    return conn
+
+# Writers in this process queue here instead of in SQLite's busy handler,
+# which polls with sleeps; reads never take it
+_write_lock = threading.RLock()
+
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    """Run the enclosed statements in a single atomic write transaction."""
+    conn = get_connection()
+    with _write_lock:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+def fetch_all(sql: str, params: tuple = ()) -> list:
+    """Run a read query and return all rows."""
+    return get_connection().execute(sql, params).fetchall()
+
+def get_meta(key: str) -> Optional[str]:
+    """Read a value from the small key/value table for bot-wide state."""
+    with transaction() as conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def set_meta(key: str, value: str) -> None:
+    with transaction() as conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+def close_connection() -> None:
+    """Close every thread's SQLite connection."""
+    global _generation
+    with _conns_lock:
+        for conn in _conns:
+            conn.close()
+        _conns.clear()
+        _generation += 1
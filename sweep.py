@@ -0,0 +1,152 @@
+import os
+import time
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, List, Optional
+
+import discord
+
+from blacklist_store import BlacklistStore
+from send_scheduler import SendScheduler
+
+# Sweep settings
+SWEEP_CHUNK_SIZE = int(os.getenv("SWEEP_CHUNK_SIZE", "1000"))  # member IDs held in memory at once
+SWEEP_MATCHES_PER_MESSAGE = 20
+SWEEP_PROGRESS_INTERVAL = 10  # seconds between progress message edits
+
+logger = logging.getLogger(__name__)
+
+# Running sweeps keyed by guild ID; at most one per guild
+_sweeps: Dict[int, "Sweep"] = {}
+
+def get_sweep(guild_id: int) -> Optional["Sweep"]:
+    return _sweeps.get(guild_id)
+
+class Sweep:
+    """Background job that checks every member of a guild against the local blacklist.
+
+    Members are streamed in chunks of ``SWEEP_CHUNK_SIZE`` IDs, either from the
+    gateway cache or from paginated ``fetch_members`` calls, and each chunk is
+    intersected with the set of blacklisted Discord IDs. Matches are posted as
+    summary embeds of up to ``SWEEP_MATCHES_PER_MESSAGE`` entries, and a single
+    progress message is edited while the sweep runs.
+    """
+
+    def __init__(
+        self,
+        guild: discord.Guild,
+        channel: discord.abc.Messageable,
+        store: BlacklistStore,
+        scheduler: SendScheduler,
+        requested_by: discord.abc.User
+    ):
+        self.guild = guild
+        self.channel = channel
+        self.store = store
+        self.scheduler = scheduler
+        self.requested_by = requested_by
+        self.scanned = 0
+        self.matched = 0
+        self.started_at = time.monotonic()
+        self.task: Optional[asyncio.Task] = None
+        self._progress_message: Optional[discord.Message] = None
+        self._last_progress = 0.0
+
+    def start(self) -> None:
+        _sweeps[self.guild.id] = self
+        self.task = asyncio.create_task(self._run())
+        self.task.add_done_callback(lambda _: _sweeps.pop(self.guild.id, None))
+
+    def cancel(self) -> None:
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+    async def _member_chunks(self) -> AsyncIterator[List[int]]:
+        if self.guild.chunked:
+            members = self.guild.members
+            for start in range(0, len(members), SWEEP_CHUNK_SIZE):
+                yield [member.id for member in members[start:start + SWEEP_CHUNK_SIZE]]
+                # Give the event loop a turn between chunks of a large cached guild
+                await asyncio.sleep(0)
+            return
+
+        chunk = []
+        async for member in self.guild.fetch_members(limit=None):
+            chunk.append(member.id)
+            if len(chunk) >= SWEEP_CHUNK_SIZE:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _status(self, state: str) -> discord.Embed:
+        elapsed = time.monotonic() - self.started_at
+        total = self.guild.member_count or self.scanned
+        embed = discord.Embed(
+            title=f"🔎 Blacklist Sweep {state}",
+            color=discord.Color.blue() if state == "Running" else discord.Color.dark_grey(),
+            timestamp=discord.utils.utcnow()
+        )
+        embed.add_field(name="Scanned", value=f"{self.scanned}/{total}", inline=True)
+        embed.add_field(name="Matches", value=str(self.matched), inline=True)
+        embed.add_field(name="Elapsed", value=f"{elapsed:.0f}s", inline=True)
+        embed.set_footer(text=f"Requested by {self.requested_by}")
+        return embed
+
+    async def _report_progress(self, state: str, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_progress < SWEEP_PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        embed = self._status(state)
+        try:
+            if self._progress_message is None:
+                self._progress_message = await self.scheduler.send(self.channel, embed=embed)
+            else:
+                await self.scheduler.edit(self._progress_message, embed=embed)
+        except discord.HTTPException as e:
+            logger.warning(f"Failed to update sweep progress in {self.guild.name}: {e}")
+
+    async def _post_matches(self, matches: List[int]) -> None:
+        embed = discord.Embed(
+            title=f"🚫 {len(matches)} Blacklisted Member(s) Found",
+            color=discord.Color.red()
+        )
+        lines = []
+        for discord_id in matches:
+            entry = self.store.get(discord_id) or {}
+            lines.append(
+                f"<@{discord_id}> — `{entry.get('offender_uuid', 'N/A')}` — "
+                f"{entry.get('offense_type', 'N/A')}"
+            )
+        embed.description = "\n".join(lines)
+        await self.scheduler.send(self.channel, embed=embed)
+
+    async def _run(self) -> None:
+        pending: List[int] = []
+        state = "Complete"
+        await self._report_progress("Running", force=True)
+        try:
+            blacklisted = self.store.discord_ids()
+            async for chunk in self._member_chunks():
+                self.scanned += len(chunk)
+                found = blacklisted & set(chunk)
+                self.matched += len(found)
+                pending.extend(found)
+                while len(pending) >= SWEEP_MATCHES_PER_MESSAGE:
+                    batch, pending = pending[:SWEEP_MATCHES_PER_MESSAGE], pending[SWEEP_MATCHES_PER_MESSAGE:]
+                    await self._post_matches(batch)
+                await self._report_progress("Running")
+        except asyncio.CancelledError:
+            state = "Cancelled"
+        except Exception as e:
+            state = "Failed"
+            logger.error(f"Sweep of {self.guild.name} failed: {e}", exc_info=True)
+        finally:
+            if pending:
+                await self._post_matches(pending)
+            await self._report_progress(state, force=True)
+            logger.info(
+                f"Sweep of {self.guild.name} {state.lower()}: "
+                f"{self.scanned} scanned, {self.matched} matched"
+            )
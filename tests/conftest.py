@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage
+
+@pytest.fixture(autouse=True)
+def state_db(tmp_path, monkeypatch):
+    """Give every test a fresh data/bot.db in its own working directory."""
+    monkeypatch.chdir(tmp_path)
+    storage.close_connection()
+    yield tmp_path
+    storage.close_connection()
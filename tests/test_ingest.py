@@ -0,0 +1,72 @@
+import asyncio
+import os
+
+import pytest
+
+os.environ.setdefault("DISCORD_TOKEN", "test-token")
+
+import main
+from blacklist_store import BlacklistStore
+from outbox import Outbox
+from pipeline import chronological, render_event, BLACKLIST, UNBLACKLIST
+from seen_index import SeenIndex
+
+NOTCH = "069a79f4-44e9-4726-a5be-fca90e38aaf5"
+
+def event(kind: str, date=None, feed_id=None):
+    entry = {"offender_uuid": NOTCH, "offender_discord_id": "42"}
+    if date is not None:
+        entry["ban_date" if kind == BLACKLIST else "unban_date"] = date
+    if feed_id is not None:
+        entry["id"] = feed_id
+    return render_event(kind, entry, "Notch")
+
+@pytest.fixture
+def bot(monkeypatch):
+    """The bot with fresh state and no guilds, so ingest only updates the replica."""
+    store = BlacklistStore()
+    store.load()
+    seen = {kind: SeenIndex(kind) for kind in (BLACKLIST, UNBLACKLIST)}
+    for index in seen.values():
+        index.load()
+    outbox = Outbox(None)
+    outbox.load()
+    monkeypatch.setattr(main.bot, "blacklist_store", store)
+    monkeypatch.setattr(main.bot, "seen", seen)
+    monkeypatch.setattr(main.bot, "outbox", outbox)
+    return main.bot
+
+def test_chronological_orders_both_kinds_by_date():
+    events = [
+        event(BLACKLIST, "2024-06-01"),
+        event(UNBLACKLIST, "2024-03-01"),
+        event(BLACKLIST, "2024-01-01"),
+    ]
+
+    ordered = chronological(events)
+
+    assert [e.kind for e in ordered] == [BLACKLIST, UNBLACKLIST, BLACKLIST]
+    assert [e.data.get("ban_date") or e.data.get("unban_date") for e in ordered] == [
+        "2024-01-01", "2024-03-01", "2024-06-01"
+    ]
+
+def test_chronological_breaks_ties_by_feed_id_and_keeps_undated_last():
+    undated_first = event(UNBLACKLIST, feed_id="x")
+    undated_second = event(UNBLACKLIST)
+    later_id = event(BLACKLIST, "2024-01-01", feed_id=12)
+    earlier_id = event(UNBLACKLIST, "2024-01-01", feed_id=3)
+
+    ordered = chronological([undated_first, later_id, undated_second, earlier_id])
+
+    assert ordered == [earlier_id, later_id, undated_first, undated_second]
+
+def test_ingest_applies_a_reblacklist_after_its_unblacklist(bot):
+    # Polled batches come kind by kind, so the later blacklist is listed first
+    asyncio.run(main.ingest([event(BLACKLIST, "2024-06-01"), event(UNBLACKLIST, "2024-03-01")]))
+
+    assert bot.blacklist_store.get_by_uuid(NOTCH) is not None
+
+def test_ingest_applies_an_unblacklist_after_its_blacklist(bot):
+    asyncio.run(main.ingest([event(UNBLACKLIST, "2024-03-01"), event(BLACKLIST, "2024-01-01")]))
+
+    assert bot.blacklist_store.get_by_uuid(NOTCH) is None
@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import outbox
+from outbox import Outbox, PENDING, DONE, DEAD
+from pipeline import render_event, BLACKLIST
+from storage import fetch_all
+
+NOTCH = "069a79f4-44e9-4726-a5be-fca90e38aaf5"
+
+def blacklist(date: str):
+    return render_event(
+        BLACKLIST, {"offender_uuid": NOTCH, "offender_discord_id": "42", "ban_date": date}, "Notch"
+    )
+
+def rows():
+    return {
+        guild_id: (status, attempts, next_attempt_at)
+        for guild_id, status, attempts, next_attempt_at in fetch_all(
+            "SELECT guild_id, status, attempts, next_attempt_at FROM outbox"
+        )
+    }
+
+async def drain(box: Outbox, deliveries) -> None:
+    """Enqueue, let the workers take everything due once, then stop."""
+    box.load()
+    await box.enqueue(deliveries)
+    box.start()
+    for _ in range(100):
+        await asyncio.sleep(0.02)
+        if all(status != PENDING or attempts for status, attempts, _ in rows().values()):
+            break
+    await box.stop()
+
+def test_enqueue_skips_deliveries_already_recorded():
+    async def run():
+        box = Outbox(None)
+        box.load()
+        event = blacklist("2024-01-01")
+        assert await box.enqueue({5: [event], 6: [event]}) == 2
+        assert await box.enqueue({5: [event], 7: [event]}) == 1
+        assert box.pending() == 3
+        assert fetch_all("SELECT COUNT(*) FROM outbox_events") == [(1,)]
+    asyncio.run(run())
+
+def test_delivered_rows_finish_and_failed_rows_back_off():
+    delivered = []
+
+    async def deliver(guild_id, events):
+        delivered.append(guild_id)
+        return [(events, RuntimeError("boom") if guild_id == 6 else None)]
+
+    started = time.time()
+    event = blacklist("2024-01-01")
+    asyncio.run(drain(Outbox(deliver), {5: [event], 6: [event]}))
+
+    assert sorted(delivered) == [5, 6]
+    state = rows()
+    assert state[5][:2] == (DONE, 0)
+    assert state[6][:2] == (PENDING, 1)
+    assert state[6][2] >= started
+
+def test_deliveries_are_given_up_after_the_last_attempt(monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_ATTEMPTS", 1)
+
+    async def deliver(guild_id, events):
+        raise RuntimeError("boom")
+
+    asyncio.run(drain(Outbox(deliver), {5: [blacklist("2024-01-01")]}))
+
+    assert rows()[5][:2] == (DEAD, 1)
+
+def test_forget_only_drops_finished_deliveries():
+    async def deliver(guild_id, events):
+        return [(events, None)]
+
+    async def run():
+        event = blacklist("2024-01-01")
+        box = Outbox(deliver)
+        await drain(box, {5: [event]})
+        await box.enqueue({6: [event]})
+        await box.forget(BLACKLIST, [event.key])
+        assert list(rows()) == [6]
+        assert await box.enqueue({5: [event]}) == 1
+    asyncio.run(run())
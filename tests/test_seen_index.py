@@ -0,0 +1,60 @@
+from seen_index import SeenIndex
+
+NOTCH = "069a79f4-44e9-4726-a5be-fca90e38aaf5"
+JEB = "853c80ef-3c37-49fd-aa49-938b674adae6"
+
+def new_index() -> SeenIndex:
+    seen = SeenIndex("blacklist")
+    seen.load()
+    return seen
+
+def test_migrate_moves_legacy_lists_out_of_the_config():
+    seen = new_index()
+    config = {"1": {"lastSeenBlacklistIds": [NOTCH], "logChannelId": "5"}, "2": {}}
+
+    assert seen.migrate_from_config(config, "lastSeenBlacklistIds")
+    assert config == {"1": {"logChannelId": "5"}, "2": {}}
+    assert not seen.migrate_from_config(config, "lastSeenBlacklistIds")
+
+def test_migrated_uuid_matches_every_dated_event_of_the_offender():
+    seen = new_index()
+    seen.migrate_from_config({"1": {"lastSeenBlacklistIds": [NOTCH]}}, "lastSeenBlacklistIds")
+
+    assert seen.is_seen(1, NOTCH)
+    assert seen.is_seen(1, f"{NOTCH}@2024-01-01")
+    assert not seen.is_seen(2, f"{NOTCH}@2024-01-01")
+    assert not seen.is_seen(1, f"{JEB}@2024-01-01")
+
+def test_dated_key_does_not_match_another_date():
+    seen = new_index()
+    seen.mark_seen(1, [f"{NOTCH}@2024-01-01"])
+
+    assert seen.is_seen(1, f"{NOTCH}@2024-01-01")
+    assert not seen.is_seen(1, f"{NOTCH}@2024-06-01")
+    assert not seen.is_seen(1, NOTCH)
+
+def test_marks_survive_a_flush_and_reload():
+    seen = new_index()
+    seen.migrate_from_config({"1": {"lastSeenBlacklistIds": [NOTCH]}}, "lastSeenBlacklistIds")
+    seen.mark_seen(1, [f"{JEB}@2024-01-01"])
+    seen.flush()
+
+    reloaded = new_index()
+    assert reloaded.is_seen(1, f"{NOTCH}@2024-03-01")
+    assert reloaded.is_seen(1, f"{JEB}@2024-01-01")
+
+def test_forget_reaches_guilds_not_loaded_yet():
+    seen = new_index()
+    seen.mark_seen(1, [NOTCH, JEB])
+    seen.mark_seen(2, [NOTCH])
+    seen.flush()
+
+    reloaded = new_index()
+    assert reloaded.is_seen(1, NOTCH)
+    reloaded.forget([NOTCH])
+    assert not reloaded.is_seen(1, NOTCH)
+    assert not reloaded.is_seen(2, NOTCH)
+    assert reloaded.is_seen(1, JEB)
+
+    reloaded.flush()
+    assert not new_index().is_seen(2, NOTCH)
@@ -0,0 +1,47 @@
+from sources import merge_entries
+
+NOTCH = "069a79f4-44e9-4726-a5be-fca90e38aaf5"
+
+def entry(**fields):
+    return {"offender_uuid": NOTCH, "offender_discord_id": "42", **fields}
+
+def test_same_event_from_several_sources_is_merged():
+    primary = [entry(ban_date="2024-01-01", reason="")]
+    mirror = [entry(ban_date="2024-01-01", reason="griefing", offense_type="Hacking")]
+
+    merged = merge_entries("blacklist", [("primary", primary), ("mirror", mirror)], attribute=True)
+
+    assert len(merged) == 1
+    assert merged[0]["reason"] == "griefing"
+    assert merged[0]["offense_type"] == "Hacking"
+    assert merged[0]["sources"] == ["primary", "mirror"]
+
+def test_first_source_wins_fields_both_have():
+    primary = [entry(ban_date="2024-01-01", offense_type="Hacking")]
+    mirror = [entry(ban_date="2024-01-01", offense_type="Scamming")]
+
+    merged = merge_entries("blacklist", [("primary", primary), ("mirror", mirror)], attribute=False)
+
+    assert merged == [entry(ban_date="2024-01-01", offense_type="Hacking")]
+
+def test_dated_events_of_one_offender_are_kept_apart():
+    primary = [entry(ban_date="2024-01-01")]
+    mirror = [entry(ban_date="2024-06-01")]
+
+    merged = merge_entries("blacklist", [("primary", primary), ("mirror", mirror)], attribute=False)
+
+    assert [e["ban_date"] for e in merged] == ["2024-01-01", "2024-06-01"]
+
+def test_short_field_names_are_normalized_before_merging():
+    primary = [entry(ban_date="2024-01-01")]
+    mirror = [{"uuid": NOTCH.replace("-", ""), "discord_id": "42", "ban_date": "2024-01-01"}]
+
+    merged = merge_entries("blacklist", [("primary", primary), ("mirror", mirror)], attribute=True)
+
+    assert len(merged) == 1
+    assert merged[0]["sources"] == ["primary", "mirror"]
+
+def test_malformed_entries_are_passed_through_last():
+    merged = merge_entries("blacklist", [("primary", [{"reason": "no ids"}, entry()])], attribute=False)
+
+    assert merged == [entry(), {"reason": "no ids"}]
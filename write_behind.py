@@ -0,0 +1,113 @@
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, List, Optional
+
+import metrics
+
+# Write-behind settings
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "50"))  # updates that trigger an early flush
+WRITE_BEHIND_MAX_DELAY = float(os.getenv("WRITE_BEHIND_MAX_DELAY", "5"))  # seconds an update may wait
+
+logger = logging.getLogger(__name__)
+
+# A write prepared on the event loop and run on a worker thread
+Write = Callable[[], None]
+
+def _run_writes(writes: List[Write]) -> None:
+    for write in writes:
+        try:
+            write()
+        except Exception as e:
+            logger.error(f"Write-behind flush step failed: {e}", exc_info=True)
+
+class WriteBehind:
+    """Coalesces state updates and writes them from a single background task.
+
+    Callers only ``mark_dirty``; the flusher waits until ``max_pending`` updates
+    have accumulated or ``max_delay`` seconds have passed since the first one,
+    then calls ``prepare`` on the event loop to snapshot what changed and runs
+    the returned writes on a worker thread, so the loop never waits on disk.
+    Only one flush runs at a time, and none while a ``hold`` is open.
+    """
+
+    def __init__(
+        self,
+        prepare: Callable[[], List[Write]],
+        max_pending: int = WRITE_BEHIND_MAX_PENDING,
+        max_delay: float = WRITE_BEHIND_MAX_DELAY
+    ):
+        self.prepare = prepare
+        self.max_pending = max_pending
+        self.max_delay = max_delay
+        self._pending = 0
+        self._dirty = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._holds = 0
+        self._released = asyncio.Event()
+        self._released.set()
+        self._task: Optional[asyncio.Task] = None
+
+    def mark_dirty(self, count: int = 1) -> None:
+        self._pending += count
+        self._dirty.set()
+
+    @asynccontextmanager
+    async def hold(self) -> AsyncIterator[None]:
+        """Keep flushes from snapshotting state until the block is done.
+
+        For updates that may only be persisted once something else has been
+        written, such as dedup marks and feed cursors before the events they
+        cover are in the outbox. Holds may overlap; do not flush inside one.
+        """
+        self._holds += 1
+        self._released.clear()
+        try:
+            yield
+        finally:
+            self._holds -= 1
+            if not self._holds:
+                self._released.set()
+
+    async def flush(self) -> None:
+        """Write everything that changed, as soon as no hold is open."""
+        async with self._lock:
+            while self._holds:
+                await self._released.wait()
+            self._pending = 0
+            writes = self.prepare()
+            if not writes:
+                return
+            with metrics.timed("write_behind.flush"):
+                await asyncio.to_thread(_run_writes, writes)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher and write whatever is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._dirty.wait()
+            # Coalesce everything that arrives until the size or time threshold
+            deadline = loop.time() + self.max_delay
+            while self._pending < self.max_pending:
+                self._dirty.clear()
+                try:
+                    await asyncio.wait_for(self._dirty.wait(), timeout=max(0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+            self._dirty.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind flush failed: {e}", exc_info=True)